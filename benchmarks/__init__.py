@@ -0,0 +1,6 @@
+"""Benchmarks for the PRONOM release tools.
+
+Benchmarks are run as modules from the root of the repository, e.g.
+
+    `python -m benchmarks.bench_export`
+"""
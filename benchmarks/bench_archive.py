@@ -0,0 +1,70 @@
+"""Benchmark an export folder against the same export packed into a
+single file archive.
+
+An export of `--records` records is made by repeating the fixture
+records, packed into an archive, and the number of files, the space
+used on disk and the time to summarize each are reported.
+
+    `python -m benchmarks.bench_archive --records 2400`
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from src.pronom_export.pronom_xml_export import pack_export
+from src.pronom_summary.pronom_summary import parse_pronom
+from src.pronom_tools.worker_pool import WorkerPool
+
+FIXTURES = Path("tests", "fixtures", "export")
+CONTAINER = Path("tests", "fixtures", "container", "container-signature-20231127.xml")
+
+
+def make_export(pronom_path: Path, records: int) -> None:
+    """Write an export folder of `records` records."""
+    fixtures = [item.read_bytes() for item in sorted(FIXTURES.glob("**/*.xml"))]
+    fmt = Path(pronom_path, "fmt")
+    fmt.mkdir(parents=True)
+    for idx in range(1, records + 1):
+        Path(fmt, f"fmt{idx}.xml").write_bytes(fixtures[idx % len(fixtures)])
+
+
+def disk_usage(path: Path) -> tuple[int, int]:
+    """Return the number of files and the bytes allocated to them."""
+    files = [path] if path.is_file() else [i for i in path.glob("**/*") if i.is_file()]
+    return len(files), sum(item.stat().st_blocks * 512 for item in files)
+
+
+def time_summary(pronom_path: Path, pool: WorkerPool) -> float:
+    """Return the time taken to summarize an export."""
+    start = time.perf_counter()
+    asyncio.run(parse_pronom(pronom_path, CONTAINER, pool=pool))
+    return time.perf_counter() - start
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-archive",
+        description="benchmark export folders against single file archives",
+    )
+    parser.add_argument("--records", type=int, default=2400)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, WorkerPool() as pool:
+        folder = Path(tmp_dir, "export")
+        archive = Path(tmp_dir, "export.sqlite")
+        make_export(folder, args.records)
+        pack_export(folder, archive)
+        print(f"records: {args.records}")
+        print(f"{'export':<8} {'files':>8} {'bytes':>12} {'seconds':>10}")
+        for name, path in (("folder", folder), ("archive", archive)):
+            files, size = disk_usage(path)
+            elapsed = time_summary(path, pool)
+            print(f"{name:<8} {files:>8} {size:>12} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
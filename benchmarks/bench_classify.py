@@ -0,0 +1,104 @@
+"""Micro-benchmark the classification of PRONOM descriptions.
+
+Compares the original sequence of lower-case and substring scans with
+the precompiled `DescriptionClassifier` over every description in an
+export.
+
+    `python -m benchmarks.bench_classify --path /var/tmp/pronom-export`
+"""
+
+import argparse
+import time
+import xml.etree.ElementTree as etree
+from pathlib import Path
+
+from src.pronom_summary.pronom_summary import (
+    COMPLETE,
+    DEPRECATED,
+    NAMESPACES,
+    OUTLINE,
+    DescriptionClassifier,
+)
+
+FIXTURES = Path("tests", "fixtures", "export")
+
+
+def process_desc_scans(desc: str) -> str:
+    """The original implementation of `process_desc`."""
+
+    # pylint: disable=R0911
+
+    if "this is an outline record" in desc.lower():
+        return OUTLINE
+    if "format deprecated" in desc.lower():
+        return DEPRECATED
+    if "puid deprecated" in desc.lower():
+        return DEPRECATED
+    if "puid is now deprecated" in desc.lower():
+        return DEPRECATED
+    if "deprecated in favour" in desc.lower():
+        return DEPRECATED
+    if "this format has been deprecated" in desc.lower():
+        return DEPRECATED
+    if "this puid has been deprecated" in desc.lower():
+        return DEPRECATED
+    return COMPLETE
+
+
+def load_descriptions(path: Path) -> list[str]:
+    """Return the description of every record in an export."""
+    descriptions = []
+    for item in sorted(path.glob("**/*.xml")):
+        desc = (
+            etree.parse(item)
+            .getroot()
+            .find(
+                "pro:report_format_detail/pro:FileFormat/pro:FormatDescription",
+                NAMESPACES,
+            )
+        )
+        descriptions.append(desc.text or "")
+    return descriptions
+
+
+def time_classifier(descriptions: list[str], classify, repeat: int) -> float:
+    """Return the mean time in seconds to classify a description."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for desc in descriptions:
+            classify(desc)
+    return (time.perf_counter() - start) / (len(descriptions) * repeat)
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-classify", description="benchmark description classification"
+    )
+    parser.add_argument("--path", type=Path, default=Path("/var/tmp/pronom-export"))
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    path = args.path if args.path.exists() else FIXTURES
+    descriptions = load_descriptions(path)
+    repeat = max(args.repeat, 10000 // len(descriptions))
+    classifier = DescriptionClassifier()
+    mismatches = [
+        desc
+        for desc in descriptions
+        if classifier.classify(desc)[0] != process_desc_scans(desc)
+    ]
+    size = sum(len(desc) for desc in descriptions) // len(descriptions)
+    print(f"descriptions: {len(descriptions)} ({path}), mean length: {size}")
+    print(f"mismatches: {len(mismatches)}")
+    print(f"{'classifier':<12} {'us/desc':>10}")
+    for name, classify in (
+        ("scans", process_desc_scans),
+        ("compiled", classifier.classify),
+    ):
+        per_desc = time_classifier(descriptions, classify, repeat)
+        print(f"{name:<12} {per_desc * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark bytes on the wire and CPU per request of `/pronom_summary`.
+
+The original endpoint, returning the summary as a dict to be encoded
+and serialized by FastAPI on every request, is mounted alongside the
+precompressed endpoint and both are requested through the FastAPI
+TestClient with each supported `Accept-Encoding`.
+
+    `python -m benchmarks.bench_compression --records 2400 --requests 100`
+"""
+
+import argparse
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_stats import configure, make_summary, put_summary
+from src.pronom_stats.compression import ENCODINGS, IDENTITY
+from src.pronom_stats.pronom_stats import app
+
+ORIGINAL_PATH = "/benchmark/pronom_summary"
+
+
+def get_pronom_summary_original():
+    """The original implementation of `/pronom_summary`."""
+    with app.db.reader() as cur:
+        version, summary = app.summary_cache.get(cur)
+    ret = {}
+    ret["version"] = version
+    ret["summary"] = summary
+    return ret
+
+
+def measure(client: TestClient, path: str, encoding: str, requests: int):
+    """Return the bytes downloaded and the CPU time in milliseconds per
+    request.
+    """
+    headers = {"accept-encoding": encoding}
+    downloaded = 0
+    start = time.process_time()
+    for _ in range(requests):
+        resp = client.get(path, headers=headers)
+        resp.raise_for_status()
+        downloaded += resp.num_bytes_downloaded
+    cpu = (time.process_time() - start) / requests * 1000
+    return downloaded // requests, cpu
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-compression",
+        description="benchmark bytes on the wire and CPU of the PRONOM summary",
+    )
+    parser.add_argument("--records", type=int, default=2400)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    app.add_api_route(ORIGINAL_PATH, get_pronom_summary_original)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure(tmp_dir)
+        with TestClient(app) as client:
+            put_summary(client, make_summary(args.records))
+            print(f"records: {args.records}, requests: {args.requests}")
+            print(f"{'response':<24} {'bytes':>10} {'cpu ms':>8}")
+            rows = [("original", ORIGINAL_PATH, IDENTITY)] + [
+                (f"precompressed {encoding}", "/pronom_summary", encoding)
+                for encoding in [IDENTITY, *ENCODINGS]
+            ]
+            for name, path, encoding in rows:
+                size, cpu = measure(client, path, encoding, args.requests)
+                print(f"{name:<24} {size:>10} {cpu:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Benchmark the CSV summary of a full release.
+
+The original implementation, concatenating the rows of the decoded
+summary into a single string, is compared with streaming rows from the
+records table with the csv module. The mean time and the peak memory
+allocated to produce the whole CSV are reported for each.
+
+    `python -m benchmarks.bench_csv --records 2400`
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_stats import configure, make_summary, put_summary
+from src.pronom_stats.database import Database
+from src.pronom_stats.pronom_stats import (
+    RECORD_COLUMNS,
+    _make_record_filter,
+    app,
+    iter_csv,
+)
+
+
+def csv_concat(db: Database) -> int:
+    """The original implementation of `/pronom_summary_csv`. Returns
+    the length of the CSV.
+    """
+    with db.reader() as cur:
+        res = cur.execute(
+            "select summary from pronom where rowid = (select max(rowid) from pronom);"
+        ).fetchone()
+    pronom_data = json.loads(res[0]).get("pronom_data", [])
+    headers = pronom_data[0].keys()
+    rows = ""
+    for data in pronom_data:
+        row = ",".join(f"{value}" for value in data.values())
+        rows = f"{rows}\n{row}"
+    headers = ",".join(headers)
+    res = f"{headers}{rows}\n"
+    return len(res)
+
+
+def csv_stream(db: Database) -> int:
+    """Consume the streamed CSV. Returns the length of the CSV."""
+    return sum(
+        len(chunk)
+        for chunk in iter_csv(db, list(RECORD_COLUMNS), _make_record_filter())
+    )
+
+
+def measure(db: Database, func, repeat: int) -> tuple[float, int]:
+    """Return the mean time in milliseconds and the peak allocation in
+    bytes of producing the CSV.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(db)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    tracemalloc.start()
+    func(db)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-csv", description="benchmark the CSV summary of a release"
+    )
+    parser.add_argument("--records", type=int, default=2400)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure(tmp_dir)
+        with TestClient(app) as client:
+            put_summary(client, make_summary(args.records))
+        db = Database(Path(os.environ["DATABASE_PATH"]))
+        print(f"records: {args.records}, repeat: {args.repeat}")
+        print(f"{'csv':<8} {'ms':>8} {'peak KiB':>10}")
+        for name, func in (("concat", csv_concat), ("stream", csv_stream)):
+            elapsed, peak = measure(db, func, args.repeat)
+            print(f"{name:<8} {elapsed:>8.2f} {peak / 1024:>10.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark the PRONOM export engines against a mocked local PRONOM
+server.
+
+The stub server adds a fixed latency to every response to stand in
+for the round trip to nationalarchives.gov.uk. Each engine exports the
+same range of records into a temporary directory and the wall-clock
+time and requests per second are reported.
+
+    `python -m benchmarks.bench_export --fmt-range 100 --latency 0.05`
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from src.pronom_export.pronom_xml_export import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    ENGINE_ASYNC,
+    ENGINE_POOL,
+    export_pronom_data,
+    get_x_fmt_range,
+)
+
+FIXTURE = Path("tests", "fixtures", "export", "fmt", "fmt1.xml")
+
+
+def make_handler(latency: float, body: bytes):
+    """Return a request handler serving `body` after `latency`
+    seconds.
+    """
+
+    class StubHandler(BaseHTTPRequestHandler):
+        """Serve the same PRONOM record for every request."""
+
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # pylint: disable=C0103
+            """Respond to a GET request."""
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # pylint: disable=W0221
+            """Silence request logging."""
+
+    return StubHandler
+
+
+def start_server(handler) -> ThreadingHTTPServer:
+    """Start a stub server on an ephemeral port in a daemon thread."""
+    ThreadingHTTPServer.daemon_threads = True
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(engine: str, base_url: str, fmt_range: int, concurrency: int, rate: float):
+    """Run a single export and return the elapsed time."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        export_pronom_data(
+            pronom_path=Path(tmp_dir),
+            fmt_range=fmt_range,
+            engine=engine,
+            concurrency=concurrency,
+            rate=rate,
+            base_url=base_url,
+        )
+        return time.perf_counter() - start
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-export", description="benchmark PRONOM export engines"
+    )
+    parser.add_argument("--fmt-range", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    parser.add_argument("--engines", nargs="+", default=[ENGINE_ASYNC, ENGINE_POOL])
+    args = parser.parse_args()
+
+    server = start_server(make_handler(args.latency, FIXTURE.read_bytes()))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    records = (args.fmt_range - 1) + (get_x_fmt_range() - 1)
+    print(f"records: {records}, latency: {args.latency}s")
+    print(f"{'engine':<8} {'seconds':>10} {'req/s':>10}")
+    for engine in args.engines:
+        elapsed = run(engine, base_url, args.fmt_range, args.concurrency, args.rate)
+        print(f"{engine:<8} {elapsed:>10.2f} {records / elapsed:>10.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark the single pass download and summary of PRONOM records
+against exporting to disk and then summarizing the export.
+
+Both runs download from the latency-adding stub server used by
+`bench_export` and the wall-clock time of each is reported, with the
+stage timings and queue depths of the single pass.
+
+    `python -m benchmarks.bench_pipeline --fmt-range 100 --latency 0.05`
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_export import FIXTURE, make_handler, start_server
+from src.pronom_export.pronom_xml_export import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    export_pronom_data_async,
+)
+from src.pronom_summary.pronom_summary import parse_pronom
+from src.pronom_tools.pipeline import summarize_export
+from src.pronom_tools.worker_pool import WorkerPool
+
+CONTAINER = Path("tests", "fixtures", "container", "container-signature-20231127.xml")
+
+
+async def run_two_pass(base_url: str, args: argparse.Namespace) -> float:
+    """Export to disk, summarize the export and return the elapsed
+    time.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir, WorkerPool() as pool:
+        start = time.perf_counter()
+        await export_pronom_data_async(
+            pronom_path=Path(tmp_dir),
+            fmt_range=args.fmt_range,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            base_url=base_url,
+        )
+        await parse_pronom(tmp_dir, CONTAINER, pool=pool)
+        return time.perf_counter() - start
+
+
+async def run_single_pass(base_url: str, args: argparse.Namespace):
+    """Summarize records as they are downloaded and return the elapsed
+    time with the pipeline report.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir, WorkerPool() as pool:
+        start = time.perf_counter()
+        _, report = await summarize_export(
+            pronom_path=Path(tmp_dir),
+            fmt_range=args.fmt_range,
+            incremental=False,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            base_url=base_url,
+            pool=pool,
+        )
+        return time.perf_counter() - start, report
+
+
+async def bench(args: argparse.Namespace):
+    """Run the benchmark."""
+    server = start_server(make_handler(args.latency, FIXTURE.read_bytes()))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    two_pass = await run_two_pass(base_url, args)
+    single_pass, report = await run_single_pass(base_url, args)
+    server.shutdown()
+    print(f"records: {report.summarize.items}, latency: {args.latency}s")
+    print(f"{'run':<12} {'seconds':>10}")
+    print(f"{'two pass':<12} {two_pass:>10.2f}")
+    print(f"{'single pass':<12} {single_pass:>10.2f}")
+    print(f"{'stage':<12} {'elapsed':>10} {'busy':>10} {'wait':>10}")
+    for name, stage in (("download", report.download), ("summarize", report.summarize)):
+        print(
+            f"{name:<12} {stage.elapsed:>10.2f} {stage.busy:>10.2f} {stage.wait:>10.2f}"
+        )
+    print(
+        f"queue depth max: {report.max_queue_depth}, "
+        f"mean: {report.mean_queue_depth:.1f}"
+    )
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-pipeline",
+        description="benchmark the single pass download and summary of PRONOM records",
+    )
+    parser.add_argument("--fmt-range", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
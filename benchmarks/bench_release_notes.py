@@ -0,0 +1,95 @@
+"""Benchmark parsing the whole release notes against streaming them
+until the end of the latest release note.
+
+Release notes of `--releases` releases, each with `--formats` new
+records, are made and the time to read the latest release from them is
+reported for each parser.
+
+    `python -m benchmarks.bench_release_notes --releases 5000`
+"""
+
+import argparse
+import time
+import xml.etree.ElementTree as etree
+
+from src.pronom_tools.pronom_tools import parse_release_xml
+
+RELEASE_NOTE = """<release_note>
+   <release_date>{day} August 2023</release_date>
+   <signature_filename>DROID_SignatureFile_V{version}.xml</signature_filename>
+   <release_outline name="New Records">
+{formats}
+   </release_outline>
+</release_note>
+"""
+
+FORMAT = """      <format>
+         <puid type="fmt">{puid}</puid>
+         <name>Synthetic Format {puid}</name>
+         <summary>Full entry added.</summary>
+      </format>"""
+
+
+def make_release_notes(releases: int, formats: int) -> str:
+    """Return release notes of `releases` releases of `formats` new
+    records each, newest first.
+    """
+    notes = []
+    for version in range(releases, 0, -1):
+        puids = range((version - 1) * formats + 1, version * formats + 1)
+        notes.append(
+            RELEASE_NOTE.format(
+                day=version % 28 + 1,
+                version=version,
+                formats="\n".join(FORMAT.format(puid=puid) for puid in puids),
+            )
+        )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        f"<release_notes>\n{''.join(notes)}</release_notes>\n"
+    )
+
+
+def parse_whole(release_xml: str) -> str:
+    """Read the latest release by parsing the whole release notes."""
+    root = etree.fromstring(release_xml.strip())
+    latest = root.find("release_note")
+    formats = latest.find("release_outline").findall("format")
+    return f"fmt/{formats[len(formats) - 1].find('puid').text}"
+
+
+def parse_streamed(release_xml: str) -> str:
+    """Read the latest release by streaming the release notes."""
+    return parse_release_xml(release_xml).latest_puid
+
+
+def time_parser(parser, release_xml: str, repeat: int) -> float:
+    """Return the mean time taken by a parser."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        parser(release_xml)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-release-notes",
+        description="benchmark parsing release notes whole against streaming them",
+    )
+    parser.add_argument("--releases", type=int, default=5000)
+    parser.add_argument("--formats", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    release_xml = make_release_notes(args.releases, args.formats)
+    assert parse_whole(release_xml) == parse_streamed(release_xml)
+    print(f"releases: {args.releases}, characters: {len(release_xml)}")
+    print(f"{'parser':<10} {'seconds':>10}")
+    for name, func in (("whole", parse_whole), ("streamed", parse_streamed)):
+        elapsed = time_parser(func, release_xml, args.repeat)
+        print(f"{name:<10} {elapsed:>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
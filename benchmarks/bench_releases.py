@@ -0,0 +1,92 @@
+"""Benchmark the `/requires_signatures` report on a database holding
+many releases.
+
+The indexed query on the normalized `records` table is compared with
+the original approach of decoding the latest summary from the
+`pronom` table and filtering it in Python.
+
+    `python -m benchmarks.bench_releases --releases 100 --records 2400`
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_stats import configure, make_summary, put_summary, timed
+from src.pronom_stats.pronom_stats import (
+    DEPRECATED,
+    FILTER_REQUIRES_SIGNATURE,
+    _get_records,
+    app,
+)
+
+
+def requires_signatures_blob(cur: sqlite3.Cursor) -> list[dict]:
+    """The original implementation of `/requires_signatures`."""
+    res = cur.execute(
+        "select summary from pronom where rowid = (select max(rowid) from pronom);"
+    ).fetchone()
+    summary = json.loads(res[0])
+    return [
+        item
+        for item in summary.get("pronom_data", [])
+        if item["signature"] is not True and item["description"] != DEPRECATED
+    ]
+
+
+def requires_signatures_sql(cur: sqlite3.Cursor) -> list[dict]:
+    """The indexed query used by `/requires_signatures`."""
+    return _get_records(cur, FILTER_REQUIRES_SIGNATURE)
+
+
+def time_query(cur: sqlite3.Cursor, query, requests: int) -> float:
+    """Return the mean latency in milliseconds of a query."""
+    start = time.perf_counter()
+    for _ in range(requests):
+        query(cur)
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-releases",
+        description="benchmark reports on a database holding many releases",
+    )
+    parser.add_argument("--releases", type=int, default=100)
+    parser.add_argument("--records", type=int, default=2400)
+    parser.add_argument("--requests", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure(tmp_dir)
+        with TestClient(app) as client:
+            start = time.perf_counter()
+            for idx in range(args.releases):
+                put_summary(
+                    client, make_summary(args.records, version=f"V{idx}", seed=idx)
+                )
+            ingest = (time.perf_counter() - start) / args.releases * 1000
+            cur = sqlite3.connect(os.environ["DATABASE_PATH"]).cursor()
+            assert requires_signatures_blob(cur) == requires_signatures_sql(cur)
+            print(
+                f"releases: {args.releases}, records: {args.records}, "
+                f"requests: {args.requests}, ingest: {ingest:.1f} ms/release"
+            )
+            print(f"{'query':<24} {'ms':>8}")
+            for name, query in (
+                ("blob decode", requires_signatures_blob),
+                ("indexed sql", requires_signatures_sql),
+            ):
+                print(f"{name:<24} {time_query(cur, query, args.requests):>8.2f}")
+            endpoint = timed(client, "/requires_signatures", args.requests)
+            print(f"{'/requires_signatures':<24} {endpoint:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Load benchmark for the PRONOM stats API using the FastAPI
+TestClient.
+
+A synthetic release is stored in a temporary database and each
+endpoint is requested repeatedly. Endpoints served from the decoded
+summary are timed with the in-memory summary cache warm, and with it
+invalidated before every request so that the summary is decoded per
+request. Endpoints served from the statistics and records tables don't
+use the cache and are timed once.
+
+    `python -m benchmarks.bench_stats --records 2400 --requests 200`
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from src.pronom_stats.pronom_stats import app
+
+AUTH = "benchmark"
+
+# Endpoints served from the decoded summary held by the cache.
+CACHED_ENDPOINTS = [
+    "/pronom_version",
+    "/pronom_summary",
+    "/pronom_summary?limit=100",
+]
+
+# Endpoints served from the statistics and records tables.
+TABLE_ENDPOINTS = [
+    "/signature_files",
+    "/records_count",
+    "/signature_count",
+    "/requires_signatures",
+    "/pronom_summary_csv",
+]
+
+
+def make_summary(records: int, version: str = "V116", seed: int = 0) -> dict:
+    """Create a synthetic PRONOM summary with the given number of
+    records.
+    """
+    rand = random.Random(seed)
+    pronom_data = []
+    for idx in range(1, records + 1):
+        puid_type = "x-fmt" if idx % 6 == 0 else "fmt"
+        pronom_data.append(
+            {
+                "name": f"Synthetic Format {idx} {rand.randint(1, 9)}.0",
+                "description": rand.choice(
+                    ["complete"] * 8 + ["outline", "deprecated"]
+                ),
+                "signature": rand.random() < 0.7,
+                "identifier": f"{puid_type}/{idx}",
+            }
+        )
+    return {
+        "release_notes_date": "2023-11-23",
+        "latest_puid": f"fmt/{records}",
+        "version": version,
+        "release_notes": "https://www.nationalarchives.gov.uk/aboutapps/pronom/release-notes.xml",
+        "sig_file": f"https://cdn.nationalarchives.gov.uk/documents/DROID_SignatureFile_{version}.xml",
+        "container_sig": "https://cdn.nationalarchives.gov.uk/documents/container-signature-20231127.xml",
+        "x_puid_const": "x-fmt/455",
+        "pronom_data": sorted(pronom_data, key=lambda item: item["name"]),
+    }
+
+
+def put_summary(client: TestClient, summary: dict):
+    """Store a summary using the API."""
+    resp = client.put(
+        "/pronom_summary",
+        content=json.dumps(summary),
+        headers={"auth": hashlib.sha256(AUTH.encode()).hexdigest()},
+    )
+    resp.raise_for_status()
+
+
+def timed(client: TestClient, path: str, requests: int, before=None) -> float:
+    """Return the mean latency in milliseconds of a GET request."""
+    elapsed = 0.0
+    for _ in range(requests):
+        if before:
+            before()
+        start = time.perf_counter()
+        client.get(path).raise_for_status()
+        elapsed += time.perf_counter() - start
+    return elapsed / requests * 1000
+
+
+def configure(tmp_dir: str) -> None:
+    """Point the API at a new database in a temporary directory."""
+    os.environ["SERVER_AUTH"] = AUTH
+    os.environ["DATABASE_PATH"] = str(Path(tmp_dir, "pronom-stats.db"))
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-stats", description="load benchmark for the PRONOM stats API"
+    )
+    parser.add_argument("--records", type=int, default=2400)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure(tmp_dir)
+        with TestClient(app) as client:
+            put_summary(client, make_summary(args.records))
+            print(f"records: {args.records}, requests: {args.requests}")
+            print(f"{'endpoint':<28} {'uncached ms':>12} {'cached ms':>10}")
+            for path in CACHED_ENDPOINTS:
+                misses = app.summary_cache.misses
+                uncached = timed(
+                    client, path, args.requests, app.summary_cache.invalidate
+                )
+                # Every uncached request must have decoded the summary.
+                assert app.summary_cache.misses - misses == args.requests
+                cached = timed(client, path, args.requests)
+                print(f"{path:<28} {uncached:>12.2f} {cached:>10.2f}")
+            print(f"{'endpoint':<28} {'ms':>12}")
+            for path in TABLE_ENDPOINTS:
+                print(f"{path:<28} {timed(client, path, args.requests):>12.2f}")
+            print("cache:", client.get("/summary_cache").json())
+
+
+if __name__ == "__main__":
+    main()
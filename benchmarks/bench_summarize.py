@@ -0,0 +1,65 @@
+"""Benchmark the PRONOM record summarizers over an export.
+
+Reports the mean time to summarize a record and the peak memory
+allocated while summarizing a single record for each summarizer.
+
+    `python -m benchmarks.bench_summarize --path /var/tmp/pronom-export`
+"""
+
+import argparse
+import time
+import tracemalloc
+from pathlib import Path
+
+from src.pronom_summary.pronom_summary import (
+    SUMMARIZER_STREAM,
+    SUMMARIZER_TREE,
+    summarize_xml,
+)
+
+FIXTURES = Path("tests", "fixtures", "export")
+
+
+def time_summarizer(xml: list[Path], summarizer: str, repeat: int) -> float:
+    """Return the mean time in seconds to summarize a record."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in xml:
+            summarize_xml(item, summarizer)
+    return (time.perf_counter() - start) / (len(xml) * repeat)
+
+
+def peak_memory(xml: list[Path], summarizer: str) -> int:
+    """Return the largest peak allocation in bytes for a record."""
+    peak = 0
+    tracemalloc.start()
+    for item in xml:
+        tracemalloc.reset_peak()
+        summarize_xml(item, summarizer)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    """Primary entry point for this script."""
+    parser = argparse.ArgumentParser(
+        prog="bench-summarize", description="benchmark PRONOM record summarizers"
+    )
+    parser.add_argument("--path", type=Path, default=Path("/var/tmp/pronom-export"))
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    path = args.path if args.path.exists() else FIXTURES
+    xml = sorted(path.glob("**/*.xml"))
+    repeat = max(args.repeat, 1000 // len(xml))
+    print(f"records: {len(xml)} ({path}), repeat: {repeat}")
+    print(f"{'summarizer':<12} {'us/record':>10} {'peak KiB':>10}")
+    for summarizer in (SUMMARIZER_TREE, SUMMARIZER_STREAM):
+        per_record = time_summarizer(xml, summarizer, repeat)
+        peak = peak_memory(xml, summarizer)
+        print(f"{summarizer:<12} {per_record * 1e6:>10.1f} {peak / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,8 +16,10 @@ from dotenv import load_dotenv
 
 try:
     from src.pronom_tools import pronom_tools
+    from src.pronom_tools.worker_pool import WorkerPool
 except ModuleNotFoundError:
     from pronom_tools import pronom_tools
+    from pronom_tools.worker_pool import WorkerPool
 
 
 # Set up logging.
@@ -67,17 +69,32 @@ async def cron_main():
         default=Path("/var/tmp/pronom-export"),
     )
 
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="number of worker processes to use for the run (defaults to the number of CPUs)",
+        required=False,
+        type=int,
+    )
+
     args = parser.parse_args()
 
-    if args.init:
-        logger.info("initializing database")
-        data = await pronom_tools.get_summary(pronom_path=args.path, clean=True)
-        pronom_tools.store_pronom_summary(data=data)
-        sys.exit()
-    release = pronom_tools.check_for_release()
-    if release:
-        data = await pronom_tools.get_summary(pronom_path=args.path, clean=True)
-        pronom_tools.store_pronom_summary(data=data)
+    # The pool is only started if there is work to do and summarizes
+    # the records as they are exported.
+    with WorkerPool(args.workers) as pool:
+        if args.init:
+            logger.info("initializing database")
+            data = await pronom_tools.get_summary(
+                pronom_path=args.path, clean=True, pool=pool
+            )
+            pronom_tools.store_pronom_summary(data=data)
+            sys.exit()
+        release = await pronom_tools.check_for_release()
+        if release:
+            data = await pronom_tools.get_summary(
+                pronom_path=args.path, clean=True, pool=pool
+            )
+            pronom_tools.store_pronom_summary(data=data)
 
 
 def main():
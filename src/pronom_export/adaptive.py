@@ -0,0 +1,144 @@
+"""Adaptive concurrency and backoff for PRONOM downloads.
+
+The number of requests in flight is controlled AIMD-style, as TCP
+controls its congestion window. The limit grows by one request per
+round trip while responses are quick and successful, and halves when
+the server responds `429 Too Many Requests` or `5xx`, or a request
+times out. A `Retry-After` header pauses all new requests for as long
+as the server asks.
+
+Failed requests are retried with exponential backoff and jitter, up to
+a fixed number of retries per record.
+"""
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Final
+
+# Limits on the number of requests in flight.
+DEFAULT_INITIAL_CONCURRENCY: Final[int] = 2
+MIN_CONCURRENCY: Final[int] = 1
+
+# The limit is multiplied by this factor when the server is overloaded.
+DECREASE_FACTOR: Final[float] = 0.5
+
+# The limit only grows while requests take no longer than this multiple
+# of the quickest request seen, or than the floor in seconds so that
+# jitter on very quick requests isn't taken for congestion.
+LATENCY_TOLERANCE: Final[float] = 2.0
+LATENCY_FLOOR: Final[float] = 0.05
+
+# Retries of a record and the base and cap of the backoff between them
+# in seconds.
+DEFAULT_MAX_RETRIES: Final[int] = 5
+DEFAULT_BACKOFF: Final[float] = 1.0
+MAX_BACKOFF: Final[float] = 60.0
+
+# Responses that mean the server is overloaded and the request can be
+# retried.
+RETRY_STATUSES: Final[frozenset] = frozenset({429, 500, 502, 503, 504})
+
+
+class TransientError(Exception):
+    """Exception to raise when a request can be retried later, with the
+    delay the server asked for, if any.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the number of seconds to wait from a `Retry-After` header
+    of either delay seconds or a HTTP date.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int, base: float = DEFAULT_BACKOFF, retry_after: float = None
+) -> float:
+    """Return the delay before retrying a request for the given attempt,
+    with full jitter, and no less than the server asked for.
+    """
+    delay = random.uniform(0, min(MAX_BACKOFF, base * 2**attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on the number of requests in flight.
+
+    Call `acquire()` before each request and `release()` after it with
+    the outcome. The limit starts at `initial` and stays between
+    `MIN_CONCURRENCY` and `maximum`.
+    """
+
+    def __init__(self, maximum: int, initial: int = DEFAULT_INITIAL_CONCURRENCY):
+        self.maximum = max(MIN_CONCURRENCY, maximum)
+        self.limit = float(min(self.maximum, max(MIN_CONCURRENCY, initial)))
+        self.peak = int(self.limit)
+        self.in_flight = 0
+        self.min_latency = None
+        self.paused_until = 0.0
+        self._decreased = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a free slot and any pause to end, returning the
+        time the request was started.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        while (pause := self.paused_until - time.monotonic()) > 0:
+            await asyncio.sleep(pause)
+        return time.monotonic()
+
+    async def release(
+        self, started: float, ok: bool, retry_after: float | None = None
+    ) -> None:
+        """Free the slot of a request started at `started` and adjust
+        the limit for its outcome.
+        """
+        now = time.monotonic()
+        if ok:
+            self._increase(now - started)
+        else:
+            self._decrease(started, now, retry_after)
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _increase(self, latency: float) -> None:
+        """Grow the limit by one request per round trip while requests
+        are quick.
+        """
+        if self.min_latency is None or latency < self.min_latency:
+            self.min_latency = latency
+        if latency > max(self.min_latency * LATENCY_TOLERANCE, LATENCY_FLOOR):
+            return
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        self.peak = max(self.peak, int(self.limit))
+
+    def _decrease(self, started: float, now: float, retry_after: float | None):
+        """Halve the limit, once for all the requests that were already
+        in flight when it was last decreased, and pause if the server
+        asked for it.
+        """
+        if retry_after:
+            self.paused_until = max(self.paused_until, now + retry_after)
+        if started < self._decreased:
+            return
+        self._decreased = now
+        self.limit = max(MIN_CONCURRENCY, self.limit * DECREASE_FACTOR)
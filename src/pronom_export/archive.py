@@ -0,0 +1,109 @@
+"""Single file archive of a PRONOM export.
+
+An export written to a path ending in `ARCHIVE_SUFFIX` is stored as one
+SQLite database rather than a folder of XML files. Each record is
+compressed and keyed by its PUID so that it can be read on its own,
+with the validators and digest of the record that would otherwise be
+kept in the export manifest.
+
+The archive uses SQLite's default rollback journal so that a snapshot
+is only ever the one file and can be copied between hosts as-is.
+"""
+
+import hashlib
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Final, Iterator
+
+ARCHIVE_SUFFIX: Final[str] = ".sqlite"
+
+# Records are only compressed once, when they are written, so favour
+# size over speed.
+COMPRESSION_LEVEL: Final[int] = 9
+
+
+def is_archive(pronom_path: Path) -> bool:
+    """Return True if an export path is a single file archive."""
+    return Path(pronom_path).suffix == ARCHIVE_SUFFIX
+
+
+class ExportArchive:
+    """PRONOM records stored in a single SQLite file keyed by PUID.
+
+    Writes are committed when the archive is closed. Use as a context
+    manager or call `close()`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path)
+        self.con.execute(
+            """create table if not exists records (
+                puid text primary key,
+                data blob,
+                size integer,
+                etag text,
+                last_modified text,
+                sha256 text
+            );"""
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, puid: str, data: bytes, entry: dict = None) -> None:
+        """Store a record with the manifest entry describing it."""
+        entry = entry or {}
+        self.con.execute(
+            "insert or replace into records values (?, ?, ?, ?, ?, ?)",
+            (
+                puid,
+                zlib.compress(data, COMPRESSION_LEVEL),
+                len(data),
+                entry.get("etag"),
+                entry.get("last_modified"),
+                entry.get("sha256") or hashlib.sha256(data).hexdigest(),
+            ),
+        )
+
+    def remove(self, puid: str) -> None:
+        """Remove a record from the archive if it is stored."""
+        self.con.execute("delete from records where puid = ?", (puid,))
+
+    def read(self, puid: str) -> bytes | None:
+        """Return a record, or None if it isn't stored."""
+        row = self.con.execute(
+            "select data from records where puid = ?", (puid,)
+        ).fetchone()
+        return zlib.decompress(row[0]) if row else None
+
+    def records(self) -> Iterator[tuple[str, bytes]]:
+        """Yield the PUID and contents of every record stored."""
+        for puid, data in self.con.execute("select puid, data from records"):
+            yield puid, zlib.decompress(data)
+
+    def manifest(self) -> dict:
+        """Return the manifest entries of the records stored, in the
+        shape of an export manifest.
+        """
+        return {
+            puid: {
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha256": sha256,
+                "size": size,
+            }
+            for puid, etag, last_modified, sha256, size in self.con.execute(
+                "select puid, etag, last_modified, sha256, size from records"
+            )
+        }
+
+    def close(self) -> None:
+        """Commit any writes and close the archive."""
+        self.con.commit()
+        self.con.close()
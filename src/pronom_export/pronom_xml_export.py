@@ -6,15 +6,46 @@ Originally: https://github.com/ffdev-info/pronom-xml-export
 # pylint: disable=R0801
 
 import argparse
+import asyncio
+import hashlib
+import json
 import logging
-import multiprocessing
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 from typing import Final
 
 import requests
-from tenacity import retry, wait_exponential
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+try:
+    from src.pronom_export.adaptive import (
+        DEFAULT_BACKOFF,
+        DEFAULT_MAX_RETRIES,
+        RETRY_STATUSES,
+        AdaptiveConcurrency,
+        TransientError,
+        backoff_delay,
+        parse_retry_after,
+    )
+    from src.pronom_export.archive import ARCHIVE_SUFFIX, ExportArchive, is_archive
+    from src.pronom_tools.worker_pool import WorkerPool
+except ModuleNotFoundError:
+    from pronom_export.adaptive import (
+        DEFAULT_BACKOFF,
+        DEFAULT_MAX_RETRIES,
+        RETRY_STATUSES,
+        AdaptiveConcurrency,
+        TransientError,
+        backoff_delay,
+        parse_retry_after,
+    )
+    from pronom_export.archive import ARCHIVE_SUFFIX, ExportArchive, is_archive
+    from pronom_tools.worker_pool import WorkerPool
 
 # Set up logging.
 logging.basicConfig(
@@ -40,6 +71,52 @@ class PronomExportException(Exception):
 # url through which to access Pronom data...
 BASE_URL: Final[str] = "https://www.nationalarchives.gov.uk/PRONOM/"
 
+HEADERS: Final[dict] = {"User-Agent": "exponentialDK-PRONOM-Export/0.0.0"}
+
+# Export engines. The async engine downloads records from a single
+# process over one keep-alive connection pool, adapting the number of
+# requests in flight to the server. The pool engine is the original
+# multiprocessing implementation and is kept as a fallback.
+ENGINE_ASYNC: Final[str] = "async"
+ENGINE_POOL: Final[str] = "pool"
+ENGINES: Final[list] = [ENGINE_ASYNC, ENGINE_POOL]
+DEFAULT_ENGINE: Final[str] = ENGINE_ASYNC
+
+# Defaults for the async engine: the most requests that can be in
+# flight and the sustained number of requests per second.
+DEFAULT_CONCURRENCY: Final[int] = 10
+DEFAULT_RATE: Final[float] = 20.0
+
+# Incremental exports keep a manifest of the validators and digests of
+# the records written to the export folder.
+MANIFEST_NAME: Final[str] = "manifest.json"
+
+# Outcome of requesting a single record.
+FETCHED: Final[str] = "fetched"
+SKIPPED: Final[str] = "skipped"
+INVALID: Final[str] = "invalid"
+FAILED: Final[str] = "failed"
+
+
+@dataclass
+class ExportReport:
+    """Summary of the outcome of an export.
+
+    `failures` maps the PUIDs of records that couldn't be downloaded
+    once all their retries were used to the last error.
+    """
+
+    fetched: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    failed: int = 0
+    retries: int = 0
+    failures: dict = field(default_factory=dict)
+
+    def add(self, result: str) -> None:
+        """Count the result of a single record request."""
+        setattr(self, result, getattr(self, result) + 1)
+
 
 def check_record(ffb: str) -> bool:
     """Ensure that we're downloading an XML record.
@@ -52,23 +129,234 @@ def check_record(ffb: str) -> bool:
     return False
 
 
-@retry(wait=wait_exponential(multiplier=1, min=4, max=10))
-def download_and_save_puid(puid_filename_pair: tuple) -> None:
-    """Perform the HTTP request and save routine to save the
-    PRONOM record to disk.
-    """
-    puid_url, file_name = puid_filename_pair
-    header = {"User-Agent": "exponentialDK-PRONOM-Export/0.0.0"}
-    logger.info(puid_url)
-    request = requests.get(puid_url, timeout=30, headers=header)
-    test_string = request.text[:14]
+def save_record(text: str, file_name: Path) -> bool:
+    """Save a PRONOM record to disk if it looks like an XML record."""
+    test_string = text[:14]
     if not check_record(test_string):
         logger.info("not writing record: %s (%s)", file_name, test_string)
-        return
+        return False
     with open(file_name, "w", encoding="utf-8") as fmt_record:
-        fmt_record.write(request.text)
+        fmt_record.write(text)
+    return True
+
+
+def puid_from_url(puid_url: str) -> str:
+    """Return the PUID for a record URL, e.g. `.../PRONOM/fmt/1.xml`
+    returns `fmt/1`.
+    """
+    puid_type, file_name = puid_url.rsplit("/", 2)[1:]
+    return f"{puid_type}/{file_name.replace('.xml', '')}"
+
+
+def make_manifest_entry(data: bytes, headers: dict) -> dict:
+    """Create a manifest entry for a record written to disk."""
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+    }
+
+
+def matches_manifest(file_name: Path, entry: dict) -> bool:
+    """Ensure the record on disk is the one described by its manifest
+    entry.
+    """
+    try:
+        if file_name.stat().st_size != entry.get("size"):
+            return False
+        return hashlib.sha256(file_name.read_bytes()).hexdigest() == entry.get("sha256")
+    except FileNotFoundError:
+        return False
+
+
+def load_manifest(pronom_path: Path) -> dict:
+    """Load the export manifest mapping PUIDs to the validators and
+    digests of the records on disk.
+    """
+    try:
+        with open(Path(pronom_path, MANIFEST_NAME), encoding="utf-8") as manifest:
+            return json.load(manifest)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(pronom_path: Path, manifest: dict) -> None:
+    """Save the export manifest."""
+    Path(pronom_path).mkdir(parents=True, exist_ok=True)
+    with open(Path(pronom_path, MANIFEST_NAME), "w", encoding="utf-8") as out:
+        json.dump(manifest, out, indent=1, sort_keys=True)
+
+
+def pack_export(pronom_path: Path, archive_path: Path) -> int:
+    """Store the records of an export folder in an archive, with their
+    manifest entries if the export has a manifest, and return the
+    number of records stored.
+    """
+    manifest = load_manifest(pronom_path)
+    count = 0
+    with ExportArchive(archive_path) as archive:
+        for puid_type in ("fmt", "x-fmt"):
+            for item in Path(pronom_path, puid_type).glob(f"{puid_type}*.xml"):
+                puid = f"{puid_type}/{item.stem.removeprefix(puid_type)}"
+                archive.write(puid, item.read_bytes(), manifest.get(puid))
+                count += 1
+    return count
+
+
+def fetch_puid(
+    http: requests.Session,
+    puid_filename_pair: tuple,
+    entry: dict = None,
+    save: bool = True,
+) -> tuple[str, dict, bytes]:
+    """Download a PRONOM record using the given HTTP client and,
+    if `save`, write it to disk.
+
+    `http` is anything with a requests-like `get`, i.e. a
+    `requests.Session` or the `requests` module itself.
+
+    If a manifest `entry` is supplied and still describes the record
+    on disk a conditional GET is made and the record is skipped if the
+    server responds `304 Not Modified`. A `TransientError` is raised if
+    the server is overloaded. If the record isn't saved the
+    caller keeps it and `entry` describes the copy it holds. The
+    result, the manifest entry describing the record and the record
+    downloaded, if any, are returned.
+    """
+    puid_url, file_name = puid_filename_pair
+    headers = dict(HEADERS)
+    if entry and (not save or matches_manifest(file_name, entry)):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    logger.info(puid_url)
+    request = http.get(puid_url, timeout=30, headers=headers)
+    if request.status_code == 304:
+        return SKIPPED, entry, None
+    if request.status_code in RETRY_STATUSES:
+        raise TransientError(
+            f"{puid_url}: HTTP {request.status_code}",
+            parse_retry_after(request.headers.get("Retry-After")),
+        )
+    data = request.text.encode("utf-8")
+    if not save:
+        if not check_record(request.text[:14]):
+            return INVALID, None, None
+        return FETCHED, make_manifest_entry(data, request.headers), data
+    if not save_record(request.text, file_name):
+        return INVALID, None, None
+    return FETCHED, make_manifest_entry(data, request.headers), data
+
+
+def fetch_and_save_puid(
+    http: requests.Session, puid_filename_pair: tuple, entry: dict = None
+) -> tuple[str, dict]:
+    """Download a PRONOM record using the given HTTP client and save
+    it to disk, returning the result and the manifest entry describing
+    the record on disk. See `fetch_puid`.
+    """
+    result, entry, _ = fetch_puid(http, puid_filename_pair, entry)
+    return result, entry
+
+
+def _give_up(retry_state) -> tuple[str, str, str]:
+    """Return the outcome of a record that failed on every attempt."""
+    puid = puid_from_url(retry_state.args[0][0])
+    return puid, FAILED, str(retry_state.outcome.exception())
+
+
+@retry(
+    wait=wait_exponential(multiplier=1, min=4, max=10),
+    stop=stop_after_attempt(DEFAULT_MAX_RETRIES + 1),
+    retry_error_callback=_give_up,
+)
+def download_and_save_puid(puid_filename_pair: tuple) -> tuple[str, str, str]:
+    """Perform the HTTP request and save routine to save the
+    PRONOM record to disk, returning the PUID, the result and the
+    error if the record failed.
+    """
+    result, _ = fetch_and_save_puid(requests, puid_filename_pair)
     time.sleep(0.5)
-    return
+    return puid_from_url(puid_filename_pair[0]), result, None
+
+
+class TokenBucket:
+    """Token bucket rate limiter for the async export engine.
+
+    Tokens are added at `rate` per second up to `capacity`, allowing
+    short bursts while keeping the sustained request rate at `rate`.
+    A rate of zero or less disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: int = None):
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """Add the tokens accrued since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """Create a HTTP session whose keep-alive connection pool can
+    serve `pool_size` concurrent requests.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+async def download_and_save_puid_async(
+    puid_filename_pair: tuple,
+    session: requests.Session,
+    executor: ThreadPoolExecutor,
+    controller: AdaptiveConcurrency,
+    limiter: TokenBucket,
+    entry: dict = None,
+    save: bool = True,
+) -> tuple[str, dict, bytes]:
+    """Download and save a PRONOM record from the event loop.
+
+    The blocking request runs on `executor` so that the requests
+    allowed in flight by `controller` share the session's connection
+    pool. The controller is told whether the server was overloaded.
+    """
+    loop = asyncio.get_running_loop()
+    await limiter.acquire()
+    started = await controller.acquire()
+    ok, retry_after = True, None
+    try:
+        return await loop.run_in_executor(
+            executor,
+            partial(fetch_puid, session, puid_filename_pair, entry, save),
+        )
+    except (TransientError, requests.exceptions.RequestException) as err:
+        ok, retry_after = False, getattr(err, "retry_after", None)
+        raise
+    finally:
+        await controller.release(started, ok, retry_after)
 
 
 def get_x_fmt_range() -> int:
@@ -82,34 +370,240 @@ def get_x_fmt_range() -> int:
     return x_fmt_limit + 1
 
 
-def export_pronom_data(pronom_path: Path, fmt_range: int = None):
-    """Export PRONOM data and write locally"""
+def make_puid_filename_pairs(
+    pronom_path: Path,
+    puid_type: str,
+    puid_range: int,
+    base_url: str = BASE_URL,
+    make_dirs: bool = True,
+) -> list[tuple]:
+    """Create a list of puid urls and filenames to save the outputs to
+    and, if `make_dirs`, make sure the directory to write to exists.
+    """
+    puid_type_url = f"{base_url}{puid_type}/"
+    new_dir = Path(pronom_path, puid_type)
+    if make_dirs:
+        new_dir.mkdir(parents=True, exist_ok=True)
+    puid_filename_pairs = []
+    for idx in range(1, puid_range):
+        puid_url = f"{puid_type_url}{idx}.xml"
+        file_name = new_dir / Path(f"{puid_type}{idx}.xml")
+        puid_filename_pairs.append((puid_url, file_name))
+    return puid_filename_pairs
+
 
+def _get_puid_ranges(fmt_range: int) -> list[tuple]:
+    """Return the fmt and x-fmt ranges to download."""
     if not fmt_range:
         raise PronomExportException("fmt puid range is not set")
-
     x_fmt = ("x-fmt", get_x_fmt_range())
     fmt = ("fmt", fmt_range)
-
-    logger.info("pronom export path: %s", pronom_path)
     logger.info("downloading: %s %s", fmt, x_fmt)
+    return [fmt, x_fmt]
 
-    for puid_type, puid_range in [fmt, x_fmt]:
-        # Create a directory to write to.
-        puid_type_url = f"{BASE_URL}{puid_type}/"
-        new_dir = Path(pronom_path, puid_type)
-        new_dir.mkdir(parents=True, exist_ok=True)
 
-        # Create a list of puid urls and filenames to save the outputs to.
-        puid_filename_pairs = []
-        for idx in range(1, puid_range):
-            puid_url = f"{puid_type_url}{idx}.xml"
-            file_name = new_dir / Path(f"{puid_type}{idx}.xml")
-            puid_filename_pairs.append((puid_url, file_name))
+def prioritize(puid_filename_pairs: list[tuple], priority_puids: set) -> list:
+    """Move the records known to have changed to the front of the
+    download queue.
+    """
+    return sorted(
+        puid_filename_pairs,
+        key=lambda pair: puid_from_url(pair[0]) not in priority_puids,
+    )
+
 
-        # Download PRONOM data.
-        with multiprocessing.Pool() as pool:
-            pool.map(download_and_save_puid, puid_filename_pairs)
+async def export_pronom_data_async(
+    pronom_path: Path,
+    fmt_range: int = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    base_url: str = BASE_URL,
+    incremental: bool = False,
+    priority_puids: list = None,
+    records: asyncio.Queue = None,
+    save: bool = True,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+) -> ExportReport:
+    """Export PRONOM data and write locally using a single process
+    and a shared keep-alive connection pool.
+
+    The number of requests in flight adapts to the server, up to
+    `concurrency`, and requests are started at no more than `rate` per
+    second. Requests the server is too busy for, or that time out, are
+    retried up to `max_retries` times with exponential `backoff`, after
+    which the record is reported in the failures of the export.
+
+    An `incremental` export uses conditional GETs against the export
+    manifest so that only new or changed records are written.
+    `priority_puids`, e.g. those listed in the release notes, are
+    downloaded first and unconditionally.
+
+    If a `records` queue is supplied the outcome of each request is put
+    on it as soon as the request completes, as a tuple of the PUID, the
+    result, the record downloaded, if any, and the path of the record
+    on disk. Records are only written to disk if `save`, exports that
+    don't save records can't be incremental.
+
+    If `pronom_path` is an archive, see `is_archive`, records are
+    written to the archive rather than to a folder, and the archive
+    holds the manifest of an incremental export.
+    """
+    logger.info("pronom export path: %s", pronom_path)
+    if incremental and not save:
+        logger.warning("incremental export not supported without saving records")
+        incremental = False
+    archive = ExportArchive(pronom_path) if save and is_archive(pronom_path) else None
+    puid_filename_pairs = []
+    for puid_type, puid_range in _get_puid_ranges(fmt_range):
+        puid_filename_pairs.extend(
+            make_puid_filename_pairs(
+                pronom_path, puid_type, puid_range, base_url, save and archive is None
+            )
+        )
+    priority_puids = set(priority_puids or [])
+    puid_filename_pairs = prioritize(puid_filename_pairs, priority_puids)
+    manifest = {}
+    if incremental:
+        manifest = load_manifest(pronom_path) if archive is None else archive.manifest()
+    controller = AdaptiveConcurrency(concurrency)
+    limiter = TokenBucket(rate=rate, capacity=concurrency)
+    report = ExportReport()
+
+    async def download_record(puid: str, pair: tuple) -> tuple[str, dict, bytes]:
+        """Download a record, retrying while the server is overloaded.
+        Records that fail keep their manifest entry.
+        """
+        for attempt in range(max_retries + 1):
+            try:
+                return await download_and_save_puid_async(
+                    pair,
+                    session,
+                    executor,
+                    controller,
+                    limiter,
+                    None if puid in priority_puids else manifest.get(puid),
+                    save and archive is None,
+                )
+            except (TransientError, requests.exceptions.RequestException) as err:
+                if attempt == max_retries:
+                    report.failures[puid] = str(err)
+                    return FAILED, manifest.get(puid), None
+                report.retries += 1
+                retry_after = getattr(err, "retry_after", None)
+                await asyncio.sleep(backoff_delay(attempt, backoff, retry_after))
+        return FAILED, manifest.get(puid), None
+
+    async def export_record(puid: str, pair: tuple) -> tuple[str, dict]:
+        """Download a record and hand it on to the `records` queue."""
+        result, entry, data = await download_record(puid, pair)
+        if archive is not None and result == FETCHED:
+            archive.write(puid, data, entry)
+        elif archive is not None and result == INVALID:
+            archive.remove(puid)
+        if records is not None:
+            await records.put((puid, result, data, pair[1]))
+        return result, entry
+
+    with (
+        make_session(concurrency) as session,
+        ThreadPoolExecutor(max_workers=concurrency) as executor,
+        nullcontext() if archive is None else archive,
+    ):
+        puids = [puid_from_url(pair[0]) for pair in puid_filename_pairs]
+        results = await asyncio.gather(
+            *[
+                export_record(puid, pair)
+                for puid, pair in zip(puids, puid_filename_pairs)
+            ]
+        )
+    for puid, (result, entry) in zip(puids, results):
+        report.add(result)
+        if entry:
+            manifest[puid] = entry
+        else:
+            manifest.pop(puid, None)
+    if incremental and archive is None:
+        save_manifest(pronom_path, manifest)
+    logger.info(
+        "records fetched: %s, skipped (not modified): %s, invalid: %s, failed: %s",
+        report.fetched,
+        report.skipped,
+        report.invalid,
+        report.failed,
+    )
+    logger.info(
+        "retries: %s, concurrency peak: %s, final: %s",
+        report.retries,
+        controller.peak,
+        int(controller.limit),
+    )
+    log_failures(report)
+    return report
+
+
+def log_failures(report: ExportReport) -> None:
+    """Log the records that couldn't be downloaded."""
+    for puid, error in sorted(report.failures.items()):
+        logger.error("record failed: %s (%s)", puid, error)
+
+
+def export_pronom_data(
+    pronom_path: Path,
+    fmt_range: int = None,
+    engine: str = DEFAULT_ENGINE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    base_url: str = BASE_URL,
+    incremental: bool = False,
+    pool: WorkerPool = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+) -> ExportReport:
+    """Export PRONOM data and write locally.
+
+    Records are downloaded by the async engine unless another `engine`
+    is given. It must not be called from a running event loop, await
+    `export_pronom_data_async` instead. Incremental exports
+    are only supported by the async engine.
+
+    The pool engine downloads records using the given worker `pool`,
+    or a pool created for the export, and always retries a record up
+    to `DEFAULT_MAX_RETRIES` times.
+    """
+    if engine == ENGINE_ASYNC:
+        return asyncio.run(
+            export_pronom_data_async(
+                pronom_path=pronom_path,
+                fmt_range=fmt_range,
+                concurrency=concurrency,
+                rate=rate,
+                base_url=base_url,
+                incremental=incremental,
+                max_retries=max_retries,
+            )
+        )
+    if is_archive(pronom_path):
+        raise PronomExportException("archives are only supported by the async engine")
+    if incremental:
+        logger.warning("incremental export not supported by the pool engine")
+    logger.info("pronom export path: %s", pronom_path)
+    puid_filename_pairs = []
+    for puid_type, puid_range in _get_puid_ranges(fmt_range):
+        puid_filename_pairs.extend(
+            make_puid_filename_pairs(pronom_path, puid_type, puid_range, base_url)
+        )
+    # Download PRONOM data. Each task is a slow network request so
+    # they are handed out one at a time.
+    report = ExportReport()
+    with WorkerPool() if pool is None else nullcontext(pool) as workers:
+        for puid, result, error in workers.imap_unordered(
+            download_and_save_puid, puid_filename_pairs, chunksize=1
+        ):
+            report.add(result)
+            if error:
+                report.failures[puid] = error
+    log_failures(report)
+    return report
 
 
 def main():
@@ -138,13 +632,78 @@ def main():
         default=Path("/var/tmp/pronom-export"),
     )
 
+    parser.add_argument(
+        "--engine",
+        "-e",
+        help="export engine, 'async' (single process, pooled connections) or 'pool' (multiprocessing fallback)",
+        required=False,
+        choices=ENGINES,
+        default=DEFAULT_ENGINE,
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        help="most requests in flight, the number in flight adapts to the server up to this (async engine only)",
+        required=False,
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+    )
+
+    parser.add_argument(
+        "--rate",
+        "-r",
+        help="maximum number of requests per second, 0 to disable (async engine only)",
+        required=False,
+        type=float,
+        default=DEFAULT_RATE,
+    )
+
+    parser.add_argument(
+        "--incremental",
+        "-i",
+        help="only write new or changed records using the export manifest (async engine only)",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--max-retries",
+        help="retries of a record before it is reported as failed (async engine only)",
+        required=False,
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+    )
+
+    parser.add_argument(
+        "--pack",
+        help=f"store the records of an existing export folder in an archive at --path (ending '{ARCHIVE_SUFFIX}')",
+        required=False,
+        type=Path,
+    )
+
     args = parser.parse_args()
     if len(sys.argv) <= 1:
         parser.print_help()
         sys.exit()
+    if args.pack:
+        if not is_archive(args.path):
+            parser.error(f"--path must end '{ARCHIVE_SUFFIX}' to pack an export")
+        logger.info("records packed: %s", pack_export(args.pack, args.path))
+        sys.exit()
     time_start = time.perf_counter()  # time script execution time roughly...
-    export_pronom_data(pronom_path=args.path, fmt_range=args.fmt_range)
+    report = export_pronom_data(
+        pronom_path=args.path,
+        fmt_range=args.fmt_range,
+        engine=args.engine,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        incremental=args.incremental,
+        max_retries=args.max_retries,
+    )
     logger.info("execution time: %s seconds", str(time.perf_counter() - time_start))
+    if report.failures:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
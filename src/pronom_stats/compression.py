@@ -0,0 +1,105 @@
+"""Response compression for the PRONOM stats API.
+
+Large payloads are serialized and compressed once per release and the
+variant to serve is chosen from the `Accept-Encoding` header of each
+request. gzip is always available. brotli and zstd are used when the
+optional `brotli` and `zstandard` packages are installed.
+"""
+
+import gzip
+import logging
+from typing import Final
+
+try:
+    import brotli
+except ModuleNotFoundError:
+    brotli = None
+
+try:
+    import zstandard
+except ModuleNotFoundError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+IDENTITY: Final[str] = "identity"
+GZIP: Final[str] = "gzip"
+BROTLI: Final[str] = "br"
+ZSTD: Final[str] = "zstd"
+
+# Compression levels. Payloads are only compressed once per release
+# so they favour size over speed.
+GZIP_LEVEL: Final[int] = 9
+BROTLI_QUALITY: Final[int] = 9
+ZSTD_LEVEL: Final[int] = 19
+
+
+def available_encodings() -> list[str]:
+    """Return the supported content encodings in order of preference."""
+    encodings = []
+    if zstandard is not None:
+        encodings.append(ZSTD)
+    if brotli is not None:
+        encodings.append(BROTLI)
+    encodings.append(GZIP)
+    return encodings
+
+
+# Content encodings that may be applied to a response.
+ENCODINGS: Final[list] = available_encodings()
+
+
+def negotiate(accept_encoding: str | None) -> str:
+    """Return the preferred supported encoding acceptable to a client
+    according to its `Accept-Encoding` header.
+    """
+    if not accept_encoding:
+        return IDENTITY
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = IDENTITY, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compress data with a supported content encoding."""
+    if encoding == IDENTITY:
+        return data
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == BROTLI:
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"unsupported content encoding: {encoding}")
+
+
+def make_variant_etag(etag: str, encoding: str) -> str:
+    """Make the ETag of an encoded variant of a representation."""
+    if encoding == IDENTITY:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_variant_etag(etag: str) -> str:
+    """Return the ETag of the representation an encoded variant was
+    made from.
+    """
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return f'{etag[: -len(suffix)]}"'
+    return etag
@@ -0,0 +1,127 @@
+"""Conditional GET support for the PRONOM stats API.
+
+The data served by the API only changes when a new release is stored,
+so every read endpoint can share one validator, an ETag and a
+Last-Modified time derived from the latest release. Requests that
+present a matching `If-None-Match` or `If-Modified-Since` header are
+answered with `304 Not Modified` without running the endpoint.
+"""
+
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Final
+
+from fastapi import Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.base import BaseHTTPMiddleware
+
+try:
+    from src.pronom_stats.compression import make_variant_etag, strip_variant_etag
+except ModuleNotFoundError:
+    from pronom_stats.compression import make_variant_etag, strip_variant_etag
+
+logger = logging.getLogger(__name__)
+
+# Default number of seconds a response can be cached for before it is
+# revalidated.
+DEFAULT_MAX_AGE: Final[int] = 60
+
+# Methods that can be answered conditionally.
+CONDITIONAL_METHODS: Final[tuple] = ("GET", "HEAD")
+
+
+def make_etag(release: int, version: str, ingested: int) -> str:
+    """Make a strong ETag for a stored release."""
+    return f'"{release}-{version}-{ingested}"'
+
+
+def matching_etag(if_none_match: str, etag: str) -> str | None:
+    """Return the entity tag listed in an `If-None-Match` header that
+    matches the current ETag, or one of its encoded variants.
+    """
+    for tag in if_none_match.split(","):
+        tag = tag.strip().removeprefix("W/")
+        if tag == "*":
+            return etag
+        if strip_variant_etag(tag) == etag:
+            return tag
+    return None
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: int | None = None
+) -> bool:
+    """Evaluate the conditional headers of a request against the
+    validators of the current data. Encoded variants of a
+    representation match its ETag.
+
+    `If-Modified-Since` is only considered when there is no
+    `If-None-Match` header, see RFC 9110 13.2.2.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return matching_etag(if_none_match, etag) is not None
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return last_modified <= since
+
+
+class ConditionalGetMiddleware(BaseHTTPMiddleware):
+    """Add ETag, Last-Modified and Cache-Control headers to successful
+    read responses and answer matching conditional requests with 304.
+
+    `validator` is called in the threadpool and returns the ETag and
+    Last-Modified time (seconds since the epoch, or None) of the
+    current data, or None when there is nothing to validate. Paths in
+    `exclude` are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app,
+        validator: Callable[[], tuple[str, int | None] | None],
+        exclude: tuple = (),
+        max_age: int = DEFAULT_MAX_AGE,
+    ):
+        super().__init__(app)
+        self.validator = validator
+        self.exclude = exclude
+        self.cache_control = f"public, max-age={max_age}"
+
+    async def dispatch(self, request: Request, call_next) -> Response:
+        if (
+            request.method not in CONDITIONAL_METHODS
+            or request.url.path in self.exclude
+        ):
+            return await call_next(request)
+        current = await run_in_threadpool(self.validator)
+        if current is None:
+            return await call_next(request)
+        etag, last_modified = current
+        headers = {"ETag": etag, "Cache-Control": self.cache_control}
+        if last_modified is not None:
+            headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+        if is_not_modified(request, etag, last_modified):
+            # Identify the variant the client holds.
+            headers["ETag"] = (
+                matching_etag(request.headers.get("if-none-match", ""), etag) or etag
+            )
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response = await call_next(request)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        if await run_in_threadpool(self.validator) != current:
+            # A release was stored while responding, so the response
+            # may not match the validators read before it.
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        encoding = response.headers.get("content-encoding")
+        if encoding:
+            headers["ETag"] = make_variant_etag(etag, encoding)
+        response.headers.update(headers)
+        return response
@@ -0,0 +1,111 @@
+"""SQLite connection management for the PRONOM stats API.
+
+The database is opened in WAL mode so that readers are not blocked by
+a writer. Read connections are pooled and handed out to endpoints
+running in the threadpool, while all writes go through one dedicated
+connection guarded by a lock.
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Final, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Default number of pooled read connections.
+DEFAULT_READERS: Final[int] = 8
+
+# Default time in seconds to wait for a lock on the database, or for a
+# read connection when all of them are in use.
+DEFAULT_BUSY_TIMEOUT: Final[float] = 5.0
+
+
+class DatabaseException(Exception):
+    """Exception to raise when a database connection is unavailable."""
+
+
+class Database:
+    """Pool of read connections and a dedicated writer for a SQLite
+    database.
+
+    Read connections are created on first use up to `readers`. Use
+    `reader()` and `writer()` as context managers, and call `close()`
+    when the app shuts down.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        readers: int = DEFAULT_READERS,
+        busy_timeout: float = DEFAULT_BUSY_TIMEOUT,
+    ):
+        self.path = path
+        self.readers = max(1, readers)
+        self.busy_timeout = busy_timeout
+        self._pool = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        mode = self._writer.execute("pragma journal_mode=wal;").fetchone()[0]
+        logger.info("database journal mode: %s", mode)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection that can be used from any thread."""
+        con = sqlite3.connect(
+            self.path, timeout=self.busy_timeout, check_same_thread=False
+        )
+        con.execute(f"pragma busy_timeout={int(self.busy_timeout * 1000)};")
+        self._connections.append(con)
+        return con
+
+    def _acquire(self) -> sqlite3.Connection:
+        """Take a read connection from the pool, creating one if the
+        pool is not yet full.
+        """
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._connections) - 1 < self.readers:
+                return self._connect()
+        try:
+            return self._pool.get(timeout=self.busy_timeout)
+        except queue.Empty as err:
+            raise DatabaseException(
+                f"no read connection available after {self.busy_timeout}s"
+            ) from err
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Cursor]:
+        """Provide a cursor on a pooled read connection."""
+        con = self._acquire()
+        try:
+            yield con.cursor()
+        finally:
+            self._pool.put(con)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Cursor]:
+        """Provide a cursor on the writer connection, committing on
+        success and rolling back on error.
+        """
+        with self._write_lock:
+            try:
+                yield self._writer.cursor()
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def close(self) -> None:
+        """Close every connection."""
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections = []
@@ -0,0 +1,77 @@
+"""Differences between the records of two stored PRONOM releases.
+
+Records are compared by PUID using the unique (release, puid) index of
+the records table, so a diff is three indexed set operations: records
+only in the new release, records only in the old release, and records
+in both whose name, status or signature changed. Records without a PUID
+can't be compared and are left out.
+"""
+
+import sqlite3
+from typing import Final
+
+DEPRECATED: Final[str] = "deprecated"
+
+# Categories of change reported in a diff, in display order.
+DIFF_KEYS: Final[list] = [
+    "added",
+    "removed",
+    "deprecated",
+    "gained_signature",
+    "lost_signature",
+    "renamed",
+    "status_changed",
+]
+
+
+def compute_diff(cur: sqlite3.Cursor, old: int, new: int) -> dict:
+    """Return the changes to the records between two releases, each a
+    list of records in the order of the new release.
+
+    A record can appear in more than one category, e.g. a deprecated
+    record also has its status changed.
+    """
+    diff = {key: [] for key in DIFF_KEYS}
+    added = cur.execute(
+        """select puid, name from records as new
+        where release = ? and puid is not null and not exists (
+            select 1 from records where release = ? and puid = new.puid
+        ) order by position;""",
+        (new, old),
+    ).fetchall()
+    diff["added"] = [{"identifier": puid, "name": name} for puid, name in added]
+    removed = cur.execute(
+        """select puid, name from records as old
+        where release = ? and puid is not null and not exists (
+            select 1 from records where release = ? and puid = old.puid
+        ) order by position;""",
+        (old, new),
+    ).fetchall()
+    diff["removed"] = [{"identifier": puid, "name": name} for puid, name in removed]
+    changed = cur.execute(
+        """select new.puid, old.name, new.name, old.description,
+            new.description, old.signature, new.signature
+        from records as new join records as old
+            on old.release = ? and old.puid = new.puid
+        where new.release = ? and (
+            old.name is not new.name
+            or old.description is not new.description
+            or old.signature != new.signature
+        ) order by new.position;""",
+        (old, new),
+    ).fetchall()
+    for puid, old_name, name, old_status, status, old_sig, sig in changed:
+        record = {"identifier": puid, "name": name}
+        if status == DEPRECATED and old_status != DEPRECATED:
+            diff["deprecated"].append(record)
+        if sig and not old_sig:
+            diff["gained_signature"].append(record)
+        if old_sig and not sig:
+            diff["lost_signature"].append(record)
+        if old_name != name:
+            diff["renamed"].append({**record, "previous_name": old_name})
+        if old_status != status:
+            diff["status_changed"].append(
+                {**record, "previous_status": old_status, "status": status}
+            )
+    return diff
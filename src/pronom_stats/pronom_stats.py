@@ -18,22 +18,52 @@ variable.
 # pylint: disable=E1101,R0801
 
 import argparse
+import asyncio
+import csv
+import gzip
 import hashlib
 import importlib
 import json
 import logging
 import os
 import sqlite3
+import sys
+import threading
 import time
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Annotated, Final
+from typing import Annotated, Callable, Final, Iterator, Literal
 
 import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI, Header, HTTPException, Request, Response, status
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.concurrency import run_in_threadpool
+
+try:
+    from src.pronom_stats.compression import GZIP, IDENTITY, compress, negotiate
+    from src.pronom_stats.conditional import ConditionalGetMiddleware, make_etag
+    from src.pronom_stats.database import (
+        DEFAULT_BUSY_TIMEOUT,
+        DEFAULT_READERS,
+        Database,
+    )
+    from src.pronom_stats.diff import compute_diff
+    from src.pronom_summary.delta import DeltaException, apply_delta, summary_digest
+except ModuleNotFoundError:
+    from pronom_stats.compression import GZIP, IDENTITY, compress, negotiate
+    from pronom_stats.conditional import ConditionalGetMiddleware, make_etag
+    from pronom_stats.database import DEFAULT_BUSY_TIMEOUT, DEFAULT_READERS, Database
+    from pronom_stats.diff import compute_diff
+    from pronom_summary.delta import DeltaException, apply_delta, summary_digest
 
 # Set up logging.
 logging.basicConfig(
@@ -53,6 +83,103 @@ logger = logging.getLogger(__name__)
 
 ENV_FILE: Final[str] = "pronom.env"
 DEPRECATED: Final[str] = "deprecated"
+COMPLETE: Final[str] = "complete"
+OUTLINE: Final[str] = "outline"
+
+# Aggregate statistics materialized for each release at ingest, and
+# the conditions counted over its records. Deprecated records are not
+# counted as complete, incomplete, having a signature or requiring one.
+STATISTICS: Final[dict] = {
+    "record_count": "1",
+    "complete_count": f"description = '{COMPLETE}'",
+    "incomplete_count": f"description not in ('{COMPLETE}', '{DEPRECATED}')",
+    "deprecated_count": f"description = '{DEPRECATED}'",
+    "signature_count": f"signature and description != '{DEPRECATED}'",
+    "requires_signature_count": f"not signature and description != '{DEPRECATED}'",
+    "fmt_count": "puid_type = 'fmt'",
+    "x_fmt_count": "puid_type = 'x-fmt'",
+    "fmt_signature_count": f"puid_type = 'fmt' and signature and description != '{DEPRECATED}'",
+    "x_fmt_signature_count": f"puid_type = 'x-fmt' and signature and description != '{DEPRECATED}'",
+    "outline_count": f"description = '{OUTLINE}'",
+}
+
+# Release metadata stored alongside the records of each release.
+RELEASE_FIELDS: Final[list] = [
+    "release_notes_date",
+    "latest_puid",
+    "sig_file",
+    "container_sig",
+    "x_puid_const",
+]
+
+# Report filters applied to the records of the latest release.
+FILTER_INCOMPLETE: Final[tuple] = (
+    "description not in (?, ?)",
+    (COMPLETE, DEPRECATED),
+)
+FILTER_REQUIRES_SIGNATURE: Final[tuple] = (
+    "signature = 0 and description != ?",
+    (DEPRECATED,),
+)
+FILTER_DEPRECATED: Final[tuple] = ("description = ?", (DEPRECATED,))
+FILTER_ALL: Final[tuple] = ("1", ())
+
+# Fields of a summary record mapped to columns of the records table.
+RECORD_COLUMNS: Final[dict] = {
+    "name": "name",
+    "description": "description",
+    "signature": "signature",
+    "identifier": "puid",
+}
+
+# Schema of the records table. Records are keyed by their position in
+# the summary, PUIDs are unique within a release but can be missing.
+RECORDS_SCHEMA: Final[
+    str
+] = """create table if not exists records(
+    release integer not null,
+    position integer not null,
+    puid text,
+    puid_type text,
+    name text,
+    description text,
+    signature integer not null,
+    primary key (release, position)
+)"""
+RECORDS_COLUMNS: Final[str] = (
+    "release, position, puid, puid_type, name, description, signature"
+)
+
+# Number of CSV rows written to the response at a time.
+CSV_BATCH_SIZE: Final[int] = 500
+
+
+class SummaryException(Exception):
+    """Exception to raise when a summary cannot be stored."""
+
+
+def _puid_type(identifier: str | None) -> str | None:
+    """Return the type of a PUID, or None for a record without one."""
+    if identifier is None:
+        return None
+    return "x-fmt" if identifier.startswith("x-fmt/") else "fmt"
+
+
+def _check_records(records: list[dict]):
+    """Ensure no two records of a summary have the same PUID, so that
+    every record is stored and can be told apart.
+    """
+    seen = set()
+    duplicates = set()
+    for item in records:
+        identifier = item.get("identifier")
+        if identifier is None:
+            continue
+        if identifier in seen:
+            duplicates.add(identifier)
+        seen.add(identifier)
+    if duplicates:
+        raise SummaryException(f"duplicate PUIDs in summary: {sorted(duplicates)}")
 
 
 async def init_db(cur: sqlite3.Cursor):
@@ -62,23 +189,222 @@ async def init_db(cur: sqlite3.Cursor):
     except sqlite3.OperationalError:
         # database is already setup.
         pass
+    columns = ", ".join(f"{column} integer" for column in STATISTICS)
+    cur.execute(
+        f"create table if not exists statistics(release integer primary key, {columns})"
+    )
+    cur.execute(
+        f"create table if not exists releases(id integer primary key, version text, {', '.join(f'{field} text' for field in RELEASE_FIELDS)}, ingested integer, sha256 text)"
+    )
+    cur.execute(RECORDS_SCHEMA)
+    cur.execute(
+        "create index if not exists records_description on records(release, description, position)"
+    )
+    cur.execute(
+        "create index if not exists records_signature on records(release, signature, position)"
+    )
+    cur.execute(
+        "create unique index if not exists records_puid on records(release, puid)"
+    )
+    cur.execute(
+        "create table if not exists diffs(release integer, previous integer, diff text, primary key (release, previous))"
+    )
 
 
-def _escape_ins(ins: str) -> str:
-    """Provides a way to escape the data we're inserting. It's a bit
-    of a hack. First created to handle single-quotes but will
-    potentially be needed for other character types.
+def _insert_statistics(cur: sqlite3.Cursor, release: int = None) -> int:
+    """Compute and store the aggregate statistics of a release, or of
+    every release, in a single pass over their records. Returns the
+    number of releases updated.
     """
-    return ins.replace("'", "")
+    counts = ", ".join(
+        f"coalesce(sum(records.release is not null and ({condition})), 0)"
+        for condition in STATISTICS.values()
+    )
+    where = "" if release is None else "where releases.id = ?"
+    cur.execute(
+        f"""insert or replace into statistics (release, {', '.join(STATISTICS)})
+        select releases.id, {counts} from releases
+        left join records on records.release = releases.id
+        {where} group by releases.id;""",
+        () if release is None else (release,),
+    )
+    return cur.rowcount
+
 
+async def backfill_statistics(cur: sqlite3.Cursor) -> int:
+    """Recompute the aggregate statistics of every stored release in a
+    single pass over the records table. Returns the number of releases
+    updated.
+    """
+    await init_db(cur)
+    updated = _insert_statistics(cur)
+    cur.connection.commit()
+    return updated
 
-async def _insert_version(version: str, summary: str):
-    """Deleteme"""
-    summary = _escape_ins(summary)
-    ins = f"insert into pronom (version, summary) values ('{version}', '{summary}');"
-    app.cur.execute(ins)
-    app.cur.execute("commit;")
-    return
+
+def _insert_release(cur: sqlite3.Cursor, release: int, version: str, summary: dict):
+    """Store a release, its records and its aggregate statistics in the
+    normalized tables.
+
+    Records without a PUID are stored without a PUID type. A
+    `SummaryException` is raised if PUIDs are duplicated.
+    """
+    records = summary.get("pronom_data", [])
+    _check_records(records)
+    cur.execute(
+        f"insert or replace into releases (id, version, {', '.join(RELEASE_FIELDS)}, ingested, sha256) values ({', '.join('?' for _ in range(len(RELEASE_FIELDS) + 4))});",
+        (
+            release,
+            version,
+            *[summary.get(field) for field in RELEASE_FIELDS],
+            int(time.time()),
+            summary_digest(summary),
+        ),
+    )
+    cur.execute("delete from records where release = ?;", (release,))
+    cur.executemany(
+        f"insert into records ({RECORDS_COLUMNS}) values (?, ?, ?, ?, ?, ?, ?);",
+        (
+            (
+                release,
+                position,
+                item.get("identifier"),
+                _puid_type(item.get("identifier")),
+                item["name"],
+                item["description"],
+                item["signature"] is True,
+            )
+            for position, item in enumerate(records)
+        ),
+    )
+    _insert_statistics(cur, release)
+    _insert_diff(cur, release)
+
+
+def _insert_diff(cur: sqlite3.Cursor, release: int):
+    """Store the diff between a release and the release stored before
+    it, if there is one.
+    """
+    previous = cur.execute(
+        "select max(id) from releases where id < ?;", (release,)
+    ).fetchone()[0]
+    if previous is None:
+        return
+    cur.execute(
+        "insert or replace into diffs (release, previous, diff) values (?, ?, ?);",
+        (release, previous, json.dumps(compute_diff(cur, previous, release))),
+    )
+
+
+async def migrate(cur: sqlite3.Cursor) -> int:
+    """Bring an existing database up to date, storing the records,
+    statistics and diffs of any release only held in the `pronom`
+    summary table. Returns the number of releases migrated.
+    """
+    await init_db(cur)
+    rows = cur.execute(
+        "select rowid, version, summary from pronom where rowid not in (select id from releases) order by rowid;"
+    ).fetchall()
+    migrated = 0
+    for rowid, version, summary in rows:
+        try:
+            _insert_release(cur, rowid, version, json.loads(summary))
+        except SummaryException as err:
+            logger.error("unable to migrate release %s (%s): %s", rowid, version, err)
+            continue
+        migrated += 1
+    cur.connection.commit()
+    return migrated
+
+
+def _store_version(cur: sqlite3.Cursor, version: str, summary: dict):
+    """Store a summary and its normalized records as the latest
+    release using the writer cursor.
+    """
+    cur.execute(
+        "insert into pronom (version, summary) values (?, ?);",
+        (version, json.dumps(summary)),
+    )
+    _insert_release(cur, cur.lastrowid, version, summary)
+
+
+def _insert_version(version: str, summary: dict):
+    """Store a summary and its normalized records as the latest
+    release.
+    """
+    with app.db.writer() as cur:
+        _store_version(cur, version, summary)
+    app.summary_cache.invalidate()
+
+
+class LatestSummaryCache:
+    """Keep the latest decoded PRONOM summary in memory, along with
+    payloads serialized and compressed from it.
+
+    The rowid of the latest summary is checked on every read, which is
+    a cheap index lookup, so a summary stored by another worker
+    replaces the cached copy on its next read.
+    """
+
+    def __init__(self):
+        self.rowid = None
+        self.version = None
+        self.summary = {}
+        self.payloads = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+
+    def get(self, cur: sqlite3.Cursor) -> tuple[str, dict]:
+        """Return the version and decoded summary of the latest
+        release.
+        """
+        rowid = cur.execute("select max(rowid) from pronom;").fetchone()[0]
+        with self._lock:
+            if rowid is not None and rowid == self.rowid:
+                self.hits += 1
+                return self.version, self.summary
+            self.misses += 1
+            if rowid is None:
+                return None, {}
+            res = cur.execute(
+                "select version, summary from pronom where rowid = ?;", (rowid,)
+            ).fetchone()
+            self.rowid = rowid
+            self.version = res[0]
+            self.summary = json.loads(res[1])
+            self.payloads = {}
+            return self.version, self.summary
+
+    def get_payload(
+        self,
+        cur: sqlite3.Cursor,
+        name: str,
+        encoding: str,
+        serialize: Callable[[str, dict], bytes],
+    ) -> bytes:
+        """Return a payload serialized from the latest release by
+        `serialize(version, summary)`, compressed with the given
+        encoding. Each payload and encoding is only produced once per
+        release.
+        """
+        with self._lock:
+            version, summary = self.get(cur)
+            if (name, encoding) not in self.payloads:
+                if (name, IDENTITY) not in self.payloads:
+                    self.payloads[(name, IDENTITY)] = serialize(version, summary)
+                self.payloads[(name, encoding)] = compress(
+                    self.payloads[(name, IDENTITY)], encoding
+                )
+            return self.payloads[(name, encoding)]
+
+    def invalidate(self) -> None:
+        """Drop the cached summary."""
+        with self._lock:
+            self.rowid = None
+            self.version = None
+            self.summary = {}
+            self.payloads = {}
 
 
 def _load_config():
@@ -103,14 +429,24 @@ def _load_config():
 
 @asynccontextmanager
 async def lifespan(context: FastAPI):
-    """Load the database connection for the life of the app.s"""
+    """Load the database connections for the life of the app."""
     _load_config()
     db_path = Path(os.environ["DATABASE_PATH"])
     logger.info("pronom database path: %s", db_path)
-    con = sqlite3.connect(db_path)
-    context.cur = con.cursor()
-    await init_db(context.cur)
+    context.db = Database(
+        db_path,
+        readers=int(os.environ.get("DATABASE_READERS", DEFAULT_READERS)),
+        busy_timeout=float(
+            os.environ.get("DATABASE_BUSY_TIMEOUT", DEFAULT_BUSY_TIMEOUT)
+        ),
+    )
+    context.summary_cache = LatestSummaryCache()
+    with context.db.writer() as cur:
+        migrated = await migrate(cur)
+    if migrated:
+        logger.info("releases migrated: %s", migrated)
     yield
+    context.db.close()
 
 
 #### API Entry Points ####
@@ -161,13 +497,42 @@ origins = [
     "*",
 ]
 
+
+def _get_release_validator() -> tuple[str, int | None] | None:
+    """Return the ETag and Last-Modified time of the latest release."""
+    with app.db.reader() as cur:
+        res = cur.execute(
+            "select id, version, ingested from releases order by id desc limit 1;"
+        ).fetchone()
+    if res is None:
+        return None
+    release, version, ingested = res
+    return make_etag(release, version, ingested), ingested
+
+
+# Paths that are not derived from the stored releases.
+UNCONDITIONAL_PATHS: Final[tuple] = (
+    "/",
+    "/docs",
+    "/docs/oauth2-redirect",
+    "/redoc",
+    "/openapi.json",
+    "/summary_cache",
+)
+
+app.add_middleware(
+    ConditionalGetMiddleware,
+    validator=_get_release_validator,
+    exclude=UNCONDITIONAL_PATHS,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Content-type"],
+    expose_headers=["X-Content-type", "Link", "X-Summary-Version", "X-Summary-SHA256"],
 )
 
 
@@ -179,15 +544,194 @@ def redirect_root_to_docs():
     return RedirectResponse(url="/docs")
 
 
-def _get_summary() -> dict:
-    """Return the PRONOM summary from the database."""
-    res = app.cur.execute("select summary from pronom order by rowid desc limit 1;")
-    res = res.fetchone()
-    return json.loads(res[0])
+def _make_record_filter(
+    description: str = None,
+    signature: bool = None,
+    puid_type: str = None,
+    name_prefix: str = None,
+) -> tuple:
+    """Make a records table filter from optional criteria."""
+    where = ["1"]
+    params = []
+    if description is not None:
+        where.append("description = ?")
+        params.append(description)
+    if signature is not None:
+        where.append("signature = ?")
+        params.append(signature)
+    if puid_type is not None:
+        where.append("puid_type = ?")
+        params.append(puid_type)
+    if name_prefix:
+        escaped = (
+            name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        where.append("name like ? escape '\\'")
+        params.append(f"{escaped}%")
+    return " and ".join(where), tuple(params)
+
+
+def _combine_record_filters(*record_filters: tuple) -> tuple:
+    """Combine records table filters so that all of them apply."""
+    return (
+        " and ".join(f"({where})" for where, _ in record_filters),
+        tuple(param for _, params in record_filters for param in params),
+    )
+
+
+@dataclass
+class RecordQuery:
+    """Pagination, field projection and filters for listings of the
+    records of the latest release.
+
+    Pages are ordered as the summary, by name, and `after` is the PUID
+    of the last record of the previous page.
+    """
+
+    limit: Annotated[int | None, Query(ge=1, description="page size")] = None
+    after: Annotated[
+        str | None,
+        Query(description="PUID of the last record of the previous page"),
+    ] = None
+    fields: Annotated[
+        str | None,
+        Query(description="comma separated fields, e.g. `identifier,name`"),
+    ] = None
+    status: Annotated[
+        str | None,
+        Query(description="description status, e.g. `complete` or `outline`"),
+    ] = None
+    signature: bool | None = None
+    puid_type: Literal["fmt", "x-fmt"] | None = None
+    name_prefix: Annotated[
+        str | None, Query(description="case-insensitive prefix of the name")
+    ] = None
+
+    def record_filter(self) -> tuple:
+        """Return the records table filter of the query."""
+        return _make_record_filter(
+            self.status, self.signature, self.puid_type, self.name_prefix
+        )
+
+    def get_fields(self) -> list[str]:
+        """Return the fields to project, all of them by default."""
+        if not self.fields:
+            return list(RECORD_COLUMNS)
+        fields = self.fields.split(",")
+        unknown = [field for field in fields if field not in RECORD_COLUMNS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"unknown fields: {', '.join(unknown)} (expected: {', '.join(RECORD_COLUMNS)})",
+            )
+        return fields
+
+
+def _get_page(
+    cur: sqlite3.Cursor, record_filter: tuple, query: RecordQuery
+) -> tuple[list[dict], str | None]:
+    """Return a page of the records of the latest release matching a
+    filter and a query, in summary order, and the PUID to continue
+    after if the page is full.
+    """
+    fields = query.get_fields()
+    release = cur.execute("select max(id) from releases;").fetchone()[0]
+    where, params = _combine_record_filters(record_filter, query.record_filter())
+    if query.after is not None:
+        res = cur.execute(
+            "select position from records where release = ? and puid = ?;",
+            (release, query.after),
+        ).fetchone()
+        if res is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"unknown PUID to continue after: {query.after}",
+            )
+        where, params = _combine_record_filters((where, params), ("position > ?", res))
+    limit = "" if query.limit is None else f"limit {int(query.limit)}"
+    res = cur.execute(
+        f"""select {', '.join(RECORD_COLUMNS[field] for field in fields)}, puid
+        from records where release = ? and {where}
+        order by position {limit};""",
+        (release, *params),
+    ).fetchall()
+    records = []
+    for row in res:
+        record = dict(zip(fields, row))
+        if "signature" in record:
+            record["signature"] = bool(record["signature"])
+        records.append(record)
+    if query.limit is None or len(res) < query.limit:
+        return records, None
+    # Continue after the last record with a PUID, any records without
+    # one after it are left for the next page.
+    for idx in range(len(res) - 1, -1, -1):
+        if res[idx][-1] is not None:
+            return records[: idx + 1], res[idx][-1]
+    return records, None
+
+
+def _get_records(cur: sqlite3.Cursor, record_filter: tuple) -> list[dict]:
+    """Return the records of the latest release matching a filter, in
+    summary order.
+    """
+    records, _ = _get_page(cur, record_filter, RecordQuery())
+    return records
+
+
+def _page_response(request: Request, content, after: str | None) -> JSONResponse:
+    """Return a page of records, linking to the next page if there is
+    one.
+    """
+    headers = {}
+    if after is not None:
+        url = request.url.include_query_params(after=after)
+        headers["Link"] = f'<{url}>; rel="next"'
+    return JSONResponse(content=content, headers=headers)
+
+
+def _serialize_pronom_summary(version: str, summary: dict) -> bytes:
+    """Serialize the response of `/pronom_summary` as the default
+    FastAPI JSON response would.
+    """
+    return json.dumps(
+        {"version": version, "summary": summary},
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _get_digest_headers(cur: sqlite3.Cursor) -> dict:
+    """Return headers advertising the version and digest of the latest
+    summary, against which deltas can be made.
+    """
+    res = cur.execute(
+        "select version, sha256 from releases order by id desc limit 1;"
+    ).fetchone()
+    if res is None:
+        return {}
+    return {"X-Summary-Version": res[0], "X-Summary-SHA256": res[1]}
+
+
+@app.head("/pronom_summary", tags=[TAG_PRONOM])
+def head_pronom_summary():
+    """Advertise the version and sha256 digest of the latest PRONOM
+    summary in the `X-Summary-Version` and `X-Summary-SHA256` headers.
+    """
+    with app.db.reader() as cur:
+        headers = _get_digest_headers(cur)
+    if not headers:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    return Response(headers=headers)
 
 
 @app.get("/pronom_summary", tags=[TAG_PRONOM])
-async def get_pronom_summary():
+def get_pronom_summary(
+    request: Request,
+    query: Annotated[RecordQuery, Depends()],
+    accept_encoding: Annotated[str | None, Header(include_in_schema=False)] = None,
+):
     """Retrieve the PRONOM summary information from the database.
 
     Result should looks something like as follows:
@@ -220,18 +764,91 @@ async def get_pronom_summary():
         }
     ```
     """
-    res = app.cur.execute(
-        "select version, summary from pronom order by rowid desc limit 1;"
-    )
-    res = res.fetchone()
-    ret = {}
-    ret["version"] = res[0]
-    ret["summary"] = json.loads(res[1])
-    return ret
+    if query != RecordQuery():
+        with app.db.reader() as cur:
+            version, summary = app.summary_cache.get(cur)
+            records, after = _get_page(cur, FILTER_ALL, query)
+        page = {key: value for key, value in summary.items() if key != "pronom_data"}
+        page["pronom_data"] = records
+        return _page_response(request, {"version": version, "summary": page}, after)
+    encoding = negotiate(accept_encoding)
+    with app.db.reader() as cur:
+        content = app.summary_cache.get_payload(
+            cur, "pronom_summary", encoding, _serialize_pronom_summary
+        )
+        headers = _get_digest_headers(cur)
+    headers["Vary"] = "Accept-Encoding"
+    if encoding != IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+class _Echo:
+    """File-like object returning what is written to it so that the
+    csv module can be used to format rows for streaming.
+    """
+
+    def write(self, value: str) -> str:
+        """Return the value to write."""
+        return value
+
+
+def iter_csv(
+    db: Database,
+    columns: list[str],
+    record_filter: tuple,
+    batch_size: int = CSV_BATCH_SIZE,
+) -> Iterator[str]:
+    """Yield the records of the latest release as CSV, a header first
+    and then batches of rows read incrementally from the database.
+
+    Each batch is read on a pooled connection that is given back
+    before the batch is sent, so a slow client doesn't hold a reader.
+    Batches are read from the release that was latest when the first
+    was read.
+    """
+    writer = csv.writer(_Echo(), lineterminator="\n")
+    yield writer.writerow(columns)
+    where, params = record_filter
+    signature = columns.index("signature") if "signature" in columns else None
+    with db.reader() as cur:
+        release = cur.execute("select max(id) from releases;").fetchone()[0]
+    position = -1
+    while True:
+        with db.reader() as cur:
+            rows = cur.execute(
+                f"""select position, {', '.join(RECORD_COLUMNS[column] for column in columns)}
+                from records where release = ? and position > ? and {where}
+                order by position limit ?;""",
+                (release, position, *params, batch_size),
+            ).fetchall()
+        if not rows:
+            return
+        position = rows[-1][0]
+        rows = (row[1:] for row in rows)
+        if signature is not None:
+            rows = (
+                (*row[:signature], bool(row[signature]), *row[signature + 1 :])
+                for row in rows
+            )
+        yield "".join(writer.writerow(row) for row in rows)
 
 
 @app.get("/pronom_summary_csv", tags=[TAG_REPORTS])
-async def get_pronom_summary_csv():
+def get_pronom_summary_csv(
+    columns: Annotated[
+        str | None,
+        Query(description="comma separated columns, e.g. `identifier,name`"),
+    ] = None,
+    description_status: Annotated[
+        str | None,
+        Query(
+            alias="status",
+            description="description status, e.g. `complete` or `outline`",
+        ),
+    ] = None,
+    signature: bool | None = None,
+):
     """Return a simplified PRONOM summary as a CSV.
 
     Example using the Rust-based XSV tool on Linux:
@@ -241,93 +858,210 @@ async def get_pronom_summary_csv():
             -H 'accept: application/json' | xsv table | less
     ```
     """
-    res = _get_summary()
-    pronom_data = res.get("pronom_data", [])
-    if not pronom_data and not isinstance(pronom_data, list):
-        return {"error": "problem retrieving PRONOM summary"}
-    headers = pronom_data[0].keys()
-    rows = ""
-    for data in pronom_data:
-        row = ",".join(f"{value}" for value in data.values())
-        rows = f"{rows}\n{row}"
-    headers = ",".join(headers)
-    res = f"{headers}{rows}\n"
-    return Response(content=res, media_type="text/csv")
+    selected = columns.split(",") if columns else list(RECORD_COLUMNS)
+    unknown = [column for column in selected if column not in RECORD_COLUMNS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"unknown columns: {', '.join(unknown)} (expected: {', '.join(RECORD_COLUMNS)})",
+        )
+    return StreamingResponse(
+        iter_csv(app.db, selected, _make_record_filter(description_status, signature)),
+        media_type="text/csv",
+    )
 
 
 @app.get("/pronom_version", tags=[TAG_PRONOM], response_class=HTMLResponse)
-async def get_pronom_version() -> str:
+def get_pronom_version() -> str:
     """Retrieve the PRONOM version from the database."""
-    res = app.cur.execute("select version from pronom order by rowid desc limit 1;")
-    res = res.fetchone()
-    return res[0]
+    with app.db.reader() as cur:
+        version, _ = app.summary_cache.get(cur)
+    return version
+
+
+def _find_release(cur: sqlite3.Cursor, version: str = None, before: int = None) -> int:
+    """Return the latest release with a version, or the latest release
+    stored before another, or the latest release.
+    """
+    if version is not None:
+        res = cur.execute(
+            "select max(id) from releases where version = ?;", (version,)
+        ).fetchone()[0]
+        if res is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"no release with version: {version}",
+            )
+        return res
+    if before is not None:
+        res = cur.execute(
+            "select max(id) from releases where id < ?;", (before,)
+        ).fetchone()[0]
+    else:
+        res = cur.execute("select max(id) from releases;").fetchone()[0]
+    if res is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="not enough releases stored to compare",
+        )
+    return res
+
+
+def get_release_diff(cur: sqlite3.Cursor, old: str = None, new: str = None) -> dict:
+    """Return the diff between two stored releases by version. `new`
+    defaults to the latest release and `old` to the release stored
+    before `new`.
+
+    Diffs between consecutive releases are read from the diffs table,
+    others are computed.
+    """
+    new_release = _find_release(cur, new)
+    old_release = _find_release(cur, old, before=new_release)
+    res = cur.execute(
+        "select diff from diffs where release = ? and previous = ?;",
+        (new_release, old_release),
+    ).fetchone()
+    diff = json.loads(res[0]) if res else compute_diff(cur, old_release, new_release)
+    versions = dict(
+        cur.execute(
+            "select id, version from releases where id in (?, ?);",
+            (old_release, new_release),
+        ).fetchall()
+    )
+    return {"old": versions[old_release], "new": versions[new_release], **diff}
+
+
+@app.get("/diff", tags=[TAG_REPORTS])
+def get_diff(old: str | None = None, new: str | None = None):
+    """Retrieve the records added, removed, deprecated, gaining or
+    losing a signature, renamed, or changing status between two PRONOM
+    versions, by default the latest release and the one before it.
+
+    ```sh
+        curl -s 'https://api.ffdev.info/diff?old=V115&new=V116'
+    ```
+    """
+    with app.db.reader() as cur:
+        return get_release_diff(cur, old, new)
+
+
+@app.get("/summary_cache", tags=[TAG_STATISTICS])
+async def get_summary_cache():
+    """Retrieve the hit and miss counters of the in-memory summary cache
+    of the worker handling the request.
+    """
+    return {
+        "hits": app.summary_cache.hits,
+        "misses": app.summary_cache.misses,
+        "version": app.summary_cache.version,
+    }
+
+
+def _get_statistics(cur: sqlite3.Cursor) -> dict:
+    """Return the aggregate statistics of the latest release."""
+    res = cur.execute(
+        f"select {', '.join(STATISTICS)} from statistics where release = (select max(id) from releases);"
+    ).fetchone()
+    if res is None:
+        return dict.fromkeys(STATISTICS, 0)
+    return dict(zip(STATISTICS, res))
+
+
+@app.get("/statistics", tags=[TAG_STATISTICS])
+def get_statistics():
+    """Retrieve all of the aggregate statistics for the latest PRONOM
+    release including a breakdown of fmt and x-fmt records.
+    """
+    with app.db.reader() as cur:
+        return _get_statistics(cur)
+
+
+@app.get("/stats/history", tags=[TAG_STATISTICS])
+def get_stats_history():
+    """Retrieve the aggregate statistics of every stored release in the
+    order they were stored, e.g. to chart signature coverage over time.
+
+    Signature coverage is the proportion of records that are not
+    deprecated that have a signature.
+    """
+    with app.db.reader() as cur:
+        res = cur.execute(
+            f"""select releases.version, releases.release_notes_date,
+            {', '.join(f'statistics.{column}' for column in STATISTICS)}
+            from releases join statistics on statistics.release = releases.id
+            order by releases.id;"""
+        ).fetchall()
+    history = []
+    for version, release_notes_date, *counts in res:
+        stats = dict(zip(STATISTICS, counts))
+        current = stats["record_count"] - stats["deprecated_count"]
+        history.append(
+            {
+                "version": version,
+                "release_notes_date": release_notes_date,
+                **stats,
+                "signature_coverage": (
+                    round(stats["signature_count"] / current, 4) if current else None
+                ),
+            }
+        )
+    return history
 
 
 @app.get("/records_count", tags=[TAG_STATISTICS])
-async def get_complete_records_count():
+def get_complete_records_count():
     """Retrieve the PRONOM version from the database."""
-    summary = _get_summary()
-    return len(summary.get("pronom_data", []))
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["record_count"]
 
 
 @app.get("/complete_description_count", tags=[TAG_STATISTICS])
-async def get_complete_descriptions_count():
+def get_complete_descriptions_count():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    complete = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] == "complete"
-    ]
-    return len(complete)
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["complete_count"]
 
 
 @app.get("/incomplete_description_count", tags=[TAG_STATISTICS])
-async def get_incomplete_descriptions_count():
+def get_incomplete_descriptions_count():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    complete = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] != "complete" and item["description"] != DEPRECATED
-    ]
-    return len(complete)
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["incomplete_count"]
 
 
 @app.get("/signature_count", tags=[TAG_STATISTICS])
-async def get_signatures_count():
+def get_signatures_count():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    signatures = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["signature"] is True and item["description"] != DEPRECATED
-    ]
-    return len(signatures)
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["signature_count"]
 
 
 @app.get("/requires_signature_count", tags=[TAG_STATISTICS])
-async def get_requires_signatures_count():
+def get_requires_signatures_count():
     """Retrieve the number of PRONOM descriptions where signatures are
     still required.
     """
-    summary = _get_summary()
-    signatures = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["signature"] is not True and item["description"] != DEPRECATED
-    ]
-    return len(signatures)
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["requires_signature_count"]
+
+
+def _get_signature_files(cur: sqlite3.Cursor) -> tuple[str, str]:
+    """Return the standard and container signature files of the latest
+    release.
+    """
+    res = cur.execute(
+        "select sig_file, container_sig from releases order by id desc limit 1;"
+    ).fetchone()
+    return res if res else (None, None)
 
 
 @app.get("/signature_files", tags=[TAG_PRONOM])
-async def get_signature_files():
+def get_signature_files():
     """List the signature files associated with the latest PRONOM
     release. Format the output as HTML.
     """
-    summary = _get_summary()
-    standard_sig = summary.get("sig_file")
-    container_sig = summary.get("container_sig")
+    with app.db.reader() as cur:
+        standard_sig, container_sig = _get_signature_files(cur)
     return {
         "standard signature": standard_sig,
         "container signature": container_sig,
@@ -335,13 +1069,12 @@ async def get_signature_files():
 
 
 @app.get("/signature_files_hx", response_class=HTMLResponse, tags=[TAG_HTMX])
-async def get_signature_files_hx():
+def get_signature_files_hx():
     """List the signature files associated with the latest PRONOM
     release. Format the output as HTML.
     """
-    summary = _get_summary()
-    standard_sig = summary.get("sig_file")
-    container_sig = summary.get("container_sig")
+    with app.db.reader() as cur:
+        standard_sig, container_sig = _get_signature_files(cur)
     return (
         f"<br>"
         f"<ul>"
@@ -379,87 +1112,63 @@ def _make_formatted_list_from_summary_items(summary_objs: list) -> str:
 
 
 @app.get("/incomplete_descriptions", tags=[TAG_REPORTS])
-async def get_incomplete_descriptions():
+def get_incomplete_descriptions(
+    request: Request, query: Annotated[RecordQuery, Depends()]
+):
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    complete = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] != "complete" and item["description"] != DEPRECATED
-    ]
-    return complete
+    with app.db.reader() as cur:
+        records, after = _get_page(cur, FILTER_INCOMPLETE, query)
+    return _page_response(request, records, after)
 
 
 @app.get("/incomplete_descriptions_hx", response_class=HTMLResponse, tags=[TAG_HTMX])
-async def get_incomplete_descriptions_hx():
+def get_incomplete_descriptions_hx():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    complete = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] != "complete" and item["description"] != DEPRECATED
-    ]
-    return _make_formatted_list_from_summary_items(complete)
+    with app.db.reader() as cur:
+        return _make_formatted_list_from_summary_items(
+            _get_records(cur, FILTER_INCOMPLETE)
+        )
 
 
 @app.get("/requires_signatures", tags=[TAG_REPORTS])
-async def get_requires_signatures():
+def get_requires_signatures(request: Request, query: Annotated[RecordQuery, Depends()]):
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    signatures = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["signature"] is not True and item["description"] != DEPRECATED
-    ]
-    return signatures
+    with app.db.reader() as cur:
+        records, after = _get_page(cur, FILTER_REQUIRES_SIGNATURE, query)
+    return _page_response(request, records, after)
 
 
 @app.get("/requires_signatures_hx", response_class=HTMLResponse, tags=[TAG_HTMX])
-async def get_requires_signatures_hx():
+def get_requires_signatures_hx():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    signatures = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["signature"] is not True and item["description"] != DEPRECATED
-    ]
-    return _make_formatted_list_from_summary_items(signatures)
+    with app.db.reader() as cur:
+        return _make_formatted_list_from_summary_items(
+            _get_records(cur, FILTER_REQUIRES_SIGNATURE)
+        )
 
 
 @app.get("/get_deprecated", tags=[TAG_REPORTS])
-async def get_deprecated():
+def get_deprecated(request: Request, query: Annotated[RecordQuery, Depends()]):
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    deprecated = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] == "deprecated" and item["description"] != DEPRECATED
-    ]
-    return deprecated
+    with app.db.reader() as cur:
+        records, after = _get_page(cur, FILTER_DEPRECATED, query)
+    return _page_response(request, records, after)
 
 
 @app.get("/get_deprecated_count", tags=[TAG_STATISTICS])
-async def get_deprecated_count():
+def get_deprecated_count():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    deprecated = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] == DEPRECATED
-    ]
-    return len(deprecated)
+    with app.db.reader() as cur:
+        return _get_statistics(cur)["deprecated_count"]
 
 
 @app.get("/get_deprecated_hx", response_class=HTMLResponse, tags=[TAG_HTMX])
-async def get_deprecated_hx():
+def get_deprecated_hx():
     """Retrieve the number of PRONOM descriptions with status complete."""
-    summary = _get_summary()
-    deprecated = [
-        item
-        for item in summary.get("pronom_data", [])
-        if item["description"] == DEPRECATED
-    ]
-    return _make_formatted_list_from_summary_items(deprecated)
+    with app.db.reader() as cur:
+        return _make_formatted_list_from_summary_items(
+            _get_records(cur, FILTER_DEPRECATED)
+        )
 
 
 def _get_auth():
@@ -471,12 +1180,46 @@ def _get_auth():
     return digest.hexdigest()
 
 
+def _check_auth(auth: str | None):
+    """Ensure a request is authorized to store summaries."""
+    system_pass = _get_auth()
+    if not system_pass or auth != system_pass.strip():
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="incorrect auth token",
+        )
+    logger.info("auth OK")
+
+
+async def _read_json(request: Request):
+    """Return the decoded JSON body of a request, decompressing it if
+    it is gzip encoded.
+    """
+    body = await request.body()
+    if request.headers.get("content-encoding", IDENTITY) == GZIP:
+        try:
+            body = gzip.decompress(body)
+        except (OSError, EOFError) as err:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"invalid gzip request body: {err}",
+            ) from err
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as err:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"invalid JSON request body: {err}",
+        ) from err
+
+
 @app.put("/pronom_summary", tags=[TAG_PRONOM])
 async def put_summary(
     request: Request,
     auth: Annotated[str | None, Header()] = None,
 ):
-    """Provides a mechanism to store the PRONOM version number.
+    """Provides a mechanism to store the PRONOM version number. The
+    request body can be gzip compressed.
 
     The so-called `auth` method in this function is a shot-to-medium
     term hack that allows the endpoint to be used locally.
@@ -484,22 +1227,82 @@ async def put_summary(
     NB. The stakes are pretty low; if it's used even, letalone hacked
     we'll figure something more permanent out.
     """
-    system_pass = _get_auth()
-    logger.info(system_pass)
-    if not system_pass or auth != system_pass.strip():
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="incorrect auth token",
-        )
-    logger.info("auth OK")
-    req = await request.json()
+    _check_auth(auth)
+    req = await _read_json(request)
     version = req.get("version")
     summary = {}
     summary["summary"] = req
-    await _insert_version(f"{version}", json.dumps(req))
+    try:
+        await run_in_threadpool(_insert_version, f"{version}", req)
+    except SummaryException as err:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"unable to store summary: {err}",
+        ) from err
     return {"message": "success"}
 
 
+def _insert_delta(delta: dict) -> str:
+    """Reconstruct a summary from the latest summary and a delta and
+    store it as the latest release. Returns the digest of the summary.
+
+    The latest summary is read on the writer connection so that no
+    other release can be stored between checking the base of the
+    delta and storing the summary made from it.
+    """
+    with app.db.writer() as cur:
+        # Take the write lock of the database now, as well as the
+        # writer, in case another process is storing a release.
+        cur.execute("begin immediate;")
+        latest = _get_digest_headers(cur).get("X-Summary-SHA256")
+        if latest is None or delta.get("base") != latest:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"delta base does not match the latest summary: {latest}",
+            )
+        _, base = app.summary_cache.get(cur)
+        try:
+            summary = apply_delta(base, delta)
+        except (DeltaException, KeyError, TypeError) as err:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"unable to apply delta: {err}",
+            ) from err
+        try:
+            _store_version(cur, f"{summary.get('version')}", summary)
+        except SummaryException as err:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"unable to store summary: {err}",
+            ) from err
+    app.summary_cache.invalidate()
+    return delta["sha256"]
+
+
+@app.patch("/pronom_summary", tags=[TAG_PRONOM])
+async def patch_summary(
+    request: Request,
+    auth: Annotated[str | None, Header()] = None,
+):
+    """Store a new PRONOM summary from a delta against the latest
+    summary, as advertised by `HEAD /pronom_summary`.
+
+    The delta is made by `pronom_summary.delta.make_delta`. It returns
+    409 if the latest summary has changed since the delta was made and
+    the whole summary should be stored with PUT instead. The request
+    body can be gzip compressed.
+    """
+    _check_auth(auth)
+    delta = await _read_json(request)
+    sha256 = await run_in_threadpool(_insert_delta, delta)
+    logger.info(
+        "delta stored: %s records, %s removed",
+        len(delta["records"]),
+        len(delta["removed"]),
+    )
+    return {"message": "success", "sha256": sha256}
+
+
 def main():
     """Primary entry point for this script."""
 
@@ -532,8 +1335,67 @@ def main():
         type=int,
     )
 
+    parser.add_argument(
+        "--migrate",
+        help="update an existing database, e.g. storing the records and statistics of existing releases, and exit",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--backfill-statistics",
+        help="recompute the aggregate statistics of every stored release in a single pass, and exit",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--diff",
+        help="print the diff between two releases, e.g. `--diff V115 V116`, or of a release and the one before it, or of the latest release, and exit",
+        required=False,
+        nargs="*",
+        metavar="VERSION",
+    )
+
     args = parser.parse_args()
 
+    if args.diff is not None:
+        if len(args.diff) > 2:
+            parser.error("--diff takes at most two versions")
+        old, new = [None, None, *args.diff][-2:]
+        _load_config()
+        con = sqlite3.connect(Path(os.environ["DATABASE_PATH"]))
+        try:
+            # Releases are diffed from the normalized tables, which a
+            # database that hasn't been migrated doesn't have yet.
+            migrated = asyncio.run(migrate(con.cursor()))
+            if migrated:
+                logger.info("releases migrated: %s", migrated)
+            diff = get_release_diff(con.cursor(), old, new)
+        except HTTPException as err:
+            logger.error(err.detail)
+            sys.exit(1)
+        finally:
+            con.close()
+        print(json.dumps(diff, indent=2))
+        return
+
+    if args.backfill_statistics:
+        _load_config()
+        con = sqlite3.connect(Path(os.environ["DATABASE_PATH"]))
+        updated = asyncio.run(backfill_statistics(con.cursor()))
+        con.close()
+        logger.info("release statistics computed: %s", updated)
+        return
+
+    if args.migrate:
+        _load_config()
+        con = sqlite3.connect(Path(os.environ["DATABASE_PATH"]))
+        migrated = asyncio.run(migrate(con.cursor()))
+        con.close()
+        logger.info("releases migrated: %s", migrated)
+        return
+
     logger.info(
         "attempting API startup, try setting `--port` arg if there are any issues"
     )
@@ -0,0 +1,82 @@
+"""Delta encoding of PRONOM summaries.
+
+A delta holds the release information of a new summary and only the
+records that differ from a base summary, identified by the digest of
+the base. Applying the delta to the base reconstructs the new summary,
+which is checked against the digest of the summary the delta was made
+from.
+
+This module has no dependencies so that it can be shared by the PRONOM
+tools client and the stats server.
+"""
+
+import hashlib
+import json
+from typing import Final
+
+# Key of the list of records in a summary.
+PRONOM_DATA: Final[str] = "pronom_data"
+
+
+class DeltaException(Exception):
+    """Exception to raise when a delta cannot be applied."""
+
+
+def record_sort_key(record: dict) -> tuple:
+    """Sort records by name, and by PUID where names are the same.
+    Records without a PUID come first.
+    """
+    return record["name"], record["identifier"] or ""
+
+
+def summary_digest(summary: dict) -> str:
+    """Return the sha256 of the canonical JSON form of a summary."""
+    canonical = json.dumps(
+        summary, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def make_delta(base: dict, summary: dict) -> dict:
+    """Return the delta from a base summary to a new summary."""
+    base_records = {
+        record["identifier"]: record for record in base.get(PRONOM_DATA, [])
+    }
+    records = summary.get(PRONOM_DATA, [])
+    identifiers = {record["identifier"] for record in records}
+    return {
+        "base": summary_digest(base),
+        "sha256": summary_digest(summary),
+        "summary": {key: value for key, value in summary.items() if key != PRONOM_DATA},
+        "records": [
+            record
+            for record in records
+            if base_records.get(record["identifier"]) != record
+        ],
+        "removed": [
+            identifier for identifier in base_records if identifier not in identifiers
+        ],
+    }
+
+
+def apply_delta(base: dict, delta: dict) -> dict:
+    """Reconstruct a summary from its base and a delta.
+
+    Records are ordered by `record_sort_key`. A `DeltaException` is
+    raised if the delta was made from a different base or the summary
+    reconstructed doesn't match the one the delta was made from.
+    """
+    if summary_digest(base) != delta["base"]:
+        raise DeltaException("delta was made from a different base summary")
+    records = {record["identifier"]: record for record in base.get(PRONOM_DATA, [])}
+    for identifier in delta["removed"]:
+        records.pop(identifier, None)
+    for record in delta["records"]:
+        records[record["identifier"]] = record
+    summary = {
+        **delta["summary"],
+        PRONOM_DATA: sorted(records.values(), key=record_sort_key),
+    }
+    if summary_digest(summary) != delta["sha256"]:
+        raise DeltaException("reconstructed summary does not match its digest")
+    return summary
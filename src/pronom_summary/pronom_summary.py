@@ -1,9 +1,17 @@
 """Provide PRONOM record parsing capabilities."""
 
 import asyncio
+import hashlib
+import io
 import json
-import multiprocessing
+import logging
+import os
+import re
+import sqlite3
+import time
 import xml.etree.ElementTree as etree
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
 from typing import Final, Union
 from xml.etree.ElementTree import ParseError
@@ -18,12 +26,71 @@ except ImportError:
     # require this import.
     pass
 
+try:
+    from src.pronom_export.archive import ExportArchive, is_archive
+    from src.pronom_summary.delta import record_sort_key
+    from src.pronom_tools.worker_pool import WorkerPool
+except ModuleNotFoundError:
+    from pronom_export.archive import ExportArchive, is_archive
+    from pronom_summary.delta import record_sort_key
+    from pronom_tools.worker_pool import WorkerPool
+
 
 NAMESPACES: Final[str] = {"pro": "http://pronom.nationalarchives.gov.uk"}
 DEPRECATED: Final[str] = "deprecated"
 OUTLINE: Final[str] = "outline"
 COMPLETE: Final[str] = "complete"
 
+# Phrases identifying outline and deprecated records in descriptions.
+# Statuses are listed in order of precedence. The table can be replaced
+# by pointing the DESCRIPTION_PHRASES environment variable at a JSON
+# file of the same shape.
+DESCRIPTION_PHRASES: Final[dict] = {
+    OUTLINE: [
+        "this is an outline record",
+    ],
+    DEPRECATED: [
+        "format deprecated",
+        "puid deprecated",
+        "puid is now deprecated",
+        "deprecated in favour",
+        "this format has been deprecated",
+        "this puid has been deprecated",
+    ],
+}
+PHRASES_ENV: Final[str] = "DESCRIPTION_PHRASES"
+
+# Summary cache defaults. Bump SUMMARY_VERSION when the output of
+# `summarize_xml` changes so that cached summaries are not reused.
+SUMMARY_CACHE_PATH: Final[Path] = Path("/var/tmp/pronom-summary-cache.db")
+SUMMARY_CACHE_SIZE: Final[int] = 10000
+SUMMARY_VERSION: Final[int] = 1
+
+# Record summarizers. The streaming summarizer reads a record in a
+# single pass and stops as soon as everything needed has been seen.
+SUMMARIZER_STREAM: Final[str] = "stream"
+SUMMARIZER_TREE: Final[str] = "tree"
+
+
+def _pro(tag: str) -> str:
+    """Return a tag name qualified by the PRONOM namespace."""
+    return f"{{{NAMESPACES['pro']}}}{tag}"
+
+
+FORMAT_NAME: Final[str] = _pro("FormatName")
+FORMAT_VERSION: Final[str] = _pro("FormatVersion")
+FORMAT_DESCRIPTION: Final[str] = _pro("FormatDescription")
+FORMAT_IDENTIFIER: Final[str] = _pro("FileFormatIdentifier")
+IDENTIFIER: Final[str] = _pro("Identifier")
+IDENTIFIER_TYPE: Final[str] = _pro("IdentifierType")
+BYTE_SEQUENCE_VALUE: Final[str] = _pro("ByteSequenceValue")
+
+STREAM_FIELDS: Final[tuple] = (FORMAT_NAME, FORMAT_VERSION, FORMAT_DESCRIPTION)
+STREAM_CHUNK_SIZE: Final[int] = 4096
+
+
+logger = logging.getLogger(__name__)
+
 
 class PRONOMException(Exception):
     """Exception to raise when there are errors with what is being
@@ -31,6 +98,97 @@ class PRONOMException(Exception):
     """
 
 
+class SummaryCache:
+    """Persistent cache of record summaries keyed by the path,
+    modification time and size of each record so that only records
+    that have changed need to be parsed again.
+
+    The cache holds at most `max_entries` summaries, evicting the
+    least recently used.
+    """
+
+    def __init__(
+        self, path: Path = SUMMARY_CACHE_PATH, max_entries: int = SUMMARY_CACHE_SIZE
+    ):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(self.path)
+        self.con.execute(
+            "create table if not exists summaries "
+            "(path text primary key, mtime_ns, size, version, summary, used)"
+        )
+
+    @staticmethod
+    def _key(xml: Path) -> tuple:
+        """Return the key that a cached summary must match."""
+        stat = xml.stat()
+        version = f"{SUMMARY_VERSION}:{get_classifier().digest}"
+        return str(xml), stat.st_mtime_ns, stat.st_size, version
+
+    def lookup(self, xml: list[Path]) -> tuple[list[dict], list[Path]]:
+        """Return the cached summaries for the given records and a list
+        of the records that need summarizing.
+        """
+        cached = {
+            tuple(row[:4]): row[4]
+            for row in self.con.execute(
+                "select path, mtime_ns, size, version, summary from summaries"
+            )
+        }
+        hits = []
+        misses = []
+        for item in xml:
+            summary = cached.get(self._key(item))
+            if summary is None:
+                misses.append(item)
+                continue
+            hits.append(json.loads(summary))
+        self.con.executemany(
+            "update summaries set used = ? where path = ?",
+            [(time.time(), str(item)) for item in set(xml) - set(misses)],
+        )
+        self.con.commit()
+        self.hits += len(hits)
+        self.misses += len(misses)
+        return hits, misses
+
+    def store(self, xml: list[Path], summaries: list[dict]) -> None:
+        """Store the summaries of the given records and evict the least
+        recently used summaries beyond `max_entries`.
+        """
+        now = time.time()
+        self.con.executemany(
+            "insert or replace into summaries values (?, ?, ?, ?, ?, ?)",
+            [
+                (*self._key(item), json.dumps(summary), now)
+                for item, summary in zip(xml, summaries)
+            ],
+        )
+        self.con.execute(
+            "delete from summaries where path not in "
+            "(select path from summaries order by used desc limit ?)",
+            (self.max_entries,),
+        )
+        self.con.commit()
+
+    def clear(self) -> int:
+        """Invalidate all cached summaries and return the number
+        removed.
+        """
+        removed = self.con.execute("delete from summaries").rowcount
+        self.con.commit()
+        self.con.execute("vacuum")
+        return removed
+
+    def close(self) -> None:
+        """Log the cache statistics and close the cache."""
+        logger.info("summary cache hits: %s, misses: %s", self.hits, self.misses)
+        self.con.close()
+
+
 def summarize_container_xml(pronom_container_xml: Path) -> list[str]:
     """Return information about the container signature file from
     PRONOM.
@@ -62,28 +220,79 @@ def get_puid(identifiers: list[etree.Element]) -> Union[str | None]:
     return None
 
 
+class DescriptionClassifier:
+    """Classify PRONOM descriptions as outline, deprecated or complete
+    with a single scan of the lower-cased description.
+
+    `phrases` maps a status to the phrases that identify it, statuses
+    are listed in order of precedence.
+    """
+
+    def __init__(self, phrases: dict = None):
+        phrases = DESCRIPTION_PHRASES if phrases is None else phrases
+        unknown = set(phrases) - {OUTLINE, DEPRECATED}
+        if unknown:
+            raise PRONOMException(f"unknown description statuses: {unknown}")
+        self.precedence = {status: idx for idx, status in enumerate(phrases)}
+        self.phrases = {}
+        for status, status_phrases in phrases.items():
+            for phrase in status_phrases:
+                if not phrase.strip():
+                    continue
+                self.phrases.setdefault(phrase.lower(), status)
+        # Longest phrases first so the longest phrase at a position wins.
+        alternatives = sorted(self.phrases, key=len, reverse=True)
+        self.pattern = re.compile("|".join(re.escape(item) for item in alternatives))
+        # Most descriptions match nothing. The longest word of each
+        # phrase must be present for the phrase to match, so checking
+        # for these anchors first avoids the regex for those records.
+        self.anchors = {max(phrase.split(), key=len) for phrase in self.phrases}
+        self.digest = hashlib.sha256(json.dumps(phrases).encode()).hexdigest()[:12]
+
+    @classmethod
+    def from_file(cls, path: Path):
+        """Create a classifier from a JSON phrase table."""
+        try:
+            with open(path, encoding="utf-8") as phrases:
+                return cls(json.load(phrases))
+        except (OSError, json.JSONDecodeError) as err:
+            raise PRONOMException(f"cannot load description phrases: {path}") from err
+
+    def classify(self, desc: str) -> tuple[str, Union[str | None]]:
+        """Return the status of a description and the phrase that
+        matched, if any.
+        """
+        text = desc.lower()
+        if not any(anchor in text for anchor in self.anchors):
+            return COMPLETE, None
+        best = None
+        for match in self.pattern.finditer(text):
+            status = self.phrases[match.group()]
+            if best is None or self.precedence[status] < self.precedence[best[0]]:
+                best = (status, match.group())
+            if self.precedence[status] == 0:
+                break
+        if not best:
+            return COMPLETE, None
+        return best
+
+
+@lru_cache(maxsize=None)
+def get_classifier() -> DescriptionClassifier:
+    """Return the description classifier, configured from the file in
+    the DESCRIPTION_PHRASES environment variable if set.
+    """
+    phrases = os.environ.get(PHRASES_ENV)
+    if phrases:
+        return DescriptionClassifier.from_file(Path(phrases))
+    return DescriptionClassifier()
+
+
 def process_desc(desc: str) -> str:
     """Identify outline and deprecated records. Simply return true
     if the description is complete.
     """
-
-    # pylint: disable=R0911
-
-    if "this is an outline record" in desc.lower():
-        return OUTLINE
-    if "format deprecated" in desc.lower():
-        return DEPRECATED
-    if "puid deprecated" in desc.lower():
-        return DEPRECATED
-    if "puid is now deprecated" in desc.lower():
-        return DEPRECATED
-    if "deprecated in favour" in desc.lower():
-        return DEPRECATED
-    if "this format has been deprecated" in desc.lower():
-        return DEPRECATED
-    if "this puid has been deprecated" in desc.lower():
-        return DEPRECATED
-    return COMPLETE
+    return get_classifier().classify(desc)[0]
 
 
 def process_name_version(name: str, version: str) -> str:
@@ -93,11 +302,9 @@ def process_name_version(name: str, version: str) -> str:
     return f"{name.strip()} {version.strip()}"
 
 
-def summarize_xml(pronom_xml: list[Path]):
-    """Summarize the fmt XML record.
-
-    If the record cannot be parsed correctly for any reason a
-    PRONOMException is raised.
+def _summarize_xml_tree(pronom_xml: Path) -> dict:
+    """Summarize the fmt XML record by building the full element tree
+    and searching it.
     """
     try:
         tree = etree.parse(pronom_xml)
@@ -132,32 +339,167 @@ def summarize_xml(pronom_xml: list[Path]):
     return res
 
 
-async def parse_pronom(pronom_export: str, container_signature: str) -> list[dict]:
+def _read_record_stream(source) -> dict:
+    """Read the summarized fields from a PRONOM record in a single
+    pass, returning once all of them have been seen.
+
+    The record is fed to a pull parser in small chunks so that parsing
+    stops as soon as the last field is found. Fields are keyed by tag,
+    the PUID by `IDENTIFIER` and the presence of a signature by
+    `BYTE_SEQUENCE_VALUE`.
+    """
+    fields = {}
+    parser = etree.XMLPullParser(events=("end",))
+    while len(fields) < len(STREAM_FIELDS) + 2:
+        data = source.read(STREAM_CHUNK_SIZE)
+        if not data:
+            parser.close()
+            break
+        parser.feed(data)
+        for _, elem in parser.read_events():
+            if elem.tag in STREAM_FIELDS:
+                fields.setdefault(elem.tag, elem.text)
+            elif elem.tag == FORMAT_IDENTIFIER:
+                if elem.findtext(IDENTIFIER_TYPE) == "PUID":
+                    fields.setdefault(IDENTIFIER, elem.findtext(IDENTIFIER))
+            elif elem.tag == BYTE_SEQUENCE_VALUE:
+                fields[BYTE_SEQUENCE_VALUE] = True
+            # Identifiers are read when their parent closes, everything
+            # else can be discarded once seen.
+            if elem.tag not in (IDENTIFIER, IDENTIFIER_TYPE):
+                elem.clear()
+    return fields
+
+
+def _summarize_xml_stream(pronom_xml: Path) -> dict:
+    """Summarize the fmt XML record with a single streaming pass."""
+    try:
+        if hasattr(pronom_xml, "read"):
+            fields = _read_record_stream(pronom_xml)
+        else:
+            with open(pronom_xml, "rb") as source:
+                fields = _read_record_stream(source)
+    except ParseError as err:
+        raise PRONOMException(f"cannot parse xml: {pronom_xml}") from err
+    if FORMAT_NAME not in fields or FORMAT_DESCRIPTION not in fields:
+        raise PRONOMException(f"cannot process {pronom_xml}")
+    res = {}
+    try:
+        res["name"] = process_name_version(
+            fields[FORMAT_NAME], fields.get(FORMAT_VERSION)
+        ).strip()
+        res["description"] = process_desc(fields[FORMAT_DESCRIPTION])
+    except AttributeError as err:
+        raise PRONOMException(f"cannot process {pronom_xml}") from err
+    res["signature"] = fields.get(BYTE_SEQUENCE_VALUE, False)
+    res["identifier"] = fields.get(IDENTIFIER)
+    return res
+
+
+def summarize_xml(pronom_xml: Path, summarizer: str = SUMMARIZER_STREAM) -> dict:
+    """Summarize the fmt XML record.
+
+    `pronom_xml` is a path or a binary file object. The record is read
+    in a single streaming pass by default, or as a full element tree
+    with `SUMMARIZER_TREE`.
+
+    If the record cannot be parsed correctly for any reason a
+    PRONOMException is raised.
+    """
+    if summarizer == SUMMARIZER_TREE:
+        return _summarize_xml_tree(pronom_xml)
+    return _summarize_xml_stream(pronom_xml)
+
+
+def _summarize_item(pronom_xml: Path) -> tuple[Path, dict]:
+    """Summarize a record in a worker, returning the record path with
+    its summary.
+    """
+    return pronom_xml, summarize_xml(pronom_xml)
+
+
+def summarize_record(record: tuple[str, bytes]) -> dict:
+    """Summarize a record given as its PUID and contents, e.g. one read
+    from an export archive or downloaded, in a worker.
+    """
+    puid, data = record
+    try:
+        return summarize_xml(io.BytesIO(data))
+    except PRONOMException as err:
+        raise PRONOMException(f"cannot process record: {puid}") from err
+
+
+def _parse_archive(archive_path: Path, pool: WorkerPool = None) -> list[dict]:
+    """Summarize every record in an export archive."""
+    if not archive_path.is_file():
+        raise PRONOMException(f"export archive does not exist: {archive_path}")
+    with (
+        ExportArchive(archive_path) as archive,
+        WorkerPool() if pool is None else nullcontext(pool) as workers,
+    ):
+        return list(workers.imap_unordered(summarize_record, archive.records()))
+
+
+async def parse_pronom(
+    pronom_export: str,
+    container_signature: str,
+    cache: SummaryCache = None,
+    pool: WorkerPool = None,
+) -> list[dict]:
     """Parse PRONOM's records and container signature file and return a
     list of information we want to understand better sorted by file
-    format name in alphabetical order.
+    format name in alphabetical order, and by PUID where names are the
+    same.
+
+    If a summary `cache` is supplied only records that are not in the
+    cache are parsed. Records are parsed using the given worker `pool`
+    or a pool created for the summary.
+
+    `pronom_export` can be an export folder or archive. Summaries of
+    archived records aren't cached as the archive is read in one go.
     """
     puid_path = Path(pronom_export)
+    if is_archive(puid_path):
+        pronom_summary = _parse_archive(puid_path, pool)
+        return finalize_summary(pronom_summary, container_signature)
     xml = []
-    for item in puid_path.glob("**/*"):
+    for item in puid_path.glob("**/*.xml"):
         if not item.is_file():
             continue
         xml.append(Path(item.resolve()))
     pronom_summary = []
-    with multiprocessing.Pool() as pool:
-        pronom_summary = pool.map(summarize_xml, xml)
+    if cache:
+        pronom_summary, xml = cache.lookup(xml)
+    if xml:
+        parsed = []
+        summaries = []
+        with WorkerPool() if pool is None else nullcontext(pool) as workers:
+            for item, summary in workers.imap_unordered(_summarize_item, xml):
+                parsed.append(item)
+                summaries.append(summary)
+        if cache:
+            cache.store(parsed, summaries)
+        pronom_summary.extend(summaries)
+    return finalize_summary(pronom_summary, container_signature)
+
+
+def finalize_summary(pronom_summary: list[dict], container_signature: str) -> list:
+    """Mark the records with a container signature as having a
+    signature and return the summaries sorted by file format name, and
+    by PUID where names are the same.
+    """
     container_summary = summarize_container_xml(container_signature)
     for item in pronom_summary:
         if item.get("identifier") not in container_summary:
             continue
         item["signature"] = True
-    return sorted(pronom_summary, key=lambda item: item["name"])
+    return sorted(pronom_summary, key=record_sort_key)
 
 
 def main():
     """Primary entry point for this script."""
 
-    rel = pronom_tools.check_existing()
+    rel = asyncio.run(pronom_tools.check_existing())
     container_name = pronom_tools.download_container(rel=rel)
     pronom_summary = asyncio.run(
         parse_pronom(
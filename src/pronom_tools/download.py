@@ -0,0 +1,197 @@
+"""Streaming downloads of PRONOM signature files.
+
+Files are streamed to a partial file next to their destination and
+hashed as they are written, then renamed into place once complete so
+that a download that fails never leaves a truncated file behind. An
+interrupted download is resumed with a HTTP Range request when the
+server supports it and the file hasn't changed.
+
+The ETag, Last-Modified date, size and sha256 of each file downloaded
+are kept in a small JSON file beside it, so a file that is already
+up-to-date isn't downloaded again. A file the server sends neither
+validator for is always downloaded.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Final
+
+import requests
+
+from .http_client import DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE: Final[int] = 64 * 1024
+
+# Number of times an interrupted download is resumed before giving up.
+MAX_RESUMES: Final[int] = 3
+
+PART_SUFFIX: Final[str] = ".part"
+META_SUFFIX: Final[str] = ".download.json"
+
+
+class DownloadException(Exception):
+    """Exception to raise when a file cannot be downloaded."""
+
+
+@dataclass
+class Download:
+    """Outcome of downloading a file."""
+
+    path: Path
+    size: int
+    sha256: str
+    etag: str | None = None
+    last_modified: str | None = None
+    skipped: bool = False
+
+
+def _meta_path(path: Path) -> Path:
+    """Return the path of the download metadata of a file."""
+    return path.with_name(f"{path.name}{META_SUFFIX}")
+
+
+def _part_path(path: Path) -> Path:
+    """Return the path a file is downloaded to before it is complete."""
+    return path.with_name(f"{path.name}{PART_SUFFIX}")
+
+
+def _load_meta(path: Path) -> dict:
+    """Return the download metadata of a file, if any."""
+    try:
+        return json.loads(_meta_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(path: Path, meta: dict) -> None:
+    """Save the download metadata of a file."""
+    _meta_path(path).write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _is_current(
+    path: Path,
+    meta: dict,
+    size: int | None,
+    etag: str | None,
+    last_modified: str | None,
+) -> bool:
+    """Return True if the local file is the one the server has, by
+    ETag if the server sends one and otherwise by Last-Modified date,
+    as well as by size.
+    """
+    if not path.is_file() or size is None or path.stat().st_size != size:
+        return False
+    if meta.get("size") != size or meta.get("sha256") is None:
+        return False
+    if etag is not None:
+        return meta.get("etag") == etag
+    if last_modified is not None:
+        return meta.get("last_modified") == last_modified
+    return False
+
+
+def _hash_file(path: Path):
+    """Return a sha256 of the contents of a file so far."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as part:
+        while chunk := part.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest
+
+
+def _stream(
+    http,
+    url: str,
+    part: Path,
+    headers: dict,
+    etag: str | None,
+    resumable: bool,
+    timeout: float,
+):
+    """Stream a URL to the partial file, resuming from the bytes already
+    written if the server can send the rest of the same file, and
+    return the sha256 of the file.
+    """
+    offset = part.stat().st_size if part.is_file() else 0
+    request_headers = dict(headers)
+    if offset and resumable:
+        request_headers["Range"] = f"bytes={offset}-"
+        request_headers["If-Range"] = etag
+    with http.get(url, headers=request_headers, stream=True, timeout=timeout) as resp:
+        if resp.status_code == 206:
+            digest = _hash_file(part)
+            mode = "ab"
+        elif resp.status_code == 200:
+            digest = hashlib.sha256()
+            mode = "wb"
+        else:
+            raise DownloadException(f"cannot download {url}: HTTP {resp.status_code}")
+        with open(part, mode) as out:
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                out.write(chunk)
+                digest.update(chunk)
+    return digest
+
+
+def download_file(
+    url: str, path: Path, http=requests, headers: dict = None
+) -> Download:
+    """Download a URL to `path`, returning a `Download`.
+
+    `http` is anything with requests-like `head` and `get`, requests
+    use its `timeout` if it has one, e.g. `HTTPClient`. The download
+    is skipped if the file at `path` matches the size and the ETag, or
+    without one the Last-Modified date, the server reports.
+    """
+    path = Path(path)
+    timeout = getattr(http, "timeout", DEFAULT_TIMEOUT)
+    # Sizes and digests are of the file as stored, not as encoded for
+    # transfer.
+    headers = {**(headers or {}), "Accept-Encoding": "identity"}
+    head = http.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+    if head.status_code != 200:
+        raise DownloadException(f"cannot download {url}: HTTP {head.status_code}")
+    etag = head.headers.get("ETag")
+    last_modified = head.headers.get("Last-Modified")
+    length = head.headers.get("Content-Length")
+    size = int(length) if length and length.isdigit() else None
+    meta = _load_meta(path)
+    if _is_current(path, meta, size, etag, last_modified):
+        logger.info("up-to-date, not downloading: %s", path)
+        return Download(
+            path, size, meta.get("sha256"), etag, last_modified, skipped=True
+        )
+    part = _part_path(path)
+    resumable = etag is not None and head.headers.get("Accept-Ranges") == "bytes"
+    # Only resume a partial download of the same version of the file.
+    if not resumable or meta.get("etag") != etag or meta.get("sha256"):
+        part.unlink(missing_ok=True)
+    _save_meta(path, {"etag": etag, "size": size, "sha256": None})
+    for attempt in range(MAX_RESUMES + 1):
+        try:
+            digest = _stream(http, url, part, headers, etag, resumable, timeout)
+            break
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        ) as err:
+            if attempt == MAX_RESUMES:
+                raise DownloadException(f"cannot download {url}: {err}") from err
+            logger.warning("download interrupted, resuming: %s (%s)", url, err)
+    written = part.stat().st_size
+    if size is not None and written != size:
+        raise DownloadException(f"incomplete download {url}: {written} of {size}")
+    os.replace(part, path)
+    result = Download(path, written, digest.hexdigest(), etag, last_modified)
+    meta = asdict(result)
+    meta.pop("path")
+    meta.pop("skipped")
+    _save_meta(path, meta)
+    logger.info("downloaded: %s (%s bytes, sha256: %s)", path, written, result.sha256)
+    return result
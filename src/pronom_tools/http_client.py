@@ -0,0 +1,137 @@
+"""Shared HTTP client for PRONOM tools.
+
+Every request made by a run goes through one keep-alive connection
+pool, so the release notes, container signature and CDN requests reuse
+their connections to each host rather than opening a new TCP and TLS
+connection for every call.
+
+The client is configured from the environment:
+
+    * HTTP_POOL_SIZE: connections kept alive per host.
+    * HTTP_TIMEOUT: seconds to wait for a server.
+    * HTTP_RETRIES: retries of an idempotent request that fails to
+      connect or is answered 429 or 5xx.
+"""
+
+import logging
+import os
+from typing import Final
+from urllib.parse import urlsplit
+
+import requests
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE: Final[int] = 10
+DEFAULT_TIMEOUT: Final[float] = 30.0
+DEFAULT_RETRIES: Final[int] = 3
+
+# Backoff between retries, multiplied by 2 for each retry.
+RETRY_BACKOFF: Final[float] = 0.5
+RETRY_STATUSES: Final[tuple] = (429, 500, 502, 503, 504)
+
+
+class HTTPClient:
+    """Pooled keep-alive HTTP session with default headers, a timeout
+    and a retry policy for idempotent requests.
+
+    Methods follow `requests`, so the client can be used anywhere the
+    `requests` module is.
+    """
+
+    def __init__(
+        self,
+        headers: dict = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+    ):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=RETRY_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=("HEAD", "GET"),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    @classmethod
+    def from_env(cls, headers: dict = None):
+        """Create a client configured from the environment."""
+        return cls(
+            headers=headers,
+            pool_size=int(os.environ.get("HTTP_POOL_SIZE", DEFAULT_POOL_SIZE)),
+            timeout=float(os.environ.get("HTTP_TIMEOUT", DEFAULT_TIMEOUT)),
+            retries=int(os.environ.get("HTTP_RETRIES", DEFAULT_RETRIES)),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Make a request through the shared session."""
+        kwargs.setdefault("timeout", self.timeout)
+        resp = self.session.request(method, url, **kwargs)
+        if logger.isEnabledFor(logging.DEBUG):
+            host = urlsplit(url).netloc
+            requests_made, connections = self.connection_counts().get(host, (0, 0))
+            logger.debug(
+                "%s %s: %s requests to %s over %s connections, %s reused",
+                method,
+                url,
+                requests_made,
+                host,
+                connections,
+                requests_made - connections,
+            )
+        return resp
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        """Make a HEAD request, not following redirects by default."""
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Make a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        """Make a PUT request."""
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        """Make a PATCH request."""
+        return self.request("PATCH", url, **kwargs)
+
+    def connection_counts(self) -> dict:
+        """Return the number of requests made and connections opened for
+        each host, keyed by `host:port` or `host` for default ports.
+        """
+        counts = {}
+        pools = self.adapter.poolmanager.pools
+        for pool in [pools[key] for key in pools.keys()]:
+            host = pool.host
+            if pool.port not in (None, 80, 443):
+                host = f"{host}:{pool.port}"
+            requests_made, connections = counts.get(host, (0, 0))
+            counts[host] = (
+                requests_made + pool.num_requests,
+                connections + pool.num_connections,
+            )
+        return counts
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
@@ -0,0 +1,365 @@
+"""Single pass download and summary of PRONOM records.
+
+Rather than exporting every record to disk and reading the export back
+to summarize it, each record is summarized in memory as soon as it is
+downloaded. Downloads and summaries are connected by a bounded queue,
+and records are parsed by the worker pool rather than on the event
+loop, so that summarizing overlaps the network requests still in
+flight and a run takes roughly as long as the download.
+
+Records that haven't changed since an incremental export are
+summarized from disk by the same pool, using the summary cache where
+possible. So are records that couldn't be downloaded but were saved by
+a previous export, otherwise the run fails rather than returning an
+incomplete summary.
+"""
+
+import asyncio
+import io
+import logging
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Final
+
+try:
+    from src.pronom_export.adaptive import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES
+    from src.pronom_export.archive import ExportArchive, is_archive
+    from src.pronom_export.pronom_xml_export import (
+        BASE_URL,
+        DEFAULT_CONCURRENCY,
+        DEFAULT_RATE,
+        FAILED,
+        FETCHED,
+        SKIPPED,
+        ExportReport,
+        PronomExportException,
+        export_pronom_data_async,
+    )
+    from src.pronom_summary.pronom_summary import (
+        PRONOMException,
+        SummaryCache,
+        summarize_xml,
+    )
+except ModuleNotFoundError:
+    from pronom_export.adaptive import DEFAULT_BACKOFF, DEFAULT_MAX_RETRIES
+    from pronom_export.archive import ExportArchive, is_archive
+    from pronom_export.pronom_xml_export import (
+        BASE_URL,
+        DEFAULT_CONCURRENCY,
+        DEFAULT_RATE,
+        FAILED,
+        FETCHED,
+        SKIPPED,
+        ExportReport,
+        PronomExportException,
+        export_pronom_data_async,
+    )
+    from pronom_summary.pronom_summary import (
+        PRONOMException,
+        SummaryCache,
+        summarize_xml,
+    )
+
+from .worker_pool import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of downloaded records waiting to be summarized. A
+# full queue holds back downloads until the summaries catch up.
+DEFAULT_QUEUE_SIZE: Final[int] = 100
+
+
+class StageQueue(asyncio.Queue):
+    """Queue between two pipeline stages that records how long each
+    stage waits on the other and the depth of the queue each time an
+    item is added.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__(maxsize)
+        self.put_wait = 0.0
+        self.get_wait = 0.0
+        self.max_depth = 0
+        self._depths = 0
+        self._samples = 0
+
+    async def put(self, item):
+        start = time.perf_counter()
+        await super().put(item)
+        self.put_wait += time.perf_counter() - start
+        self.max_depth = max(self.max_depth, self.qsize())
+        self._depths += self.qsize()
+        self._samples += 1
+
+    async def get(self):
+        start = time.perf_counter()
+        item = await super().get()
+        self.get_wait += time.perf_counter() - start
+        return item
+
+    @property
+    def mean_depth(self) -> float:
+        """Return the mean depth of the queue as items were added."""
+        return self._depths / self._samples if self._samples else 0.0
+
+
+@dataclass
+class StageTimings:
+    """Timings of a pipeline stage in seconds.
+
+    `busy` is the time spent working and `wait` the time spent waiting
+    on the other stage, `elapsed` is measured from the start of the
+    pipeline to the end of the stage.
+    """
+
+    items: int = 0
+    busy: float = 0.0
+    wait: float = 0.0
+    elapsed: float = 0.0
+
+
+@dataclass
+class PipelineReport:
+    """Outcome of a pipeline run for diagnosis."""
+
+    export: ExportReport = field(default_factory=ExportReport)
+    download: StageTimings = field(default_factory=StageTimings)
+    summarize: StageTimings = field(default_factory=StageTimings)
+    max_queue_depth: int = 0
+    mean_queue_depth: float = 0.0
+
+    def log(self) -> None:
+        """Log the timings of each stage and the queue depths."""
+        logger.info(
+            "download: %s records in %.3fs, blocked on summary: %.3fs",
+            self.download.items,
+            self.download.elapsed,
+            self.download.wait,
+        )
+        logger.info(
+            "summarize: %s records in %.3fs, busy: %.3fs, waiting on download: %.3fs",
+            self.summarize.items,
+            self.summarize.elapsed,
+            self.summarize.busy,
+            self.summarize.wait,
+        )
+        logger.info(
+            "queue depth max: %s, mean: %.1f",
+            self.max_queue_depth,
+            self.mean_queue_depth,
+        )
+
+
+def _summarize_timed(puid: str, source: bytes | Path) -> tuple[dict, float]:
+    """Summarize a record from its contents or path in a worker,
+    returning the summary and the time taken.
+    """
+    start = time.perf_counter()
+    try:
+        summary = summarize_xml(
+            io.BytesIO(source) if isinstance(source, bytes) else source
+        )
+    except PRONOMException as err:
+        raise PRONOMException(f"cannot process record: {puid}") from err
+    return summary, time.perf_counter() - start
+
+
+async def _collect(
+    pending: dict, report: PipelineReport, limit: int = 0
+) -> list[tuple[Path, dict]]:
+    """Wait for summaries in the worker pool until no more than `limit`
+    are pending, returning the key and summary of each one finished.
+    """
+    finished = []
+    while len(pending) > limit:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            summary, busy = future.result()
+            report.summarize.busy += busy
+            finished.append((pending.pop(future), summary))
+    return finished
+
+
+async def _summarize_records(
+    queue: StageQueue,
+    report: PipelineReport,
+    workers: WorkerPool,
+    cache: SummaryCache = None,
+    limit: int = DEFAULT_QUEUE_SIZE,
+) -> tuple[list[dict], list[tuple], list[tuple]]:
+    """Summarize records from the queue in the worker pool until the
+    queue is closed with None. No more than `limit` records are parsed
+    at a time.
+
+    Returns the summaries of the records downloaded, and the PUIDs and
+    paths of the records that weren't downloaded because they haven't
+    changed and of those that failed.
+    """
+    finished = []
+    pending = {}
+    skipped = []
+    failed = []
+    try:
+        while (item := await queue.get()) is not None:
+            puid, result, data, file_name = item
+            report.download.items += 1
+            if result == SKIPPED:
+                skipped.append((puid, file_name))
+                continue
+            if result == FAILED:
+                failed.append((puid, file_name))
+                continue
+            if result != FETCHED:
+                continue
+            pending[workers.submit(_summarize_timed, puid, data)] = file_name
+            finished.extend(await _collect(pending, report, limit))
+        finished.extend(await _collect(pending, report))
+    finally:
+        for future in pending:
+            future.cancel()
+    if cache:
+        cache.store(
+            [Path(file_name.resolve()) for file_name, _ in finished],
+            [summary for _, summary in finished],
+        )
+    return [summary for _, summary in finished], skipped, failed
+
+
+def _previous_copies(
+    failed: list[tuple[str, Path]], archive_path: Path = None
+) -> list[tuple[str, Path]]:
+    """Return the records that failed to download but were saved on
+    disk, or in the export archive at `archive_path`, by a previous
+    export.
+    """
+    if archive_path is None:
+        return [(puid, path) for puid, path in failed if path.is_file()]
+    with ExportArchive(archive_path) as archive:
+        return [(puid, path) for puid, path in failed if archive.read(puid)]
+
+
+async def _summarize_skipped(
+    skipped: list[tuple[str, Path]],
+    report: PipelineReport,
+    workers: WorkerPool,
+    cache: SummaryCache = None,
+    archive_path: Path = None,
+) -> list[dict]:
+    """Summarize the records on disk that weren't downloaded in the
+    worker pool, reading them from the export archive at
+    `archive_path` if given.
+    """
+    pending = {}
+    summaries = []
+    if archive_path is not None:
+        with ExportArchive(archive_path) as archive:
+            for puid, _ in skipped:
+                future = workers.submit(_summarize_timed, puid, archive.read(puid))
+                pending[future] = puid
+    else:
+        paths = {Path(item.resolve()): puid for puid, item in skipped}
+        if cache:
+            summaries, uncached = cache.lookup(list(paths))
+            paths = {path: paths[path] for path in uncached}
+        for path, puid in paths.items():
+            pending[workers.submit(_summarize_timed, puid, path)] = path
+    try:
+        parsed = await _collect(pending, report)
+    finally:
+        for future in pending:
+            future.cancel()
+    if cache:
+        cache.store([path for path, _ in parsed], [summary for _, summary in parsed])
+    return summaries + [summary for _, summary in parsed]
+
+
+async def summarize_export(
+    pronom_path: Path,
+    fmt_range: int,
+    incremental: bool = True,
+    priority_puids: list = None,
+    cache: SummaryCache = None,
+    save: bool = True,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    base_url: str = BASE_URL,
+    pool: WorkerPool = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+) -> tuple[list[dict], PipelineReport]:
+    """Download PRONOM records and summarize each one as it arrives.
+
+    Records are still written to `pronom_path` if `save`, so that later
+    runs can be incremental. `pronom_path` can be an export archive,
+    whose records aren't cached. Records are parsed by the worker
+    `pool`, or a pool created for the run. Summaries are returned
+    unsorted and without container signatures applied, see
+    `finalize_summary`, with a report of the run.
+
+    Records that fail to download are summarized from a previous
+    export if possible, otherwise a `PronomExportException` is raised.
+    """
+    archive_path = pronom_path if is_archive(pronom_path) else None
+    if archive_path is not None:
+        cache = None
+    queue = StageQueue(queue_size)
+    report = PipelineReport()
+    start = time.perf_counter()
+
+    async def download():
+        """Run the export, closing the queue when it completes."""
+        try:
+            report.export = await export_pronom_data_async(
+                pronom_path=pronom_path,
+                fmt_range=fmt_range,
+                concurrency=concurrency,
+                rate=rate,
+                base_url=base_url,
+                incremental=incremental,
+                priority_puids=priority_puids,
+                records=queue,
+                save=save,
+                max_retries=max_retries,
+                backoff=backoff,
+            )
+        finally:
+            report.download.elapsed = time.perf_counter() - start
+            await queue.put(None)
+
+    with WorkerPool() if pool is None else nullcontext(pool) as workers:
+        # Workers are forked before the export starts its threads.
+        workers.start()
+        task = asyncio.ensure_future(download())
+        try:
+            # Records that are downloaded but not saved can't be cached.
+            summaries, skipped, failed = await _summarize_records(
+                queue, report, workers, cache if save else None, queue_size
+            )
+        except BaseException:
+            task.cancel()
+            raise
+        await task
+        previous = _previous_copies(failed, archive_path)
+        if len(previous) < len(failed):
+            missing = sorted({puid for puid, _ in failed} - dict(previous).keys())
+            raise PronomExportException(
+                f"records couldn't be downloaded: {', '.join(missing)}"
+            )
+        for puid, _ in previous:
+            logger.warning("summarizing previous export of failed record: %s", puid)
+        skipped.extend(previous)
+        summaries.extend(
+            await _summarize_skipped(skipped, report, workers, cache, archive_path)
+        )
+    report.summarize.items = len(summaries)
+    report.summarize.elapsed = time.perf_counter() - start
+    report.summarize.wait = queue.get_wait
+    report.download.wait = queue.put_wait
+    report.download.busy = report.download.elapsed - queue.put_wait
+    report.max_queue_depth = queue.max_depth
+    report.mean_queue_depth = queue.mean_depth
+    report.log()
+    return summaries, report
@@ -46,6 +46,7 @@ one another.
 
 import argparse
 import asyncio
+import gzip
 import hashlib
 import json
 import logging
@@ -54,22 +55,41 @@ import re
 import sys
 import time
 import xml.etree.ElementTree as etree
-from dataclasses import asdict, dataclass
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Final, Tuple, Union
 
 import requests
 from dotenv import load_dotenv
 
+from .download import download_file
+from .http_client import HTTPClient
+from .pipeline import summarize_export
+from .release_notes import RELEASE_NOTES_CACHE_PATH, ReleaseNotes
 from .version import get_version
+from .worker_pool import WorkerPool
 
 try:
-    from src.pronom_export.pronom_xml_export import export_pronom_data
-    from src.pronom_summary.pronom_summary import PRONOMException, parse_pronom
+    from src.pronom_summary.delta import make_delta, summary_digest
+    from src.pronom_summary.pronom_summary import (
+        SUMMARY_CACHE_PATH,
+        PRONOMException,
+        SummaryCache,
+        finalize_summary,
+        parse_pronom,
+    )
 except ModuleNotFoundError:
-    from pronom_export.pronom_xml_export import export_pronom_data
-    from pronom_summary.pronom_summary import PRONOMException, parse_pronom
+    from pronom_summary.delta import make_delta, summary_digest
+    from pronom_summary.pronom_summary import (
+        SUMMARY_CACHE_PATH,
+        PRONOMException,
+        SummaryCache,
+        finalize_summary,
+        parse_pronom,
+    )
 
 
 ENV_FILE: Final[str] = "pronom.env"
@@ -100,11 +120,19 @@ RELEASE_NOTE_URL: Final[str] = (
 
 USER_AGENT: Final[str] = "pronom-tools/0.0.0"
 
+# Copy of the last summary stored on the pronom-stats server, used as
+# the base of the next delta upload.
+STORED_SUMMARY_PATH: Final[Path] = Path("/var/tmp/pronom-stored-summary.json")
+
 
 class PronomToolsException(Exception):
     """Exception to raise if there's an error in the workflow."""
 
 
+# Releases resolved this run, by release notes provider.
+_RELEASES: dict = {}
+
+
 CDN_BASE: Final[str] = "https://cdn.nationalarchives.gov.uk/documents/"
 RELEASE_ARCHIVE = (
     "https://www.nationalarchives.gov.uk/aboutapps/pronom/droid-signature-files.htm"
@@ -113,6 +141,9 @@ CONTAINER_UPDATE_URL: Final[str] = (
     "https://www.nationalarchives.gov.uk/pronom/container-signature.xml"
 )
 
+# Characters of the release notes parsed at a time.
+RELEASE_NOTES_CHUNK_SIZE: Final[int] = 16 * 1024
+
 
 @dataclass
 class ReleaseSummary:
@@ -125,29 +156,7 @@ class ReleaseSummary:
     sig_file: str = ""
     container_sig: str = ""
     x_puid_const: str = "x-fmt/455"
-
-    @staticmethod
-    def _get_container_formatted_date(date: str):
-        """Return a date formatted to container-signature-file
-        specifications.
-        """
-        date_format = "%a, %d %b %Y %H:%M:%S GMT"
-        date_obj = datetime.strptime(date, date_format)
-        return datetime.strftime(date_obj, "%Y%m%d")
-
-    def _get_container_date(self):
-        """Get the latest container signature file date from the
-        canonical update location. Last-modified-date is used to set
-        this in DROID itself.
-        """
-        http_headers = requests.head(
-            CONTAINER_UPDATE_URL, timeout=30, headers=make_headers()
-        )
-        if not http_headers.status_code == 200:
-            raise PronomToolsException("error reading release headers")
-        http_last_modified_date = http_headers.headers.get("Last-modified")
-        http_date = self._get_container_formatted_date(http_last_modified_date)
-        return http_date
+    outline_puids: list[str] = field(default_factory=list)
 
     def make_sig_file_url(self) -> str:
         """Construct a URL to the standard signature file for the given
@@ -159,13 +168,13 @@ class ReleaseSummary:
         self.sig_file = file_name
         return file_name
 
-    def make_container_sig_file_url(self) -> str:
+    def make_container_sig_file_url(self, container_date: str) -> str:
         """Construct a URL to the container signature file for the
-        given release summary.
+        given release summary and container signature file date.
 
         Example: `https://cdn.nationalarchives.gov.uk/documents/container-signature-20231127.xml`
         """
-        file_name = f"{CDN_BASE}container-signature-{self._get_container_date()}.xml"
+        file_name = f"{CDN_BASE}container-signature-{container_date}.xml"
         self.container_sig = file_name
         return file_name
 
@@ -174,7 +183,7 @@ class ReleaseSummary:
         return self.container_sig.replace(CDN_BASE, "")
 
 
-def download_container(rel: ReleaseSummary) -> str:
+def download_container(rel: ReleaseSummary, http: HTTPClient = None) -> str:
     """Download a container signature file and return the signature file
     name for use in later functions.
 
@@ -190,14 +199,12 @@ def download_container(rel: ReleaseSummary) -> str:
         }
     ```
     """
-    res = requests.get(rel.container_sig, timeout=30)
     file_name = rel.container_sig.split(CDN_BASE, 1)[1]
-    with open(file_name, "w", encoding="utf-8") as sig_file:
-        sig_file.write(res.text)
+    download_file(rel.container_sig, Path(file_name), http or get_http_client())
     return file_name
 
 
-def download_standard(rel: ReleaseSummary) -> str:
+def download_standard(rel: ReleaseSummary, http: HTTPClient = None) -> str:
     """Download a standard signature file and return the signature file
     name for use in later functions.
 
@@ -213,18 +220,11 @@ def download_standard(rel: ReleaseSummary) -> str:
         }
     ```
     """
-    res = requests.get(rel.sig_file, timeout=30)
     file_name = rel.sig_file.split(CDN_BASE, 1)[1]
-    with open(file_name, "w", encoding="utf-8") as sig_file:
-        sig_file.write(res.text)
+    download_file(rel.sig_file, Path(file_name), http or get_http_client())
     return file_name
 
 
-def perform_export(pronom_path: Path, max_puid: int):
-    """Export PRONOM xml records."""
-    export_pronom_data(pronom_path=pronom_path, fmt_range=max_puid + 1)
-
-
 def make_headers() -> dict:
     """Create a HTTP header object for the different http requests
     in this script.
@@ -232,6 +232,50 @@ def make_headers() -> dict:
     return {"user-agent": USER_AGENT}
 
 
+@lru_cache(maxsize=None)
+def get_http_client() -> HTTPClient:
+    """Return the pooled HTTP client shared by every request of a run,
+    configured from the environment.
+    """
+    return HTTPClient.from_env(headers=make_headers())
+
+
+def get_release_notes(http: HTTPClient = None) -> ReleaseNotes:
+    """Return the release notes provider of the run, so the release
+    notes are only retrieved once whichever functions need them.
+    """
+    return _get_release_notes(http or get_http_client())
+
+
+@lru_cache(maxsize=None)
+def _get_release_notes(http: HTTPClient) -> ReleaseNotes:
+    """Return the release notes provider for a HTTP client."""
+    return ReleaseNotes(http, RELEASE_NOTE_URL, RELEASE_NOTES_CACHE_PATH)
+
+
+def get_container_date(http: HTTPClient = None) -> str:
+    """Get the latest container signature file date from the
+    canonical update location. Last-modified-date is used to set
+    this in DROID itself.
+    """
+    http = http or get_http_client()
+    http_headers = http.head(CONTAINER_UPDATE_URL)
+    if not http_headers.status_code == 200:
+        raise PronomToolsException("error reading release headers")
+    http_last_modified_date = http_headers.headers.get("Last-modified")
+    return datetime.strftime(parse_http_date(http_last_modified_date), "%Y%m%d")
+
+
+def verify_release_file(url: str, http: HTTPClient = None) -> None:
+    """Ensure a signature file linked from a release summary exists."""
+    http = http or get_http_client()
+    resp = http.head(url, allow_redirects=True)
+    if resp.status_code != 200:
+        raise PronomToolsException(
+            f"release file not found: {url} (HTTP {resp.status_code})"
+        )
+
+
 def replace_day_suffix(day: str):
     """Replace suffixes in day strings, e.g. 2nd, 3rd.
 
@@ -263,12 +307,43 @@ def parse_release_date(date: str) -> str:
     return str(date_obj.date())
 
 
-def parse_newest_record_id(records: etree.Element) -> str:
-    """Retrieve the newest record identifier from the signature
-    file.
+def parse_latest_release_note(release_xml: str) -> Tuple[etree.Element, str]:
+    """Stream the release notes and return the most recent release
+    note, the first in the document, and the newest record identifier,
+    the last format in its first release outline.
+
+    Parsing stops as soon as the first release note is closed, so only
+    the start of the release notes, which grow with every release, is
+    read.
     """
-    formats = records.findall("format")
-    return f"fmt/{formats[len(formats) - 1].find('puid').text}"
+    parser = etree.XMLPullParser(events=("end",))
+    outlines = 0
+    newest_record = None
+    start = re.match(r"\s*", release_xml).end()
+    for pos in range(start, len(release_xml), RELEASE_NOTES_CHUNK_SIZE):
+        parser.feed(release_xml[pos : pos + RELEASE_NOTES_CHUNK_SIZE])
+        for _, elem in parser.read_events():
+            if elem.tag == "release_outline":
+                outlines += 1
+            elif elem.tag == "format" and outlines == 0:
+                newest_record = f"fmt/{elem.find('puid').text.strip()}"
+            elif elem.tag == "release_note":
+                return elem, newest_record
+    raise PronomToolsException("no release note found in the release notes")
+
+
+def parse_release_outline(release_note: etree.Element) -> list[str]:
+    """Retrieve the fmt and x-fmt identifiers of all the records listed
+    in the outline of a release, i.e. records that are new or have
+    changed in that release.
+    """
+    puids = []
+    for puid in release_note.findall("release_outline/format/puid"):
+        puid_type = puid.get("type")
+        if puid_type not in ("fmt", "x-fmt"):
+            continue
+        puids.append(f"{puid_type}/{puid.text.strip()}")
+    return list(dict.fromkeys(puids))
 
 
 def parse_http_date(date: str) -> datetime:
@@ -278,40 +353,72 @@ def parse_http_date(date: str) -> datetime:
     return date_obj
 
 
-def parse_release_xml(release_xml: str) -> Tuple[str, str, str]:
+def parse_release_xml(release_xml: str, container_date: str = None) -> ReleaseSummary:
     """Parse the PRONOM release notes XML.
 
     We need three pieces of information from here, the release date and
     the latest PRONOM record identifier and the version of the signature
-    file.
+    file. The container signature file URL is made if the date of the
+    latest container signature file, `container_date`, is given.
     """
-    root = etree.fromstring(release_xml.strip())
     # Most recent release will always be the first in the Release Note XML.
-    latest = root.find("release_note")
+    latest, newest_record = parse_latest_release_note(release_xml)
     date = latest.find("release_date")
-    release_outline = latest.find("release_outline")
     signature_file_name = latest.find("signature_filename")
     release_date = parse_release_date(date.text)
-    newest_record = parse_newest_record_id(release_outline)
     signature_version = parse_signature_file_string(signature_file_name.text)
     summary = ReleaseSummary(
         release_date,
         newest_record,
         signature_version,
         RELEASE_NOTE_URL,
+        outline_puids=parse_release_outline(latest),
     )
     summary.make_sig_file_url()
-    summary.make_container_sig_file_url()
+    if container_date:
+        summary.make_container_sig_file_url(container_date)
     return summary
 
 
-def check_release_headers() -> Tuple[bool, datetime]:
+async def resolve_release(
+    http: HTTPClient = None, verify: bool = False
+) -> ReleaseSummary:
+    """Resolve the latest release from the release notes and the date
+    of the latest container signature file.
+
+    The release notes and container signature file date are requested
+    concurrently. With `verify`, the signature files linked from the
+    release are checked to exist as soon as their URLs are known.
+    """
+    notes = get_release_notes(http)
+
+    async def resolve_container_sig() -> str:
+        container_date = await asyncio.to_thread(get_container_date, notes.http)
+        if verify:
+            await asyncio.to_thread(
+                verify_release_file,
+                f"{CDN_BASE}container-signature-{container_date}.xml",
+                notes.http,
+            )
+        return container_date
+
+    async def resolve_release_notes() -> ReleaseSummary:
+        summary = parse_release_xml(await asyncio.to_thread(notes.text))
+        if verify:
+            await asyncio.to_thread(verify_release_file, summary.sig_file, notes.http)
+        return summary
+
+    summary, container_date = await asyncio.gather(
+        resolve_release_notes(), resolve_container_sig()
+    )
+    summary.make_container_sig_file_url(container_date)
+    return summary
+
+
+def check_release_headers(http: HTTPClient = None) -> Tuple[bool, datetime]:
     """Check the HTTP headers of the release note to see if there is
     a newer date than we have recorded."""
-    http_headers = requests.head(RELEASE_NOTE_URL, timeout=30, headers=make_headers())
-    if not http_headers.status_code == 200:
-        raise PronomToolsException("error reading release headers")
-    http_last_modified_date = http_headers.headers.get("Last-modified")
+    http_last_modified_date = get_release_notes(http).last_modified()
     http_date = parse_http_date(http_last_modified_date)
     logger.info("retrieved date from http header: %s", http_date)
     twentry_four_hours_in_seconds: Final[int] = 86400
@@ -321,23 +428,33 @@ def check_release_headers() -> Tuple[bool, datetime]:
     ), http_date
 
 
-def check_for_release() -> Union[None | ReleaseSummary]:
+async def check_for_release(
+    http: HTTPClient = None,
+) -> Union[None | ReleaseSummary]:
     """Check for a new release of PRONOM."""
-    today, http_date = check_release_headers()
+    today, http_date = check_release_headers(http)
     if not today:
         logger.info(
             "last updated '%s' is not within last 24 hours skipping release check",
             http_date,
         )
         return None
-    resp = requests.get(RELEASE_NOTE_URL, timeout=30, headers=make_headers())
-    return parse_release_xml(resp.text)
+    return await check_existing(http)
+
 
+async def check_existing(
+    http: HTTPClient = None, verify: bool = False
+) -> Union[None | ReleaseSummary]:
+    """Return information about the existing pronom release.
 
-def check_existing() -> Union[None | ReleaseSummary]:
-    """Return information about the existing pronom release."""
-    resp = requests.get(RELEASE_NOTE_URL, timeout=30, headers=make_headers())
-    return parse_release_xml(resp.text)
+    The release is resolved once per run, and the release notes are
+    only downloaded if they have changed since the last run. With
+    `verify` the signature files of the release are checked to exist.
+    """
+    notes = get_release_notes(http)
+    if verify or notes not in _RELEASES:
+        _RELEASES[notes] = await resolve_release(notes.http, verify=verify)
+    return _RELEASES[notes]
 
 
 def _dump_rel(rel: ReleaseSummary) -> str:
@@ -347,29 +464,89 @@ def _dump_rel(rel: ReleaseSummary) -> str:
     return json.dumps(asdict(rel), indent=2)
 
 
-async def get_summary(pronom_path: Path, clean: bool = False) -> dict:
-    """Perform the get summary dance."""
+async def get_summary(
+    pronom_path: Path,
+    clean: bool = False,
+    incremental: bool = True,
+    cache_path: Union[Path | None] = SUMMARY_CACHE_PATH,
+    pool: WorkerPool = None,
+    save: bool = True,
+    http: HTTPClient = None,
+) -> dict:
+    """Perform the get summary dance.
+
+    When exporting, records are summarized as they are downloaded and
+    are only written to disk if `save`. Records listed in the release
+    outline are fetched first and, for incremental exports, the
+    remainder are only fetched if they have changed. Otherwise the
+    existing export is summarized. Record summaries are cached at
+    `cache_path` unless it is `None`.
+
+    Records that can't be downloaded are summarized from a previous
+    export, or a `PronomExportException` is raised so that an
+    incomplete summary isn't stored.
+
+    Records are summarized by the worker `pool` for the run, one is
+    created if it isn't supplied. Requests for release
+    information use the shared `http` client.
+    """
     logger.info("pronom path: %s", pronom_path)
-    rel = check_existing()
+    http = http or get_http_client()
+    rel = await check_existing(http)
     max_puid = int(rel.latest_puid.lower().replace("fmt/", ""))
-    if not pronom_path.exists() or clean:
-        perform_export(pronom_path=pronom_path, max_puid=max_puid)
-    sig_file = download_container(rel)
+    sig_file = download_container(rel, http)
+    cache = SummaryCache(cache_path) if cache_path else None
     try:
-        res = await parse_pronom(pronom_path, sig_file)
+        with WorkerPool() if pool is None else nullcontext(pool) as workers:
+            if not pronom_path.exists() or clean:
+                res, report = await summarize_export(
+                    pronom_path=pronom_path,
+                    fmt_range=max_puid + 1,
+                    incremental=incremental,
+                    priority_puids=rel.outline_puids,
+                    cache=cache,
+                    save=save,
+                    pool=workers,
+                )
+                logger.info(
+                    "export complete, refetched: %s, skipped: %s, failed: %s",
+                    report.export.fetched,
+                    report.export.skipped,
+                    report.export.failed,
+                )
+                res = finalize_summary(res, sig_file)
+            else:
+                res = await parse_pronom(
+                    pronom_path, sig_file, cache=cache, pool=workers
+                )
     except PRONOMException as err:
         raise PRONOMException(
             f"folder: '{pronom_path}' might exist but might not contain PRONOM data"
         ) from err
+    finally:
+        if cache:
+            cache.close()
     rel_augmented = asdict(rel)
+    # The outline is only used to drive the export and isn't part of
+    # the summary.
+    rel_augmented.pop("outline_puids")
     rel_augmented["pronom_data"] = res
     return rel_augmented
 
 
-async def store_summary(pronom_path: Path):
+async def store_summary(
+    pronom_path: Path,
+    cache_path: Path = SUMMARY_CACHE_PATH,
+    pool: WorkerPool = None,
+    delta: bool = True,
+    http: HTTPClient = None,
+):
     """Store the PRONOM summary in the database."""
-    summary = await get_summary(pronom_path=pronom_path)
-    store_pronom_summary(summary)
+    http = http or get_http_client()
+    summary = await get_summary(
+        pronom_path=pronom_path, cache_path=cache_path, pool=pool, http=http
+    )
+    store_pronom_summary(summary, delta=delta, http=http)
 
 
 def _get_auth():
@@ -396,24 +573,100 @@ def _get_api_addr():
     return server_addr
 
 
-def store_pronom_summary(data: str):
-    """Store the PRONOM summary."""
+def _get_stored_digest(http: HTTPClient, url: str, headers: dict) -> Union[str | None]:
+    """Return the digest of the latest summary advertised by the server,
+    or None if the server has no summary or doesn't support deltas.
+    """
+    resp = http.head(url, headers=headers)
+    if resp.status_code != 200:
+        return None
+    return resp.headers.get("X-Summary-SHA256")
+
+
+def _get_delta_base(
+    http: HTTPClient, url: str, headers: dict, sha256: str
+) -> Union[dict | None]:
+    """Return the latest summary stored on the server to make a delta
+    against.
+
+    The local copy of the last summary stored is used if it matches
+    the digest advertised by the server, otherwise the summary is
+    downloaded.
+    """
+    try:
+        base = json.loads(STORED_SUMMARY_PATH.read_text(encoding="utf-8"))
+        if summary_digest(base) == sha256:
+            return base
+    except (OSError, ValueError):
+        pass
+    resp = http.get(url, headers=headers)
+    if resp.status_code != 200:
+        return None
+    base = resp.json()["summary"]
+    if summary_digest(base) != sha256:
+        return None
+    return base
+
+
+def _send_gzip(
+    http: HTTPClient, url: str, method: str, data: dict, headers: dict
+) -> requests.Response:
+    """Send JSON data as a gzip compressed request body."""
+    return http.request(
+        method,
+        url,
+        data=gzip.compress(json.dumps(data).encode()),
+        headers={**headers, "Content-Encoding": "gzip"},
+    )
+
+
+def _save_stored_summary(data: dict):
+    """Keep a copy of the summary stored as the base of the next delta."""
+    try:
+        STORED_SUMMARY_PATH.write_text(json.dumps(data), encoding="utf-8")
+    except OSError as err:
+        logger.warning("unable to keep a copy of the stored summary: %s", err)
+
+
+def store_pronom_summary(data: dict, delta: bool = True, http: HTTPClient = None):
+    """Store the PRONOM summary.
+
+    With `delta` only the records that differ from the latest summary
+    on the server are uploaded. The whole summary is uploaded if the
+    server has no summary, or if the delta is rejected. Servers that
+    advertise a summary digest accept gzip request bodies.
+    """
+    http = http or get_http_client()
     headers = {}
     headers["auth"] = _get_auth()
-    server_addr = _get_api_addr()
+    url = f"{_get_api_addr()}/pronom_summary"
     try:
-        resp = requests.put(
-            f"{server_addr}/pronom_summary",
-            data=json.dumps(data),
-            headers=headers,
-            timeout=30,
-        )
+        sha256 = _get_stored_digest(http, url, headers)
+        resp = None
+        base = _get_delta_base(http, url, headers, sha256) if delta and sha256 else None
+        if base is not None:
+            changes = make_delta(base, data)
+            resp = _send_gzip(http, url, "PATCH", changes, headers)
+            if resp.status_code == 200:
+                logger.info(
+                    "PRONOM data stored as a delta: %s records, %s removed",
+                    len(changes["records"]),
+                    len(changes["removed"]),
+                )
+            else:
+                logger.warning("delta rejected, storing all PRONOM data: %s", resp)
+        if resp is None or resp.status_code != 200:
+            if sha256:
+                resp = _send_gzip(http, url, "PUT", data, headers)
+            else:
+                resp = http.put(url, data=json.dumps(data), headers=headers)
         if resp.status_code != 200:
             logger.error("error storing PRONOM data: %s", resp)
             sys.exit(1)
     except requests.exceptions.ConnectionError as err:
         logger.error("unable to connect to database: %s", err)
         sys.exit(1)
+    _save_stored_summary(data)
     logger.info("PRONOM data stored")
 
 
@@ -441,6 +694,13 @@ async def pronom_tools():
         action="store_true",
     )
 
+    parser.add_argument(
+        "--verify",
+        help="with --check-existing, check the signature files of the release exist",
+        required=False,
+        action="store_true",
+    )
+
     parser.add_argument(
         "--summary",
         "-s",
@@ -468,7 +728,7 @@ async def pronom_tools():
     parser.add_argument(
         "--clean-and-summary",
         "-c",
-        help="download and output any existing PRONOM data (deletes existing `pronom-export` folder)",
+        help="download and output any existing PRONOM data (only new or changed records are downloaded)",
         required=False,
         action="store_true",
     )
@@ -498,6 +758,57 @@ async def pronom_tools():
         default=Path("/var/tmp/pronom-export"),
     )
 
+    parser.add_argument(
+        "--workers",
+        "-w",
+        help="number of worker processes to use for the run (defaults to the number of CPUs)",
+        required=False,
+        type=int,
+    )
+
+    parser.add_argument(
+        "--cache-path",
+        help="path to the cache of summarized PRONOM records",
+        required=False,
+        type=Path,
+        default=SUMMARY_CACHE_PATH,
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        help="summarize every PRONOM record without using the cache",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        help="invalidate the cache of summarized PRONOM records",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--no-save",
+        help="summarize downloaded PRONOM records without writing them to --path (disables incremental downloads)",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--full-upload",
+        help="store the whole PRONOM summary rather than the changes since the last summary stored",
+        required=False,
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--debug",
+        help="log debug information, including connection reuse by HTTP requests",
+        required=False,
+        action="store_true",
+    )
+
     parser.add_argument(
         "--version",
         "-v",
@@ -508,50 +819,77 @@ async def pronom_tools():
 
     args = parser.parse_args()
 
-    if args.new_release:
-        rel = check_for_release()
-        if not rel:
-            sys.exit(1)
-        print(_dump_rel(rel))
-
-    if args.check_existing:
-        rel = check_existing()
-        print(_dump_rel(rel))
-        sys.exit()
-
-    if args.version:
-        print(get_version())
-        sys.exit()
-
-    if args.summary or args.clean_and_summary:
-        res = await get_summary(pronom_path=args.path, clean=args.clean_and_summary)
-        print(json.dumps(res, indent=2))
-        sys.exit()
-
-    if args.head:
-        res = await get_summary(pronom_path=args.path, clean=False)
-        pronom_data = res.pop("pronom_data")
-        res["collected_pronom_entries"] = len(pronom_data)
-        print(json.dumps(res, indent=2))
-        sys.exit()
-
-    if args.store:
-        res = await store_summary(pronom_path=args.path)
-        sys.exit()
-
-    if args.download_container:
-        rel = check_existing()
-        sig_file = download_container(rel)
-        print("container sig output to:", Path(sig_file).resolve())
-        sys.exit()
-
-    if args.download_signature:
-        rel = check_existing()
-        sig_file = download_standard(rel)
-        print("container sig output to:", Path(sig_file).resolve())
-        sys.exit()
-
-    parser.print_help()
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    # The pool is only started if there is work to do and is shared by
+    # every summary of the run.
+    with WorkerPool(args.workers) as pool:
+        if args.new_release:
+            rel = await check_for_release()
+            if not rel:
+                sys.exit(1)
+            print(_dump_rel(rel))
+
+        if args.check_existing:
+            rel = await check_existing(verify=args.verify)
+            print(_dump_rel(rel))
+            sys.exit()
+
+        if args.version:
+            print(get_version())
+            sys.exit()
+
+        if args.clear_cache:
+            cache = SummaryCache(args.cache_path)
+            print("summaries removed from cache:", cache.clear())
+            cache.close()
+            sys.exit()
+
+        cache_path = None if args.no_cache else args.cache_path
+
+        if args.summary or args.clean_and_summary:
+            res = await get_summary(
+                pronom_path=args.path,
+                clean=args.clean_and_summary,
+                cache_path=cache_path,
+                save=not args.no_save,
+                pool=pool,
+            )
+            print(json.dumps(res, indent=2))
+            sys.exit()
+
+        if args.head:
+            res = await get_summary(
+                pronom_path=args.path, clean=False, cache_path=cache_path, pool=pool
+            )
+            pronom_data = res.pop("pronom_data")
+            res["collected_pronom_entries"] = len(pronom_data)
+            print(json.dumps(res, indent=2))
+            sys.exit()
+
+        if args.store:
+            await store_summary(
+                pronom_path=args.path,
+                cache_path=cache_path,
+                pool=pool,
+                delta=not args.full_upload,
+            )
+            sys.exit()
+
+        if args.download_container:
+            rel = await check_existing()
+            sig_file = download_container(rel)
+            print("container sig output to:", Path(sig_file).resolve())
+            sys.exit()
+
+        if args.download_signature:
+            rel = await check_existing()
+            sig_file = download_standard(rel)
+            print("container sig output to:", Path(sig_file).resolve())
+            sys.exit()
+
+        parser.print_help()
 
 
 def main() -> None:
@@ -0,0 +1,130 @@
+"""Release notes provider for PRONOM tools.
+
+The release notes XML is fetched at most once per run and kept in
+memory for every caller. A copy is also kept on disk keyed on its
+`Last-Modified` header, so that a later run within `DEFAULT_MAX_AGE`
+of the last download only makes a conditional HEAD request to check
+that the release notes haven't changed. Outside of that window the
+release notes are fetched with a conditional GET.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Final
+
+logger = logging.getLogger(__name__)
+
+RELEASE_NOTES_CACHE_PATH: Final[Path] = Path("/var/tmp/pronom-release-notes.json")
+
+# Seconds a cached copy of the release notes is trusted on the strength
+# of a HEAD request alone.
+DEFAULT_MAX_AGE: Final[int] = 86400
+
+
+class ReleaseNotesException(Exception):
+    """Exception to raise when the release notes cannot be retrieved."""
+
+
+class ReleaseNotes:
+    """PRONOM release notes retrieved through `http`, anything with
+    requests-like `head` and `get`, and cached at `cache_path`.
+    """
+
+    def __init__(
+        self,
+        http,
+        url: str,
+        cache_path: Path = RELEASE_NOTES_CACHE_PATH,
+        max_age: int = DEFAULT_MAX_AGE,
+    ):
+        self.http = http
+        self.url = url
+        self.cache_path = Path(cache_path)
+        self.max_age = max_age
+        self._cached = None
+        self._last_modified = None
+        self._text = None
+
+    def _load(self) -> dict:
+        """Return the cached release notes, if any."""
+        if self._cached is None:
+            try:
+                cached = json.loads(self.cache_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                cached = {}
+            if cached.get("url") != self.url or not cached.get("last_modified"):
+                cached = {}
+            self._cached = cached
+        return self._cached
+
+    def _save(self, text: str, last_modified: str) -> None:
+        """Cache the release notes for later runs."""
+        self._cached = {
+            "url": self.url,
+            "last_modified": last_modified,
+            "fetched": time.time(),
+            "text": text,
+        }
+        if not last_modified:
+            return
+        try:
+            self.cache_path.write_text(json.dumps(self._cached), encoding="utf-8")
+        except OSError as err:
+            logger.warning("unable to cache the release notes: %s", err)
+
+    def _conditional_headers(self) -> dict:
+        """Return the headers to make a request conditional on the
+        release notes having changed since they were cached.
+        """
+        cached = self._load()
+        if not cached:
+            return {}
+        return {"If-Modified-Since": cached["last_modified"]}
+
+    def last_modified(self) -> str:
+        """Return the `Last-Modified` date of the release notes, making
+        a HEAD request if they haven't been retrieved this run.
+        """
+        if self._last_modified is not None:
+            return self._last_modified
+        resp = self.http.head(self.url, headers=self._conditional_headers())
+        if resp.status_code == 304:
+            self._last_modified = self._load()["last_modified"]
+        elif resp.status_code == 200:
+            self._last_modified = resp.headers.get("Last-Modified")
+        else:
+            raise ReleaseNotesException(
+                f"error reading release headers: HTTP {resp.status_code}"
+            )
+        return self._last_modified
+
+    def text(self) -> str:
+        """Return the release notes XML, downloading it only if it has
+        changed since it was cached.
+        """
+        if self._text is not None:
+            return self._text
+        cached = self._load()
+        if (
+            cached
+            and time.time() - cached.get("fetched", 0) <= self.max_age
+            and self.last_modified() == cached["last_modified"]
+        ):
+            logger.info("release notes unchanged since: %s", cached["last_modified"])
+            self._text = cached["text"]
+            return self._text
+        resp = self.http.get(self.url, headers=self._conditional_headers())
+        if resp.status_code == 304:
+            logger.info("release notes unchanged since: %s", cached["last_modified"])
+            text, last_modified = cached["text"], cached["last_modified"]
+        elif resp.status_code == 200:
+            text, last_modified = resp.text, resp.headers.get("Last-Modified")
+        else:
+            raise ReleaseNotesException(
+                f"error reading release notes: HTTP {resp.status_code}"
+            )
+        self._save(text, last_modified)
+        self._text, self._last_modified = text, last_modified
+        return self._text
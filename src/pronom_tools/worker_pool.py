@@ -0,0 +1,130 @@
+"""Reusable process pool shared by the export and summary phases of a
+PRONOM tools run.
+
+The pool is started on first use and kept for the life of the run so
+that worker processes are only forked once. Results are streamed back
+with `imap_unordered` as soon as each task finishes, or awaited one
+task at a time from an event loop with `submit`.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from multiprocessing.pool import Pool
+from typing import Callable, Final, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# Tasks are split into roughly this many chunks per worker, large
+# enough to amortize inter-process overhead for small tasks and small
+# enough to keep workers evenly loaded.
+CHUNKS_PER_WORKER: Final[int] = 4
+
+
+class WorkerPool:
+    """Process pool manager that is created once per run.
+
+    Use as a context manager, or call `close()` when the run is
+    complete. Time spent starting the pool and time spent working are
+    reported in the logs when it is closed.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.startup_time = 0.0
+        self.work_time = 0.0
+        self.tasks = 0
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_pool(self) -> Pool:
+        """Return the process pool, starting it if needed."""
+        if self._pool is None:
+            start = time.perf_counter()
+            self._pool = Pool(self.workers)
+            self.startup_time = time.perf_counter() - start
+            logger.info(
+                "worker pool started: %s workers in %.3fs",
+                self.workers,
+                self.startup_time,
+            )
+        return self._pool
+
+    def start(self):
+        """Start the pool now rather than on first use, e.g. before
+        threads are started in the parent process.
+        """
+        self._get_pool()
+        return self
+
+    def chunksize(self, tasks: int) -> int:
+        """Return a chunksize for the given number of tasks."""
+        return max(1, tasks // (self.workers * CHUNKS_PER_WORKER))
+
+    def imap_unordered(
+        self, func: Callable, iterable: Iterable, chunksize: int = None
+    ) -> Iterator:
+        """Apply `func` to each item and yield results as they
+        finish.
+        """
+        items = list(iterable)
+        if not items:
+            return
+        pool = self._get_pool()
+        start = time.perf_counter()
+        try:
+            yield from pool.imap_unordered(
+                func, items, chunksize=chunksize or self.chunksize(len(items))
+            )
+        finally:
+            self.work_time += time.perf_counter() - start
+            self.tasks += len(items)
+
+    def submit(self, func: Callable, *args) -> asyncio.Future:
+        """Apply `func` to `args` in a worker, returning a future that
+        can be awaited from the running event loop without blocking it.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def resolve(result):
+            loop.call_soon_threadsafe(_set_result, future, result)
+
+        def fail(err):
+            loop.call_soon_threadsafe(_set_exception, future, err)
+
+        self._get_pool().apply_async(func, args, callback=resolve, error_callback=fail)
+        self.tasks += 1
+        return future
+
+    def close(self) -> None:
+        """Shut down the pool and report how it was used."""
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        logger.info(
+            "worker pool startup: %.3fs, work: %.3fs, tasks: %s",
+            self.startup_time,
+            self.work_time,
+            self.tasks,
+        )
+
+
+def _set_result(future: asyncio.Future, result) -> None:
+    """Set the result of a future unless it was cancelled."""
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, err: BaseException) -> None:
+    """Set the exception of a future unless it was cancelled."""
+    if not future.done():
+        future.set_exception(err)
@@ -0,0 +1,298 @@
+"""Test PRONOM export code."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from src.pronom_export.adaptive import AdaptiveConcurrency, parse_retry_after
+from src.pronom_export.archive import ExportArchive
+from src.pronom_export.pronom_xml_export import (
+    ENGINE_POOL,
+    MANIFEST_NAME,
+    PronomExportException,
+    TokenBucket,
+    export_pronom_data,
+    export_pronom_data_async,
+)
+from src.pronom_summary.pronom_summary import SummaryCache, summarize_xml
+from src.pronom_tools.pipeline import DEFAULT_QUEUE_SIZE, summarize_export
+from src.pronom_tools.worker_pool import WorkerPool
+
+RECORD = '<?xml version="1.0" encoding="utf-8"?>\n<PRONOM-Report/>\n'
+ETAG = '"v1"'
+DROP = "drop"
+FIXTURE = Path("tests", "fixtures", "export", "fmt", "fmt1.xml")
+
+
+class RecordHandler(BaseHTTPRequestHandler):
+    """Serve a stub PRONOM record for any fmt or x-fmt path and an
+    HTML error page for anything called `/fmt/2.xml`.
+
+    Faults can be injected by listing the responses to make to a path
+    before it succeeds in `faults`, either a status or `DROP` to close
+    the connection without responding.
+    """
+
+    requests = []
+    record = RECORD
+    faults = {}
+
+    def do_GET(self):  # pylint: disable=C0103
+        """Respond to a GET request, honoring `If-None-Match`."""
+        RecordHandler.requests.append((self.path, time.monotonic()))
+        faults = RecordHandler.faults.get(self.path)
+        if faults:
+            fault = faults.pop(0)
+            if fault == DROP:
+                self.close_connection = True
+                return
+            self.send_response(fault)
+            if fault == 429:
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = RecordHandler.record
+        if self.path.endswith("/fmt/2.xml"):
+            body = "<html>not found</html>"
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        """Silence request logging."""
+
+
+@pytest.fixture(name="stub_server")
+def fixture_stub_server():
+    """Run a local stub PRONOM server for the duration of a test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecordHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_export_async(tmp_path, stub_server):
+    """Ensure the async engine downloads and writes XML records and
+    skips anything that isn't XML.
+    """
+    await export_pronom_data_async(
+        pronom_path=tmp_path, fmt_range=4, rate=0, base_url=stub_server
+    )
+    fmt = sorted(item.name for item in (tmp_path / "fmt").iterdir())
+    assert fmt == ["fmt1.xml", "fmt3.xml"]
+    assert len(list((tmp_path / "x-fmt").iterdir())) == 455
+    assert (tmp_path / "fmt" / "fmt1.xml").read_text() == RECORD
+
+
+@pytest.mark.asyncio
+async def test_export_incremental(tmp_path, stub_server):
+    """Ensure an incremental export skips records that haven't changed
+    and refetches priority records and records changed on disk.
+    """
+    report = await export_pronom_data_async(
+        pronom_path=tmp_path,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        incremental=True,
+    )
+    assert (report.fetched, report.skipped, report.invalid) == (457, 0, 1)
+    assert (tmp_path / MANIFEST_NAME).is_file()
+    (tmp_path / "x-fmt" / "x-fmt1.xml").write_text("changed")
+    RecordHandler.requests = []
+    report = await export_pronom_data_async(
+        pronom_path=tmp_path,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        incremental=True,
+        priority_puids=["fmt/3"],
+        concurrency=1,
+    )
+    assert (report.fetched, report.skipped, report.invalid) == (2, 455, 1)
+    assert RecordHandler.requests[0][0] == "/fmt/3.xml"
+    assert (tmp_path / "x-fmt" / "x-fmt1.xml").read_text() == RECORD
+
+
+@pytest.mark.asyncio
+async def test_summarize_export(tmp_path, stub_server, monkeypatch):
+    """Ensure records are summarized as they are downloaded, and that
+    unchanged records are summarized from disk on the next run.
+    """
+    monkeypatch.setattr(RecordHandler, "record", FIXTURE.read_text())
+    cache = SummaryCache(tmp_path / "cache.db")
+    export = tmp_path / "export"
+    summaries, report = await summarize_export(
+        export, fmt_range=4, rate=0, base_url=stub_server, cache=cache
+    )
+    assert summaries == [summarize_xml(FIXTURE)] * 457
+    assert (report.export.fetched, report.export.invalid) == (457, 1)
+    assert (report.download.items, report.summarize.items) == (458, 457)
+    assert 0 < report.max_queue_depth <= DEFAULT_QUEUE_SIZE
+    assert len(list(export.glob("**/*.xml"))) == 457
+    summaries, report = await summarize_export(
+        export, fmt_range=4, rate=0, base_url=stub_server, cache=cache
+    )
+    assert summaries == [summarize_xml(FIXTURE)] * 457
+    assert (report.export.skipped, cache.hits) == (457, 457)
+    cache.close()
+    memory = tmp_path / "memory"
+    with WorkerPool(2) as pool:
+        summaries, report = await summarize_export(
+            memory, fmt_range=4, rate=0, base_url=stub_server, save=False, pool=pool
+        )
+        assert pool.tasks == 457
+    assert len(summaries) == report.export.fetched == 457
+    assert not list(memory.glob("**/*.xml"))
+
+
+@pytest.mark.asyncio
+async def test_summarize_export_failures(tmp_path, stub_server, monkeypatch):
+    """Ensure a record that fails to download is summarized from the
+    previous export, and that the run fails if there isn't one.
+    """
+    monkeypatch.setattr(RecordHandler, "record", FIXTURE.read_text())
+    export = tmp_path / "export"
+    await summarize_export(export, fmt_range=4, rate=0, base_url=stub_server)
+    monkeypatch.setattr(RecordHandler, "faults", {"/fmt/1.xml": [500] * 2})
+    summaries, report = await summarize_export(
+        export,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        max_retries=1,
+        backoff=0.01,
+    )
+    assert list(report.export.failures) == ["fmt/1"]
+    assert summaries == [summarize_xml(FIXTURE)] * 457
+    monkeypatch.setattr(RecordHandler, "faults", {"/fmt/1.xml": [500] * 2})
+    with pytest.raises(PronomExportException, match="fmt/1"):
+        await summarize_export(
+            tmp_path / "new",
+            fmt_range=4,
+            rate=0,
+            base_url=stub_server,
+            max_retries=1,
+            backoff=0.01,
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_archive(tmp_path, stub_server, monkeypatch):
+    """Ensure an export can be written to a single file archive,
+    incrementally, and summarized from it.
+    """
+    monkeypatch.setattr(RecordHandler, "record", FIXTURE.read_text())
+    archive_path = tmp_path / "export.sqlite"
+    report = await export_pronom_data_async(
+        pronom_path=archive_path,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        incremental=True,
+    )
+    assert (report.fetched, report.skipped, report.invalid) == (457, 0, 1)
+    assert list(tmp_path.iterdir()) == [archive_path]
+    with ExportArchive(archive_path) as archive:
+        assert len(archive.manifest()) == 457
+        assert archive.manifest()["fmt/1"]["etag"] == ETAG
+        assert archive.read("fmt/2") is None
+    summaries, pipeline = await summarize_export(
+        archive_path,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        priority_puids=["fmt/1"],
+    )
+    assert (pipeline.export.fetched, pipeline.export.skipped) == (1, 456)
+    assert summaries == [summarize_xml(FIXTURE)] * 457
+    with ExportArchive(archive_path) as archive:
+        assert archive.read("fmt/1") == FIXTURE.read_text().encode()
+
+
+@pytest.mark.asyncio
+async def test_export_faults(tmp_path, stub_server, monkeypatch):
+    """Ensure records are retried when the server is overloaded or
+    drops the connection, honoring `Retry-After`, and that records are
+    reported as failed once their retries are used up.
+    """
+    monkeypatch.setattr(
+        RecordHandler,
+        "faults",
+        {"/fmt/1.xml": [429], "/fmt/3.xml": [503, DROP], "/x-fmt/1.xml": [500] * 3},
+    )
+    monkeypatch.setattr(RecordHandler, "requests", [])
+    report = await export_pronom_data_async(
+        pronom_path=tmp_path,
+        fmt_range=4,
+        rate=0,
+        base_url=stub_server,
+        max_retries=2,
+        backoff=0.01,
+    )
+    assert (report.fetched, report.invalid, report.failed) == (456, 1, 1)
+    assert list(report.failures) == ["x-fmt/1"]
+    assert report.retries == 5
+    assert (tmp_path / "fmt" / "fmt3.xml").read_text() == RECORD
+    assert not (tmp_path / "x-fmt" / "x-fmt1.xml").exists()
+    fmt1 = [at for path, at in RecordHandler.requests if path == "/fmt/1.xml"]
+    assert fmt1[1] - fmt1[0] >= 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_concurrency():
+    """Ensure the limit grows while requests succeed, halves once per
+    round trip when they fail and pauses when asked to.
+    """
+    controller = AdaptiveConcurrency(maximum=4, initial=2)
+    for _ in range(10):
+        await controller.release(await controller.acquire(), True)
+    assert (controller.limit, controller.peak) == (4, 4)
+    first = await controller.acquire()
+    second = await controller.acquire()
+    await controller.release(first, False)
+    await controller.release(second, False)
+    assert controller.limit == 2
+    await controller.release(await controller.acquire(), False, retry_after=0.2)
+    assert controller.limit == 1
+    start = time.monotonic()
+    await controller.release(await controller.acquire(), True)
+    assert time.monotonic() - start >= 0.2
+    assert parse_retry_after("120") == 120
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+    assert parse_retry_after("soon") is None
+
+
+def test_export_range_required(tmp_path):
+    """Ensure that the export fails without a fmt range."""
+    with pytest.raises(PronomExportException):
+        export_pronom_data(pronom_path=tmp_path, engine=ENGINE_POOL)
+    with pytest.raises(PronomExportException):
+        export_pronom_data(pronom_path=tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket():
+    """Ensure the token bucket allows a burst and then limits the
+    rate.
+    """
+    bucket = TokenBucket(rate=100, capacity=5)
+    for _ in range(5):
+        await bucket.acquire()
+    assert bucket._tokens < 1  # pylint: disable=W0212
+    await bucket.acquire()
+    assert bucket._tokens < 1  # pylint: disable=W0212
@@ -1,11 +1,27 @@
 """Placeholder tests."""
 
+import asyncio
+import hashlib
+import threading
+import time
+import xml.etree.ElementTree as etree
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.pronom_tools import pronom_tools
+from src.pronom_tools.download import download_file
+from src.pronom_tools.http_client import HTTPClient
 from src.pronom_tools.pronom_tools import (
     parse_http_date,
+    parse_latest_release_note,
     parse_release_date,
+    parse_release_outline,
     parse_release_xml,
     parse_signature_file_string,
 )
+from src.pronom_tools.release_notes import ReleaseNotes
+from src.pronom_tools.worker_pool import WorkerPool
 
 # pylint: disable=C0302
 
@@ -2196,6 +2212,21 @@ def test_parse_xml():
     assert release_summary.release_notes_date == "2023-08-22"
     assert release_summary.latest_puid == "fmt/1900"
     assert release_summary.version == "V114"
+    assert release_summary.container_sig == ""
+    release_summary = parse_release_xml(RELEASE_XML, container_date="20231127")
+    assert release_summary.container_sig.endswith("container-signature-20231127.xml")
+
+
+def test_parse_latest_release_note():
+    """Ensure the release notes are only parsed up to the end of the
+    latest release note.
+    """
+    truncated = RELEASE_XML.replace("</release_notes>", "<release_note><unclosed")
+    latest, newest_record = parse_latest_release_note(truncated)
+    assert latest.find("signature_filename").text == "DROID_SignatureFile_V114.xml"
+    assert newest_record == "fmt/1900"
+    with pytest.raises(pronom_tools.PronomToolsException):
+        parse_latest_release_note("<release_notes></release_notes>")
 
 
 def test_parse_release_dates():
@@ -2221,3 +2252,293 @@ def test_parse_signature_file_string():
     assert parse_signature_file_string("DROID_SignatureFile_V111.xml") == "V111"
     assert parse_signature_file_string("DROID_SignatureFile_V110.xml") == "V110"
     assert parse_signature_file_string("DROID_SignatureFile_V109.xml") == "V109"
+
+
+def test_parse_release_outline():
+    """Ensure the records listed in the latest release are returned."""
+    latest = etree.fromstring(RELEASE_XML.strip()).find("release_note")
+    puids = parse_release_outline(latest)
+    assert puids[0] == "fmt/1862"
+    assert "fmt/5" in puids
+    assert all(puid.startswith(("fmt/", "x-fmt/")) for puid in puids)
+    assert len(puids) == len(set(puids))
+
+
+def test_worker_pool():
+    """Ensure the worker pool is started once, on demand, and streams
+    results for each use.
+    """
+    with WorkerPool(workers=2) as pool:
+        assert pool.chunksize(1) == 1
+        assert pool.chunksize(2400) == 300
+        assert not list(pool.imap_unordered(abs, []))
+        assert pool.startup_time == 0
+        assert sorted(pool.imap_unordered(abs, [-1, -2, -3])) == [1, 2, 3]
+        started = pool.startup_time
+        assert sorted(pool.imap_unordered(abs, [-4])) == [4]
+        assert pool.startup_time == started
+        assert pool.tasks == 4
+
+
+class SignatureFileHandler(BaseHTTPRequestHandler):
+    """Serve a stub signature file supporting Range requests, dropping
+    the connection half way through the first `interrupt` responses.
+    """
+
+    protocol_version = "HTTP/1.1"
+    body = b"<FFSignatureFile/>" * 10000
+    etag = '"sig-1"'
+    last_modified = None
+    interrupt = 0
+    requests = []
+    user_agents = []
+
+    def _send_headers(self, status: int, length: int, extra: dict = None):
+        """Send the status and headers of a response."""
+        self.send_response(status)
+        if SignatureFileHandler.etag:
+            self.send_header("ETag", SignatureFileHandler.etag)
+        if SignatureFileHandler.last_modified:
+            self.send_header("Last-Modified", SignatureFileHandler.last_modified)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):  # pylint: disable=C0103
+        """Respond to a HEAD request."""
+        SignatureFileHandler.user_agents.append(self.headers.get("User-Agent"))
+        self._send_headers(200, len(SignatureFileHandler.body))
+
+    def do_GET(self):  # pylint: disable=C0103
+        """Respond to a GET request, honoring `Range` and `If-Range`."""
+        body = SignatureFileHandler.body
+        SignatureFileHandler.requests.append(self.headers.get("Range"))
+        start = 0
+        if_range = self.headers.get("If-Range")
+        if self.headers.get("Range") and if_range == SignatureFileHandler.etag:
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            content_range = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            self._send_headers(206, len(body) - start, {"Content-Range": content_range})
+        else:
+            self._send_headers(200, len(body))
+        if SignatureFileHandler.interrupt:
+            SignatureFileHandler.interrupt -= 1
+            self.wfile.write(body[start : len(body) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        """Silence request logging."""
+
+
+@pytest.fixture(name="sig_server")
+def fixture_sig_server():
+    """Run a local stub signature file server for the duration of a test."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SignatureFileHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/DROID_SignatureFile_V116.xml"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_file(tmp_path, sig_server, monkeypatch):
+    """Ensure signature files are streamed to disk, resumed when
+    interrupted and not downloaded again while they are up-to-date.
+    """
+    monkeypatch.setattr(SignatureFileHandler, "interrupt", 1)
+    monkeypatch.setattr(SignatureFileHandler, "requests", [])
+    body = SignatureFileHandler.body
+    path = tmp_path / "DROID_SignatureFile_V116.xml"
+    res = download_file(sig_server, path)
+    assert path.read_bytes() == body
+    assert res.sha256 == hashlib.sha256(body).hexdigest()
+    assert (res.size, res.etag, res.skipped) == (len(body), '"sig-1"', False)
+    first, resumed = SignatureFileHandler.requests
+    assert first is None and resumed.startswith("bytes=") and resumed != "bytes=0-"
+    assert [item.name for item in tmp_path.iterdir() if item.suffix == ".part"] == []
+    assert download_file(sig_server, path).skipped
+    assert len(SignatureFileHandler.requests) == 2
+    monkeypatch.setattr(SignatureFileHandler, "body", body[::-1])
+    monkeypatch.setattr(SignatureFileHandler, "etag", '"sig-2"')
+    res = download_file(sig_server, path)
+    assert not res.skipped
+    assert path.read_bytes() == body[::-1]
+
+
+def test_download_file_without_etag(tmp_path, sig_server, monkeypatch):
+    """Ensure a file the server sends no ETag for is downloaded again
+    when its Last-Modified date changes, even if its size doesn't, and
+    always without either validator.
+    """
+    monkeypatch.setattr(SignatureFileHandler, "etag", None)
+    monkeypatch.setattr(
+        SignatureFileHandler, "last_modified", "Mon, 27 Nov 2023 10:00:00 GMT"
+    )
+    path = tmp_path / "DROID_SignatureFile_V116.xml"
+    assert not download_file(sig_server, path).skipped
+    assert download_file(sig_server, path).skipped
+    body = SignatureFileHandler.body[::-1]
+    monkeypatch.setattr(SignatureFileHandler, "body", body)
+    monkeypatch.setattr(
+        SignatureFileHandler, "last_modified", "Tue, 28 Nov 2023 10:00:00 GMT"
+    )
+    res = download_file(sig_server, path)
+    assert not res.skipped
+    assert path.read_bytes() == body
+    monkeypatch.setattr(SignatureFileHandler, "last_modified", None)
+    assert not download_file(sig_server, path).skipped
+
+
+def test_http_client_reuses_connections(tmp_path, sig_server, monkeypatch):
+    """Ensure requests through the shared client reuse one keep-alive
+    connection and send the client's headers.
+    """
+    monkeypatch.setattr(SignatureFileHandler, "user_agents", [])
+    host = sig_server.split("/")[2]
+    with HTTPClient(headers={"user-agent": "pronom-test/1.0"}) as http:
+        assert http.head(sig_server).status_code == 200
+        download_file(sig_server, tmp_path / "DROID_SignatureFile_V116.xml", http)
+        assert http.connection_counts()[host] == (3, 1)
+    assert SignatureFileHandler.user_agents == ["pronom-test/1.0"] * 2
+
+
+class ReleaseNotesHandler(BaseHTTPRequestHandler):
+    """Serve stub release notes honoring `If-Modified-Since`."""
+
+    protocol_version = "HTTP/1.1"
+    last_modified = "Wed, 23 Aug 2023 10:00:00 GMT"
+    requests = []
+
+    def _respond(self, body: bool):
+        """Send the release notes, or 304 if they haven't changed."""
+        ReleaseNotesHandler.requests.append(self.command)
+        data = RELEASE_XML.encode()
+        if self.headers.get("If-Modified-Since") == ReleaseNotesHandler.last_modified:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Last-Modified", ReleaseNotesHandler.last_modified)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+
+    def do_HEAD(self):  # pylint: disable=C0103
+        """Respond to a HEAD request."""
+        self._respond(body=False)
+
+    def do_GET(self):  # pylint: disable=C0103
+        """Respond to a GET request."""
+        self._respond(body=True)
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        """Silence request logging."""
+
+
+def test_release_notes(tmp_path, monkeypatch):
+    """Ensure the release notes are downloaded once per run, and only
+    checked with a conditional HEAD by later runs until they change or
+    the cached copy expires.
+    """
+    monkeypatch.setattr(ReleaseNotesHandler, "requests", [])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReleaseNotesHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/release-notes.xml"
+    cache_path = tmp_path / "release-notes.json"
+    try:
+        with HTTPClient() as http:
+            notes = ReleaseNotes(http, url, cache_path)
+            assert notes.text() == notes.text() == RELEASE_XML
+            assert notes.last_modified() == ReleaseNotesHandler.last_modified
+            assert ReleaseNotesHandler.requests == ["GET"]
+            assert ReleaseNotes(http, url, cache_path).text() == RELEASE_XML
+            assert ReleaseNotesHandler.requests == ["GET", "HEAD"]
+            assert ReleaseNotes(http, url, cache_path, max_age=-1).text()
+            assert ReleaseNotesHandler.requests == ["GET", "HEAD", "GET"]
+            monkeypatch.setattr(
+                ReleaseNotesHandler, "last_modified", "Thu, 23 Nov 2023 10:00:00 GMT"
+            )
+            notes = ReleaseNotes(http, url, cache_path)
+            assert notes.text() == RELEASE_XML
+            assert notes.last_modified() == "Thu, 23 Nov 2023 10:00:00 GMT"
+            assert ReleaseNotesHandler.requests[3:] == ["HEAD", "GET"]
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class ReleaseHandler(ReleaseNotesHandler):
+    """Serve stub release notes, container signature file updates and
+    signature files, slowly, recording the most requests in flight.
+    """
+
+    delay = 0.2
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def _respond(self, body: bool):
+        """Respond to a request for any of the release files."""
+        with ReleaseHandler.lock:
+            ReleaseHandler.in_flight += 1
+            ReleaseHandler.max_in_flight = max(
+                ReleaseHandler.max_in_flight, ReleaseHandler.in_flight
+            )
+        time.sleep(ReleaseHandler.delay)
+        with ReleaseHandler.lock:
+            ReleaseHandler.in_flight -= 1
+        if self.path == "/release-notes.xml":
+            super()._respond(body)
+            return
+        ReleaseNotesHandler.requests.append(f"{self.command} {self.path}")
+        files = (
+            "/container-signature.xml",
+            "/documents/DROID_SignatureFile_V114.xml",
+            "/documents/container-signature-20231127.xml",
+        )
+        self.send_response(200 if self.path in files else 404)
+        self.send_header("Last-Modified", "Mon, 27 Nov 2023 10:00:00 GMT")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def test_resolve_release(tmp_path, monkeypatch):
+    """Ensure the release notes and signature files of a release are
+    requested concurrently, and the release is only resolved once.
+    """
+    monkeypatch.setattr(ReleaseNotesHandler, "requests", [])
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReleaseHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    monkeypatch.setattr(pronom_tools, "RELEASE_NOTE_URL", f"{base}/release-notes.xml")
+    monkeypatch.setattr(
+        pronom_tools, "CONTAINER_UPDATE_URL", f"{base}/container-signature.xml"
+    )
+    monkeypatch.setattr(pronom_tools, "CDN_BASE", f"{base}/documents/")
+    monkeypatch.setattr(
+        pronom_tools, "RELEASE_NOTES_CACHE_PATH", tmp_path / "release-notes.json"
+    )
+    try:
+        with HTTPClient() as http:
+            rel = asyncio.run(pronom_tools.check_existing(http, verify=True))
+            assert ReleaseHandler.max_in_flight == 2
+            assert rel.version == "V114"
+            assert rel.sig_file == f"{base}/documents/DROID_SignatureFile_V114.xml"
+            assert rel.container_sig == (
+                f"{base}/documents/container-signature-20231127.xml"
+            )
+            assert len(ReleaseNotesHandler.requests) == 4
+            assert asyncio.run(pronom_tools.check_existing(http)) is rel
+            assert len(ReleaseNotesHandler.requests) == 4
+            monkeypatch.setattr(pronom_tools, "CDN_BASE", f"{base}/missing/")
+            with pytest.raises(pronom_tools.PronomToolsException):
+                asyncio.run(pronom_tools.check_existing(http, verify=True))
+    finally:
+        server.shutdown()
+        server.server_close()
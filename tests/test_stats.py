@@ -0,0 +1,588 @@
+"""Test the PRONOM stats API."""
+
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+from src.pronom_stats.compression import GZIP, IDENTITY, negotiate
+from src.pronom_stats.database import Database
+from src.pronom_stats.pronom_stats import (
+    FILTER_ALL,
+    app,
+    backfill_statistics,
+    iter_csv,
+    main,
+    migrate,
+)
+from src.pronom_summary.delta import make_delta, summary_digest
+from src.pronom_tools import pronom_tools
+
+AUTH = "badf00d"
+
+SUMMARY = {
+    "release_notes_date": "2023-11-23",
+    "latest_puid": "fmt/1924",
+    "version": "V116",
+    "release_notes": "https://www.nationalarchives.gov.uk/aboutapps/pronom/release-notes.xml",
+    "sig_file": "https://cdn.nationalarchives.gov.uk/documents/DROID_SignatureFile_V116.xml",
+    "container_sig": "https://cdn.nationalarchives.gov.uk/documents/container-signature-20231127.xml",
+    "x_puid_const": "x-fmt/455",
+    "pronom_data": [
+        {
+            "name": "Broadcast WAVE 0 Generic",
+            "description": "complete",
+            "signature": True,
+            "identifier": "fmt/1",
+        },
+        {
+            "name": "Tagged Image File Format 6",
+            "description": "deprecated",
+            "signature": False,
+            "identifier": "fmt/10",
+        },
+        {
+            "name": "dBASE Database IV",
+            "description": "complete",
+            "signature": True,
+            "identifier": "x-fmt/10",
+        },
+        {
+            "name": "form*Z Project File",
+            "description": "outline",
+            "signature": False,
+            "identifier": "x-fmt/442",
+        },
+    ],
+}
+
+
+def put_summary(client: TestClient, summary: dict):
+    """Store a summary using the API."""
+    resp = client.put(
+        "/pronom_summary",
+        content=json.dumps(summary),
+        headers={"auth": hashlib.sha256(AUTH.encode()).hexdigest()},
+    )
+    assert resp.status_code == 200
+
+
+@pytest.fixture(name="client")
+def fixture_client(tmp_path, monkeypatch):
+    """Provide a client for an API backed by a new database."""
+    monkeypatch.setenv("SERVER_AUTH", AUTH)
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "pronom-stats.db"))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_statistics(client):
+    """Ensure the statistics endpoints report on the latest summary."""
+    put_summary(client, SUMMARY)
+    assert client.get("/pronom_version").text == "V116"
+    assert client.get("/records_count").json() == 4
+    assert client.get("/complete_description_count").json() == 2
+    assert client.get("/incomplete_description_count").json() == 1
+    assert client.get("/signature_count").json() == 2
+    assert client.get("/requires_signature_count").json() == 1
+    assert client.get("/get_deprecated_count").json() == 1
+
+
+def test_statistics_breakdown(client):
+    """Ensure statistics are materialized with a fmt and x-fmt
+    breakdown.
+    """
+    put_summary(client, SUMMARY)
+    stats = client.get("/statistics").json()
+    assert stats["fmt_count"] == 2
+    assert stats["x_fmt_count"] == 2
+    assert stats["fmt_signature_count"] == 1
+    assert stats["x_fmt_signature_count"] == 1
+
+
+def test_reports(client):
+    """Ensure the reports filter the records of the latest release."""
+    put_summary(client, {**SUMMARY, "version": "V115", "pronom_data": []})
+    put_summary(client, SUMMARY)
+    records = SUMMARY["pronom_data"]
+    assert client.get("/incomplete_descriptions").json() == [records[3]]
+    assert client.get("/requires_signatures").json() == [records[3]]
+    assert client.get("/get_deprecated").json() == [records[1]]
+    assert "fmt/10" in client.get("/get_deprecated_hx").text
+    assert client.get("/signature_files").json() == {
+        "standard signature": SUMMARY["sig_file"],
+        "container signature": SUMMARY["container_sig"],
+    }
+
+
+def test_report_pages(client):
+    """Ensure reports can be paged, projected and filtered."""
+    put_summary(client, SUMMARY)
+    records = SUMMARY["pronom_data"]
+    resp = client.get("/get_deprecated", params={"limit": 1, "fields": "identifier"})
+    assert resp.json() == [{"identifier": "fmt/10"}]
+    pages = []
+    params = {"limit": 2}
+    while True:
+        resp = client.get("/pronom_summary", params=params)
+        assert resp.json()["summary"]["sig_file"] == SUMMARY["sig_file"]
+        pages.append(resp.json()["summary"]["pronom_data"])
+        if "link" not in resp.headers:
+            break
+        assert resp.links["next"]["url"].startswith("http://testserver/pronom_summary")
+        params = {**params, "after": pages[-1][-1]["identifier"]}
+    assert pages == [records[:2], records[2:], []]
+    resp = client.get(
+        "/pronom_summary", params={"puid_type": "x-fmt", "name_prefix": "DBASE"}
+    )
+    assert resp.json()["summary"]["pronom_data"] == [records[2]]
+    resp = client.get(
+        "/requires_signatures", params={"puid_type": "fmt", "status": "outline"}
+    )
+    assert resp.json() == []
+    assert client.get("/get_deprecated", params={"after": "fmt/0"}).status_code == 400
+    assert client.get("/get_deprecated", params={"fields": "size"}).status_code == 400
+    assert client.get("/get_deprecated", params={"puid_type": "y"}).status_code == 422
+
+
+def test_summary_csv(client):
+    """Ensure the CSV summary is quoted and can be filtered and have
+    its columns selected.
+    """
+    records = [
+        *SUMMARY["pronom_data"],
+        {
+            "name": 'Comma, "Quote" Format',
+            "description": "complete",
+            "signature": False,
+            "identifier": "fmt/2000",
+        },
+    ]
+    put_summary(client, {**SUMMARY, "pronom_data": records})
+    resp = client.get("/pronom_summary_csv")
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ["name", "description", "signature", "identifier"]
+    assert rows[1] == ["Broadcast WAVE 0 Generic", "complete", "True", "fmt/1"]
+    assert rows[-1] == ['Comma, "Quote" Format', "complete", "False", "fmt/2000"]
+    resp = client.get(
+        "/pronom_summary_csv",
+        params={"columns": "identifier", "status": "complete", "signature": False},
+    )
+    assert resp.text == "identifier\nfmt/2000\n"
+    resp = client.get("/pronom_summary_csv", params={"columns": "identifier,size"})
+    assert resp.status_code == 400
+
+
+def test_summary_csv_batches(client, tmp_path):
+    """Ensure the CSV summary gives its read connection back between
+    batches of rows.
+    """
+    put_summary(client, SUMMARY)
+    db = Database(tmp_path / "pronom-stats.db", readers=1, busy_timeout=0.1)
+    chunks = iter_csv(db, ["identifier"], FILTER_ALL, batch_size=3)
+    assert next(chunks) == "identifier\n"
+    assert next(chunks) == "fmt/1\nfmt/10\nx-fmt/10\n"
+    with db.reader() as cur:
+        assert cur.execute("select count(*) from records").fetchone() == (4,)
+    assert list(chunks) == ["x-fmt/442\n"]
+    db.close()
+
+
+def test_conditional_get(client):
+    """Ensure read endpoints are validated by the latest release and
+    answer conditional requests with 304.
+    """
+    put_summary(client, SUMMARY)
+    resp = client.get("/signature_files_hx")
+    etag = resp.headers["etag"]
+    last_modified = resp.headers["last-modified"]
+    assert resp.headers["cache-control"].startswith("public, max-age=")
+    assert client.get("/records_count").headers["etag"] == etag
+    resp = client.get("/signature_files_hx", headers={"if-none-match": etag})
+    assert resp.status_code == 304
+    assert resp.text == ""
+    resp = client.get("/records_count", headers={"if-none-match": f'"x", W/{etag}'})
+    assert resp.status_code == 304
+    resp = client.get("/pronom_summary", headers={"if-modified-since": last_modified})
+    assert resp.status_code == 304
+    assert "etag" not in client.get("/summary_cache").headers
+    put_summary(client, {**SUMMARY, "version": "V117"})
+    resp = client.get("/pronom_version", headers={"if-none-match": etag})
+    assert resp.status_code == 200
+    assert resp.text == "V117"
+    assert resp.headers["etag"] != etag
+
+
+def test_negotiate():
+    """Ensure the content encoding is chosen from Accept-Encoding."""
+    assert negotiate(None) == IDENTITY
+    assert negotiate("gzip, deflate") == GZIP
+    assert negotiate("gzip;q=0, deflate") == IDENTITY
+    assert negotiate("*") != IDENTITY
+    assert negotiate("deflate") == IDENTITY
+
+
+def test_precompressed_summary(client):
+    """Ensure the summary is served in the negotiated encoding and each
+    variant has its own ETag.
+    """
+    put_summary(client, SUMMARY)
+    identity = client.get("/pronom_summary", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["vary"] == "Accept-Encoding"
+    assert identity.json() == {"version": "V116", "summary": SUMMARY}
+    compressed = client.get("/pronom_summary", headers={"accept-encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == GZIP
+    assert compressed.num_bytes_downloaded < len(identity.content)
+    assert compressed.content == identity.content
+    etag = compressed.headers["etag"]
+    assert etag == f'{identity.headers["etag"][:-1]}-gzip"'
+    resp = client.get(
+        "/pronom_summary", headers={"accept-encoding": "gzip", "if-none-match": etag}
+    )
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert client.get("/summary_cache").json()["misses"] == 1
+
+
+def test_diff(client, tmp_path, monkeypatch, capsys):
+    """Ensure the changes between releases are reported and that diffs
+    of consecutive releases are precomputed.
+    """
+    records = SUMMARY["pronom_data"]
+    put_summary(client, {**SUMMARY, "version": "V115", "pronom_data": records[:3]})
+    changed = [
+        records[0],
+        {**records[1], "name": "Tagged Image File Format 6.0"},
+        {**records[2], "description": "deprecated", "signature": False},
+        {**records[3], "signature": True},
+        {**records[3], "identifier": "fmt/2000"},
+    ]
+    put_summary(client, {**SUMMARY, "pronom_data": changed})
+    diff = client.get("/diff").json()
+    assert diff == client.get("/diff", params={"old": "V115", "new": "V116"}).json()
+    assert diff["old"] == "V115"
+    assert diff["new"] == "V116"
+    assert [item["identifier"] for item in diff["added"]] == ["x-fmt/442", "fmt/2000"]
+    assert diff["removed"] == []
+    assert diff["deprecated"] == [
+        {"identifier": "x-fmt/10", "name": records[2]["name"]}
+    ]
+    assert diff["lost_signature"] == diff["deprecated"]
+    assert diff["gained_signature"] == []
+    assert diff["renamed"] == [
+        {
+            "identifier": "fmt/10",
+            "name": "Tagged Image File Format 6.0",
+            "previous_name": records[1]["name"],
+        }
+    ]
+    assert diff["status_changed"][0]["previous_status"] == "complete"
+    resp = client.get("/diff", params={"old": "V116", "new": "V115"})
+    assert resp.json()["removed"] == diff["added"]
+    assert client.get("/diff", params={"old": "V1"}).status_code == 404
+    con = sqlite3.connect(tmp_path / "pronom-stats.db")
+    assert con.execute("select release, previous from diffs").fetchall() == [(2, 1)]
+    monkeypatch.setattr("sys.argv", ["pronom-stats", "--diff", "V115", "V116"])
+    main()
+    assert json.loads(capsys.readouterr().out) == diff
+
+
+def test_stats_history(client, tmp_path):
+    """Ensure statistics are reported for every release and can be
+    backfilled in a single pass.
+    """
+    put_summary(client, {**SUMMARY, "version": "V115", "pronom_data": []})
+    put_summary(client, SUMMARY)
+    history = client.get("/stats/history").json()
+    assert [item["version"] for item in history] == ["V115", "V116"]
+    assert history[0]["record_count"] == 0
+    assert history[0]["signature_coverage"] is None
+    assert history[1]["record_count"] == 4
+    assert history[1]["outline_count"] == 1
+    assert history[1]["signature_coverage"] == round(2 / 3, 4)
+    con = sqlite3.connect(tmp_path / "pronom-stats.db")
+    con.execute("update statistics set record_count = null, outline_count = null")
+    con.commit()
+    assert asyncio.run(backfill_statistics(con.cursor())) == 2
+    assert client.get("/stats/history").json() == history
+
+
+def test_delta_upload(client):
+    """Ensure the latest summary digest is advertised and a release can
+    be stored from a gzip compressed delta against it.
+    """
+    assert client.head("/pronom_summary").status_code == 404
+    put_summary(client, SUMMARY)
+    resp = client.head("/pronom_summary")
+    assert resp.headers["x-summary-version"] == "V116"
+    assert resp.headers["x-summary-sha256"] == summary_digest(SUMMARY)
+    records = SUMMARY["pronom_data"]
+    summary = {
+        **SUMMARY,
+        "version": "V117",
+        "pronom_data": [{**records[0], "description": "deprecated"}, *records[1:3]],
+    }
+    delta = make_delta(SUMMARY, summary)
+    headers = {
+        "auth": hashlib.sha256(AUTH.encode()).hexdigest(),
+        "content-encoding": "gzip",
+    }
+    resp = client.patch(
+        "/pronom_summary",
+        content=gzip.compress(json.dumps({**delta, "sha256": "0"}).encode()),
+        headers=headers,
+    )
+    assert resp.status_code == 422
+    resp = client.patch(
+        "/pronom_summary",
+        content=gzip.compress(json.dumps(delta).encode()),
+        headers=headers,
+    )
+    assert resp.json() == {"message": "success", "sha256": summary_digest(summary)}
+    assert client.get("/pronom_summary").json()["summary"] == summary
+    assert client.get("/get_deprecated_count").json() == 2
+    resp = client.patch(
+        "/pronom_summary",
+        content=gzip.compress(json.dumps(delta).encode()),
+        headers=headers,
+    )
+    assert resp.status_code == 409
+    resp = client.patch("/pronom_summary", content=json.dumps(delta))
+    assert resp.status_code == 401
+
+
+def test_concurrent_delta_upload(client):
+    """Ensure only one of several deltas against the same base is
+    stored, the others conflict with the release it stored.
+    """
+    put_summary(client, SUMMARY)
+    headers = {"auth": hashlib.sha256(AUTH.encode()).hexdigest()}
+    deltas = [
+        make_delta(SUMMARY, {**SUMMARY, "version": f"V{version}"})
+        for version in range(117, 125)
+    ]
+
+    def patch(delta: dict) -> int:
+        resp = client.patch(
+            "/pronom_summary", content=json.dumps(delta), headers=headers
+        )
+        return resp.status_code
+
+    with ThreadPoolExecutor(max_workers=len(deltas)) as executor:
+        statuses = sorted(executor.map(patch, deltas))
+    assert statuses == [200] + [409] * (len(deltas) - 1)
+    assert len(client.get("/stats/history").json()) == 2
+
+
+@pytest.fixture(name="server")
+def fixture_server(tmp_path, monkeypatch):
+    """Run the API on a local port for HTTP clients."""
+    monkeypatch.setenv("SERVER_AUTH", AUTH)
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "pronom-stats.db"))
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    monkeypatch.setenv("SERVER_ADDR", f"http://127.0.0.1:{sock.getsockname()[1]}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]})
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield
+    server.should_exit = True
+    thread.join()
+
+
+def test_store_pronom_summary(server, tmp_path, monkeypatch, caplog):
+    """Ensure the tools store a whole summary first and deltas after,
+    using their copy of the last summary stored when it matches.
+    """
+    caplog.set_level(logging.INFO)
+    stored_path = tmp_path / "stored-summary.json"
+    monkeypatch.setattr(pronom_tools, "STORED_SUMMARY_PATH", stored_path)
+    records = SUMMARY["pronom_data"]
+    pronom_tools.store_pronom_summary({**SUMMARY, "version": "V115"})
+    assert "delta" not in caplog.text
+    pronom_tools.store_pronom_summary(SUMMARY)
+    assert "stored as a delta: 0 records, 0 removed" in caplog.text
+    stored_path.unlink()
+    summary = {**SUMMARY, "version": "V117", "pronom_data": records[1:]}
+    pronom_tools.store_pronom_summary(summary)
+    assert "stored as a delta: 0 records, 1 removed" in caplog.text
+    assert json.loads(stored_path.read_text()) == summary
+    con = sqlite3.connect(tmp_path / "pronom-stats.db")
+    res = con.execute("select version, sha256 from releases order by id")
+    assert res.fetchall() == [
+        ("V115", summary_digest({**SUMMARY, "version": "V115"})),
+        ("V116", summary_digest(SUMMARY)),
+        ("V117", summary_digest(summary)),
+    ]
+
+
+def test_migrate(tmp_path):
+    """Ensure releases only held in the `pronom` table are migrated
+    once.
+    """
+    con = sqlite3.connect(tmp_path / "pronom-stats.db")
+    cur = con.cursor()
+    cur.execute("create table pronom(version, summary)")
+    cur.execute("insert into pronom values (?, ?)", ("V116", json.dumps(SUMMARY)))
+    cur.execute("commit;")
+    assert asyncio.run(migrate(cur)) == 1
+    assert asyncio.run(migrate(cur)) == 0
+    res = cur.execute("select record_count, deprecated_count from statistics")
+    assert res.fetchall() == [(4, 1)]
+    res = cur.execute("select id, version, sig_file from releases")
+    assert res.fetchall() == [(1, "V116", SUMMARY["sig_file"])]
+    res = cur.execute("select puid from records where release = 1 order by position")
+    assert [puid for puid, in res] == [
+        item["identifier"] for item in SUMMARY["pronom_data"]
+    ]
+
+
+def test_diff_unmigrated(tmp_path, monkeypatch, capsys):
+    """Ensure releases can be diffed from the command line before the
+    database has been migrated.
+    """
+    con = sqlite3.connect(tmp_path / "pronom-stats.db")
+    con.execute("create table pronom(version, summary)")
+    for version, records in (("V115", []), ("V116", SUMMARY["pronom_data"])):
+        summary = {**SUMMARY, "version": version, "pronom_data": records}
+        con.execute("insert into pronom values (?, ?)", (version, json.dumps(summary)))
+    con.commit()
+    con.close()
+    monkeypatch.setenv("SERVER_AUTH", AUTH)
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "pronom-stats.db"))
+    monkeypatch.setattr("sys.argv", ["pronom-stats", "--diff"])
+    main()
+    diff = json.loads(capsys.readouterr().out)
+    assert (diff["old"], diff["new"]) == ("V115", "V116")
+    assert [item["identifier"] for item in diff["added"]] == [
+        item["identifier"] for item in SUMMARY["pronom_data"]
+    ]
+
+
+def test_records_without_puid(client, tmp_path):
+    """Ensure records without a PUID are stored and counted, and
+    summaries with duplicate PUIDs are rejected and aren't migrated.
+    """
+    records = SUMMARY["pronom_data"]
+    unknown = {**records[0], "identifier": None}
+    summary = {**SUMMARY, "pronom_data": [records[0], unknown, *records[1:]]}
+    put_summary(client, summary)
+    assert client.get("/records_count").json() == 5
+    stats = client.get("/statistics").json()
+    assert (stats["fmt_count"], stats["x_fmt_count"]) == (2, 2)
+    paged = []
+    params = {"limit": 2}
+    while True:
+        resp = client.get("/pronom_summary", params=params)
+        paged.extend(resp.json()["summary"]["pronom_data"])
+        if "link" not in resp.headers:
+            break
+        params = {**params, "after": paged[-1]["identifier"]}
+    assert paged == summary["pronom_data"]
+    duplicate = {**SUMMARY, "pronom_data": [*SUMMARY["pronom_data"]] * 2}
+    resp = client.put(
+        "/pronom_summary",
+        content=json.dumps(duplicate),
+        headers={"auth": hashlib.sha256(AUTH.encode()).hexdigest()},
+    )
+    assert resp.status_code == 422
+    assert client.get("/records_count").json() == 5
+    con = sqlite3.connect(tmp_path / "legacy.db")
+    cur = con.cursor()
+    cur.execute("create table pronom(version, summary)")
+    for version, item in (("V115", SUMMARY), ("V116", summary), ("V117", duplicate)):
+        cur.execute("insert into pronom values (?, ?)", (version, json.dumps(item)))
+    cur.execute("commit;")
+    assert asyncio.run(migrate(cur)) == 2
+    res = cur.execute("select release, count(*) from records group by release")
+    assert res.fetchall() == [(1, 4), (2, 5)]
+
+
+def test_summary_cache(client):
+    """Ensure the decoded summary is reused until a new summary is
+    stored.
+    """
+    put_summary(client, SUMMARY)
+    client.get("/pronom_version")
+    client.get("/pronom_summary")
+    assert client.get("/summary_cache").json() == {
+        "hits": 1,
+        "misses": 1,
+        "version": "V116",
+    }
+    put_summary(client, {**SUMMARY, "version": "V117"})
+    assert client.get("/pronom_summary").json()["version"] == "V117"
+    assert client.get("/summary_cache").json()["misses"] == 2
+
+
+def test_database(tmp_path):
+    """Ensure the database is opened in WAL mode and readers see
+    committed writes.
+    """
+    db = Database(tmp_path / "pronom-stats.db", readers=2)
+    with db.writer() as cur:
+        cur.execute("create table test(value)")
+        cur.execute("insert into test values (1)")
+    with db.reader() as cur:
+        assert cur.execute("pragma journal_mode").fetchone() == ("wal",)
+        assert cur.execute("select value from test").fetchall() == [(1,)]
+    with pytest.raises(sqlite3.OperationalError):
+        with db.writer() as cur:
+            cur.execute("insert into test values (2)")
+            cur.execute("insert into missing values (3)")
+    with db.reader() as cur:
+        assert cur.execute("select count(*) from test").fetchone() == (1,)
+    db.close()
+
+
+def test_concurrent_read_write(client):
+    """Ensure reads keep succeeding, and see whole releases, while
+    summaries are being stored.
+    """
+    releases = [
+        {**SUMMARY, "version": f"V{idx}", "pronom_data": SUMMARY["pronom_data"][:idx]}
+        for idx in range(1, 5)
+    ] * 5
+    put_summary(client, releases[0])
+    done = threading.Event()
+
+    def write():
+        try:
+            for release in releases:
+                put_summary(client, release)
+        finally:
+            done.set()
+
+    def read() -> int:
+        reads = 0
+        while not done.is_set() or not reads:
+            stats = client.get("/statistics")
+            assert stats.status_code == 200
+            assert 1 <= stats.json()["record_count"] <= 4
+            records = client.get("/get_deprecated")
+            assert records.status_code == 200
+            assert records.json() in ([], [SUMMARY["pronom_data"][1]])
+            reads += 1
+        return reads
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        readers = [executor.submit(read) for _ in range(4)]
+        executor.submit(write).result()
+        assert all(reader.result() for reader in readers)
+    assert client.get("/pronom_version").text == "V4"
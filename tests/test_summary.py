@@ -1,12 +1,29 @@
 """Test PRONOM summary code."""
 
+import io
+import json
 import os
+import shutil
+from pathlib import Path
 from typing import Final
 
 import pytest
 
+from src.pronom_export.archive import ExportArchive
+from src.pronom_export.pronom_xml_export import pack_export
+from src.pronom_summary.delta import (
+    DeltaException,
+    apply_delta,
+    make_delta,
+    record_sort_key,
+    summary_digest,
+)
 from src.pronom_summary.pronom_summary import (
+    SUMMARIZER_STREAM,
+    SUMMARIZER_TREE,
+    DescriptionClassifier,
     PRONOMException,
+    SummaryCache,
     parse_pronom,
     summarize_container_xml,
     summarize_xml,
@@ -98,6 +115,7 @@ RES_3 = {
 }
 
 
+@pytest.mark.parametrize("summarizer", [SUMMARIZER_STREAM, SUMMARIZER_TREE])
 @pytest.mark.parametrize(
     "xml, expected, exception",
     [
@@ -107,18 +125,56 @@ RES_3 = {
         (XML_3, RES_3, False),
     ],
 )
-def test_summarize(xml, expected, exception, tmp_path):
+def test_summarize(xml, expected, exception, summarizer, tmp_path):
     """Test the primary summarize function of the script."""
     xml_path = tmp_path / "tmp.xml"
     xml_path.write_text(xml.strip())
     if exception:
         with pytest.raises(PRONOMException):
-            res = summarize_xml(xml_path)
+            res = summarize_xml(xml_path, summarizer)
         return
-    res = summarize_xml(xml_path)
+    res = summarize_xml(xml_path, summarizer)
     assert res == expected
 
 
+@pytest.mark.parametrize(
+    "record", sorted(Path("tests", "fixtures", "export").glob("**/*.xml"))
+)
+def test_summarizers_agree(record):
+    """Ensure the streaming summarizer matches the tree summarizer for
+    real records and can read from a file object.
+    """
+    expected = summarize_xml(record, SUMMARIZER_TREE)
+    assert summarize_xml(record, SUMMARIZER_STREAM) == expected
+    assert summarize_xml(io.BytesIO(record.read_bytes())) == expected
+
+
+def test_classify_description(tmp_path):
+    """Ensure descriptions are classified with the phrase that matched
+    and that outline phrases take precedence.
+    """
+    classifier = DescriptionClassifier()
+    assert classifier.classify("A complete record.") == ("complete", None)
+    assert classifier.classify("This PUID has been DEPRECATED.") == (
+        "deprecated",
+        "this puid has been deprecated",
+    )
+    assert classifier.classify("Format deprecated. This is an outline record.") == (
+        "outline",
+        "this is an outline record",
+    )
+    phrases = tmp_path / "phrases.json"
+    phrases.write_text(json.dumps({"deprecated": ["superseded by"]}))
+    classifier = DescriptionClassifier.from_file(phrases)
+    assert classifier.classify("Superseded by fmt/2.") == (
+        "deprecated",
+        "superseded by",
+    )
+    assert classifier.classify("This is an outline record.") == ("complete", None)
+    with pytest.raises(PRONOMException):
+        DescriptionClassifier({"retired": ["retired"]})
+
+
 CONTAINER_SIGNATURE: Final[
     str
 ] = """
@@ -246,3 +302,128 @@ async def test_parse_pronom():
             "identifier": "x-fmt/442",
         },
     ]
+
+
+@pytest.mark.asyncio
+async def test_parse_pronom_cache(tmp_path):
+    """Ensure that cached summaries are reused until a record changes
+    and that the cache is bounded.
+    """
+    export = tmp_path / "export"
+    shutil.copytree(os.path.join("tests", "fixtures", "export"), export)
+    container = os.path.join(
+        "tests", "fixtures", "container", "container-signature-20231127.xml"
+    )
+    cache = SummaryCache(tmp_path / "cache.db")
+    cold = await parse_pronom(export, container, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 7)
+    warm = await parse_pronom(export, container, cache=cache)
+    assert (cache.hits, cache.misses) == (7, 7)
+    assert warm == cold
+    record = export / "fmt" / "fmt1.xml"
+    os.utime(record, ns=(0, 0))
+    await parse_pronom(export, container, cache=cache)
+    assert (cache.hits, cache.misses) == (13, 8)
+    cache.max_entries = 3
+    cache.store([record], [{}])
+    assert cache.clear() == 3
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_parse_pronom_archive(tmp_path):
+    """Ensure an export packed into an archive summarizes the same as
+    the export folder.
+    """
+    export = os.path.join("tests", "fixtures", "export")
+    container = os.path.join(
+        "tests", "fixtures", "container", "container-signature-20231127.xml"
+    )
+    archive_path = tmp_path / "export.sqlite"
+    assert pack_export(export, archive_path) == 7
+    with ExportArchive(archive_path) as archive:
+        assert (
+            archive.read("x-fmt/442")
+            == Path(export, "x-fmt", "x-fmt442.xml").read_bytes()
+        )
+    res = await parse_pronom(archive_path, container)
+    assert res == await parse_pronom(export, container)
+    with pytest.raises(PRONOMException):
+        await parse_pronom(tmp_path / "missing.sqlite", container)
+
+
+def test_summary_delta():
+    """Ensure a summary is reconstructed from a delta against a base
+    summary, and that deltas are only applied to their base.
+    """
+    base = {
+        "version": "V115",
+        "pronom_data": [
+            {
+                "name": "A",
+                "description": "complete",
+                "signature": True,
+                "identifier": "fmt/1",
+            },
+            {
+                "name": "B",
+                "description": "outline",
+                "signature": False,
+                "identifier": "fmt/2",
+            },
+            {
+                "name": "C",
+                "description": "complete",
+                "signature": False,
+                "identifier": "fmt/3",
+            },
+        ],
+    }
+    summary = {
+        "version": "V116",
+        "pronom_data": [
+            base["pronom_data"][0],
+            {
+                "name": "B",
+                "description": "complete",
+                "signature": True,
+                "identifier": "fmt/2",
+            },
+            {
+                "name": "B",
+                "description": "complete",
+                "signature": True,
+                "identifier": "fmt/4",
+            },
+        ],
+    }
+    delta = make_delta(base, summary)
+    assert [record["identifier"] for record in delta["records"]] == ["fmt/2", "fmt/4"]
+    assert delta["removed"] == ["fmt/3"]
+    assert "pronom_data" not in delta["summary"]
+    reconstructed = apply_delta(base, delta)
+    assert reconstructed == summary
+    assert summary_digest(reconstructed) == delta["sha256"]
+    with pytest.raises(DeltaException):
+        apply_delta(summary, delta)
+    with pytest.raises(DeltaException):
+        apply_delta(base, {**delta, "removed": []})
+
+
+def test_record_sort_key():
+    """Ensure records without a PUID can be sorted with records of the
+    same name, and that a delta can be applied to them.
+    """
+    records = [
+        {"name": "A", "identifier": "fmt/1"},
+        {"name": "A", "identifier": None},
+        {"name": "A", "identifier": None},
+    ]
+    assert sorted(records, key=record_sort_key) == [
+        records[1],
+        records[2],
+        records[0],
+    ]
+    base = {"version": "V115", "pronom_data": records[:1]}
+    summary = {"version": "V116", "pronom_data": [records[1], records[0]]}
+    assert apply_delta(base, make_delta(base, summary)) == summary